@@ -0,0 +1,254 @@
+"""Stress check for concurrent update processing.
+
+Three checks, each exiting with status 1 on failure:
+
+* statistics: many threads record users and clicks through one
+  ``StatsManager`` while another thread keeps flushing (as the background
+  flush job does); every increment must be counted, in memory and after
+  reopening the files;
+* ordering: ``PerChatUpdateProcessor`` handles updates of many chats with
+  random delays; updates of the same chat must finish in the order they
+  arrived while different chats overlap;
+* flood: one chat queues twice as many updates as there are slots; updates
+  of other chats must still start without waiting for that queue.
+
+    python -m benchmarks.concurrency_check --threads 16 --events 5000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# config refuses to load without a token; nothing here talks to Telegram
+os.environ.setdefault('BOT_TOKEN', '123456:CONCURRENCY-CHECK')
+
+from telegram import Chat, Message, Update  # noqa: E402
+
+from stats_manager import StatsManager  # noqa: E402
+from update_processor import PerChatUpdateProcessor  # noqa: E402
+
+ENTRY_IDS = [f"entry_{i}" for i in range(20)]
+
+
+def check_stats(backend: str, threads: int, events: int, work_dir: Path) -> List[str]:
+    """
+    Record clicks from many threads and compare the totals with what was sent.
+
+    Args:
+        backend: Statistics backend ('json' or 'sqlite')
+        threads: Number of recording threads
+        events: Clicks per thread
+        work_dir: Scratch directory
+
+    Returns:
+        Descriptions of the mismatches
+    """
+    stats_file = work_dir / ('stats.db' if backend == 'sqlite' else 'stats.json')
+    # Small buffers so flushes and compactions race with the recording threads
+    stats_manager = StatsManager(stats_file, flush_every=50, compact_every=500, backend=backend)
+    expected: List[Counter] = [Counter() for _ in range(threads)]
+    failed_flushes = []
+    errors: List[str] = []
+    done = threading.Event()
+
+    def record(index: int) -> None:
+        rng = random.Random(index)
+        for _ in range(events):
+            entry_id = rng.choice(ENTRY_IDS)
+            user_id = 1 + rng.randrange(threads * 10)
+            try:
+                stats_manager.track_user(user_id, username=f"user{user_id}")
+                stats_manager.track_click(entry_id, user_id=user_id)
+            except Exception as e:
+                # A thread dying here would also hide its uncounted clicks
+                errors.append(f"{backend}: recording raised {e!r}")
+                return
+            expected[index][entry_id] += 1
+
+    def flush() -> None:
+        while not done.is_set():
+            if not stats_manager.flush():
+                failed_flushes.append(backend)
+            stats_manager.get_stats_summary()
+
+    flusher = threading.Thread(target=flush)
+    flusher.start()
+    workers = [threading.Thread(target=record, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    done.set()
+    flusher.join()
+
+    total = sum(expected, Counter())
+    problems = errors + ([f"{backend}: {len(failed_flushes)} flushes failed"] if failed_flushes else [])
+    problems += _compare(f"{backend} in memory", stats_manager, total)
+    stats_manager.close()
+    reopened = StatsManager(stats_file, backend=backend)
+    problems += _compare(f"{backend} after reopening", reopened, total)
+    reopened.close()
+    print(f"{backend}: {threads * events * 2} events from {threads} threads "
+          f"in {elapsed:.2f} s, {len(problems)} mismatches")
+    return problems
+
+
+def _compare(label: str, stats_manager: StatsManager, expected: Counter) -> List[str]:
+    """Compare recorded click counts with the expected ones."""
+    problems = []
+    total_clicks = stats_manager.get_stats_summary()['total_clicks']
+    if total_clicks != sum(expected.values()):
+        problems.append(f"{label}: {total_clicks} clicks recorded, {sum(expected.values())} sent")
+    recorded = dict(stats_manager.get_top_entries(len(ENTRY_IDS)))
+    for entry_id, count in expected.items():
+        if recorded.get(entry_id) != count:
+            problems.append(f"{label}: {entry_id} has {recorded.get(entry_id)} clicks, {count} sent")
+    return problems
+
+
+async def check_ordering(chats: int, updates: int, limit: int) -> List[str]:
+    """
+    Process updates of many chats concurrently and check each chat's order.
+
+    Args:
+        chats: Number of chats
+        updates: Updates per chat
+        limit: Maximum number of updates processed at once
+
+    Returns:
+        Descriptions of the violations
+    """
+    processor = PerChatUpdateProcessor(limit)
+    finished: Dict[int, List[int]] = {chat_id: [] for chat_id in range(1, chats + 1)}
+    running = peak = 0
+    rng = random.Random(1)
+
+    async def handle(chat_id: int, sequence: int, delay: float) -> None:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(delay)
+        finished[chat_id].append(sequence)
+        running -= 1
+
+    tasks = []
+    now = datetime.now()
+    update_id = 0
+    async with processor:
+        for sequence in range(updates):
+            for chat_id in finished:
+                update_id += 1
+                update = Update(update_id, message=Message(
+                    update_id, now, Chat(chat_id, Chat.PRIVATE), text=str(sequence),
+                ))
+                # Same scheduling as Application: one task per update, in order
+                tasks.append(asyncio.create_task(processor.process_update(
+                    update, handle(chat_id, sequence, rng.uniform(0, 0.005)),
+                )))
+        await asyncio.gather(*tasks)
+
+    problems = [
+        f"chat {chat_id} finished its updates out of order: {order}"
+        for chat_id, order in finished.items() if order != sorted(order)
+    ]
+    if limit > 1 and peak < 2:
+        problems.append("updates of different chats never overlapped")
+    if peak > limit:
+        problems.append(f"{peak} updates ran at once, limit is {limit}")
+    print(f"ordering: {chats * updates} updates from {chats} chats, "
+          f"up to {peak} at once (limit {limit}), {len(problems)} violations")
+    return problems
+
+
+async def check_flood(limit: int, other_chats: int = 5, work: float = 0.02) -> List[str]:
+    """
+    Let one chat queue far more updates than there are slots and check
+    that other chats are still served right away.
+
+    Args:
+        limit: Maximum number of updates processed at once
+        other_chats: Chats sending one update each after the flood
+        work: Seconds each update takes
+
+    Returns:
+        Descriptions of the violations
+    """
+    processor = PerChatUpdateProcessor(limit)
+    now = datetime.now()
+    delays: List[float] = []
+
+    def make_update(update_id: int, chat_id: int) -> Update:
+        return Update(update_id, message=Message(update_id, now, Chat(chat_id, Chat.PRIVATE), text='x'))
+
+    async def handle(submitted: Optional[float] = None) -> None:
+        if submitted is not None:
+            delays.append(time.perf_counter() - submitted)
+        await asyncio.sleep(work)
+
+    async with processor:
+        flood = [
+            asyncio.create_task(processor.process_update(make_update(i, 1), handle()))
+            for i in range(2 * limit)
+        ]
+        # Let the flood take whatever it can before the other chats arrive
+        await asyncio.sleep(work / 2)
+        submitted = time.perf_counter()
+        others = [
+            asyncio.create_task(processor.process_update(
+                make_update(10_000 + chat_id, chat_id), handle(submitted),
+            ))
+            for chat_id in range(2, 2 + other_chats)
+        ]
+        await asyncio.gather(*others)
+        flood_left = sum(not task.done() for task in flood)
+        await asyncio.gather(*flood)
+
+    # Other chats only wait for free slots, not for the flooding chat's queue
+    allowed = work * 2
+    worst = max(delays)
+    problems = [] if worst <= allowed else [
+        f"an update of another chat waited {worst * 1000:.0f} ms behind a flooding chat "
+        f"(allowed {allowed * 1000:.0f} ms)"
+    ]
+    print(f"flood: {2 * limit} updates from one chat, {other_chats} other chats started within "
+          f"{worst * 1000:.0f} ms ({flood_left} flood updates still queued), {len(problems)} violations")
+    return problems
+
+
+def main(argv=None) -> int:
+    """Run both checks and report any failure."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--threads', type=int, default=16, help='recording threads (default: 16)')
+    parser.add_argument('--events', type=int, default=5000, help='clicks per thread (default: 5000)')
+    parser.add_argument('--chats', type=int, default=50, help='chats in the ordering check (default: 50)')
+    parser.add_argument('--updates', type=int, default=20, help='updates per chat (default: 20)')
+    parser.add_argument('--limit', type=int, default=32, help='concurrent updates (default: 32)')
+    args = parser.parse_args(argv)
+
+    # Switch threads far more often than the default 5 ms, so unguarded
+    # read-modify-write sequences would actually interleave
+    sys.setswitchinterval(1e-6)
+    problems = []
+    for backend in ('json', 'sqlite'):
+        with tempfile.TemporaryDirectory() as tmp:
+            problems += check_stats(backend, args.threads, args.events, Path(tmp))
+    problems += asyncio.run(check_ordering(args.chats, args.updates, args.limit))
+    problems += asyncio.run(check_flood(args.limit))
+
+    for problem in problems[:20]:
+        print(problem)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
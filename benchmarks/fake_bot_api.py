@@ -0,0 +1,304 @@
+"""Local stand-in for the Telegram Bot API, for load tests.
+
+Serves the Bot API methods the bot uses over plain HTTP on localhost, keeps
+just enough state to answer them (message IDs, the last message sent to
+each chat) and lets a test feed updates to ``getUpdates`` and wait for the
+bot's responses.
+"""
+import asyncio
+import math
+import email.parser
+import email.policy
+import itertools
+import json
+import time
+from typing import Any, Dict, List, Optional, Set
+from urllib.parse import parse_qsl
+
+BOT_USER = {
+    'id': 1,
+    'is_bot': True,
+    'first_name': 'Load Test Bot',
+    'username': 'load_test_bot',
+}
+
+# Methods answering with the (new or edited) message
+MESSAGE_METHODS = {'sendMessage', 'editMessageText', 'sendPhoto', 'editMessageMedia'}
+
+
+def _parse_form(content_type: str, body: bytes) -> Dict[str, Any]:
+    """Decode a form-encoded or multipart request body into parameters."""
+    if content_type.startswith('multipart/form-data'):
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode('latin-1') + body
+        )
+        raw = {}
+        for part in message.iter_parts():
+            if part.get_filename() is None:
+                raw[part.get_param('name', header='content-disposition')] = part.get_content()
+            else:
+                raw[part.get_param('name', header='content-disposition')] = '<file>'
+    else:
+        raw = dict(parse_qsl(body.decode('utf-8'), keep_blank_values=True))
+
+    params = {}
+    for name, value in raw.items():
+        # PTB JSON-encodes every parameter except plain strings
+        try:
+            params[name] = json.loads(value)
+        except (TypeError, ValueError):
+            params[name] = value
+    return params
+
+
+class _ApiError(Exception):
+    """Error answer of a Bot API call."""
+
+    def __init__(self, code: int, description: str):
+        super().__init__(description)
+        self.code = code
+        self.description = description
+
+
+class Response:
+    """A message the bot sent or edited, as seen by the fake API."""
+
+    __slots__ = ('method', 'chat_id', 'message', 'at')
+
+    def __init__(self, method: str, chat_id: int, message: Dict[str, Any], at: float):
+        self.method = method
+        self.chat_id = chat_id
+        self.message = message
+        self.at = at
+
+    @property
+    def keyboard(self) -> List[str]:
+        """Callback data of the message's inline buttons."""
+        markup = self.message.get('reply_markup') or {}
+        return [
+            button['callback_data']
+            for row in markup.get('inline_keyboard', [])
+            for button in row
+            if 'callback_data' in button
+        ]
+
+
+class FakeBotApi:
+    """
+    Minimal HTTP server answering Bot API calls from python-telegram-bot.
+
+    Point the application at it with
+    ``Application.builder().base_url(api.base_url)``.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0):
+        """
+        Initialize FakeBotApi.
+
+        Args:
+            host: Interface to listen on
+            port: Port to listen on (0 picks a free port)
+            latency: Seconds every call except getUpdates takes, standing in
+                for the round trip to Telegram
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._updates: List[Dict[str, Any]] = []
+        self._updates_ready = asyncio.Event()
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._file_ids = itertools.count(1)
+        self._waiters: Dict[int, asyncio.Future] = {}
+        # update_id -> time it was handed to the bot via getUpdates
+        self.delivered_at: Dict[int, float] = {}
+        self.calls: Dict[str, int] = {}
+        # Chats that blocked the bot: sending to them fails with 403
+        self.blocked_chats: Set[int] = set()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/bot"
+
+    async def start(self) -> None:
+        """Start serving."""
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        """Stop serving and release pending getUpdates calls."""
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        self._updates_ready.set()
+
+    # Feeding updates ---------------------------------------------------
+
+    def _push(self, update: Dict[str, Any]) -> int:
+        update_id = next(self._update_ids)
+        update['update_id'] = update_id
+        self._updates.append(update)
+        self._updates_ready.set()
+        return update_id
+
+    @staticmethod
+    def _user(chat_id: int) -> Dict[str, Any]:
+        return {'id': chat_id, 'is_bot': False, 'first_name': f"User {chat_id}",
+                'username': f"user{chat_id}"}
+
+    @staticmethod
+    def _chat(chat_id: int) -> Dict[str, Any]:
+        return {'id': chat_id, 'type': 'private', 'first_name': f"User {chat_id}"}
+
+    def push_command(self, chat_id: int, command: str) -> int:
+        """
+        Queue a command message (e.g. ``/start``) from a user.
+
+        Returns:
+            The update_id
+        """
+        return self._push({'message': {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': self._chat(chat_id),
+            'from': self._user(chat_id),
+            'text': command,
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(command.split()[0])}],
+        }})
+
+    def push_callback(self, chat_id: int, message: Dict[str, Any], data: str) -> int:
+        """
+        Queue a button press on a message the bot sent to a user.
+
+        Returns:
+            The update_id
+        """
+        return self._push({'callback_query': {
+            'id': str(next(self._update_ids)),
+            'from': self._user(chat_id),
+            'chat_instance': str(chat_id),
+            'message': message,
+            'data': data,
+        }})
+
+    def expect_response(self, chat_id: int) -> asyncio.Future:
+        """
+        Future resolved with the next message carrying a keyboard sent to a chat.
+
+        Args:
+            chat_id: The chat to watch
+
+        Returns:
+            Future resolving to a Response
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[chat_id] = future
+        return future
+
+    # Serving -----------------------------------------------------------
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                _, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, value = line.decode('latin-1').split(':', 1)
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                params = _parse_form(headers.get('content-type', ''), body)
+                method = path.rsplit('/', 1)[-1]
+                try:
+                    result = await self._call(method, params)
+                    status, body = '200 OK', {'ok': True, 'result': result}
+                except _ApiError as e:
+                    status = f"{e.code} Error"
+                    body = {'ok': False, 'error_code': e.code, 'description': e.description}
+                payload = json.dumps(body).encode('utf-8')
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n".encode('latin-1')
+                    + f"Content-Length: {len(payload)}\r\n\r\n".encode('latin-1')
+                    + payload
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _call(self, method: str, params: Dict[str, Any]) -> Any:
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if method == 'getMe':
+            return BOT_USER
+        if method == 'getUpdates':
+            return await self._get_updates(params)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if method in MESSAGE_METHODS:
+            if int(params.get('chat_id', 0)) in self.blocked_chats:
+                raise _ApiError(403, "Forbidden: bot was blocked by the user")
+            return self._message_result(method, params)
+        return True
+
+    async def _get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        offset = int(params.get('offset') or 0)
+        self._updates = [update for update in self._updates if update['update_id'] >= offset]
+        if not self._updates:
+            self._updates_ready.clear()
+            try:
+                await asyncio.wait_for(self._updates_ready.wait(), float(params.get('timeout') or 0))
+            except asyncio.TimeoutError:
+                pass
+        batch = self._updates[:int(params.get('limit') or 100)]
+        now = time.perf_counter()
+        for update in batch:
+            self.delivered_at.setdefault(update['update_id'], now)
+        return batch
+
+    def _message_result(self, method: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        chat_id = int(params.get('chat_id', 0))
+        message = {
+            'message_id': int(params.get('message_id') or next(self._message_ids)),
+            'date': int(time.time()),
+            'chat': self._chat(chat_id),
+            'from': BOT_USER,
+        }
+        if method in ('sendPhoto', 'editMessageMedia'):
+            file_number = next(self._file_ids)
+            message['photo'] = [{'file_id': f"photo-{file_number}", 'file_unique_id': f"u{file_number}",
+                                 'width': 1280, 'height': 1280}]
+            message['caption'] = params.get('caption') or (params.get('media') or {}).get('caption', '')
+        else:
+            message['text'] = params.get('text', '')
+        if params.get('reply_markup'):
+            message['reply_markup'] = params['reply_markup']
+            waiter = self._waiters.pop(chat_id, None)
+            if waiter and not waiter.done():
+                waiter.set_result(Response(method, chat_id, message, time.perf_counter()))
+        return message
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of a list of values (q in 0-100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    """p50/p95/p99 and max of latencies, in milliseconds."""
+    return {
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'max_ms': max(latencies, default=0.0) * 1000,
+    }
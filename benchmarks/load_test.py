@@ -0,0 +1,209 @@
+"""End-to-end load test: the real application against a local fake Bot API.
+
+Simulated users send /start and then random-walk the content tree by
+pressing buttons on the messages the bot sends them. The application is
+built by ``main.build_application`` with every handler and hook the bot
+uses, polls the fake API with getUpdates, and writes statistics to a
+temporary directory.
+
+    python -m benchmarks.load_test --users 200 --steps 20
+
+Reports throughput, handler latency percentiles (from the moment an update
+is handed to the bot until its reply with a keyboard arrives) and how many
+bytes the statistics engine wrote.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+# config refuses to load without a token; the fake API accepts any
+os.environ.setdefault('BOT_TOKEN', '123456:LOAD-TEST')
+
+import config  # noqa: E402
+from benchmarks.fake_bot_api import FakeBotApi, summarize  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for a reply before counting the update as failed
+RESPONSE_TIMEOUT = 30
+
+
+def _use_temporary_storage(work_dir: Path, backend: str) -> None:
+    """Point every file the bot writes at a scratch directory."""
+    config.STATS_BACKEND = backend
+    config.STATS_FILE = work_dir / 'stats.json'
+    config.STATS_DB_FILE = work_dir / 'stats.db'
+    config.MEDIA_CACHE_FILE = work_dir / 'media_cache.json'
+    config.BROADCAST_STATE_FILE = work_dir / 'broadcast.json'
+    config.CONTENT_BUNDLE_FILE = work_dir / 'content.bundle'
+    # Reloads are not part of the measured traffic
+    config.CONTENT_WATCH_INTERVAL = 0
+
+
+async def _simulate_user(
+    api: FakeBotApi,
+    chat_id: int,
+    steps: int,
+    rng: random.Random,
+    latencies: List[float],
+    errors: List[str],
+) -> None:
+    """Send /start, then press a random button on each reply."""
+    waiter = api.expect_response(chat_id)
+    update_id = api.push_command(chat_id, '/start')
+    for step in range(steps + 1):
+        try:
+            response = await asyncio.wait_for(waiter, RESPONSE_TIMEOUT)
+        except asyncio.TimeoutError:
+            errors.append(f"chat {chat_id}: no reply to update {update_id}")
+            return
+        latencies.append(response.at - api.delivered_at[update_id])
+        buttons = response.keyboard
+        if step == steps or not buttons:
+            return
+        waiter = api.expect_response(chat_id)
+        update_id = api.push_callback(chat_id, response.message, rng.choice(buttons))
+
+
+def _stats_bytes_written(stats_manager, work_dir: Path) -> int:
+    """Bytes the statistics engine wrote (file growth where it is not tracked)."""
+    if stats_manager.storage.bytes_written is not None:
+        return stats_manager.storage.bytes_written
+    return sum(path.stat().st_size for path in work_dir.glob('stats.db*'))
+
+
+async def run(
+    users: int,
+    steps: int,
+    backend: str,
+    seed: int,
+    api_latency: float = 0.0,
+    concurrency: int = None,
+    rate_limit: bool = True,
+) -> Dict[str, Any]:
+    """
+    Run one load test.
+
+    Args:
+        users: Number of simulated users, all active at once
+        steps: Button presses per user after /start
+        backend: Statistics backend ('json' or 'sqlite')
+        seed: Random seed for the walks
+        api_latency: Seconds each Bot API call takes
+        concurrency: Updates processed at once (default: config.CONCURRENT_UPDATES)
+        rate_limit: Keep outgoing requests under Telegram's flood limits
+
+    Returns:
+        Dictionary with the results
+    """
+    import main
+
+    api = FakeBotApi(latency=api_latency)
+    await api.start()
+    if concurrency:
+        config.CONCURRENT_UPDATES = concurrency
+    config.RATE_LIMIT_ENABLED = rate_limit
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(tmp)
+        _use_temporary_storage(work_dir, backend)
+        application = main.build_application(base_url=api.base_url)
+        latencies: List[float] = []
+        errors: List[str] = []
+        async with application:
+            await main.post_init(application)
+            await application.start()
+            await application.updater.start_polling(
+                poll_interval=0,
+                timeout=10,
+                allowed_updates=main.ALLOWED_UPDATES,
+            )
+
+            rng = random.Random(seed)
+            started = time.perf_counter()
+            await asyncio.gather(*(
+                _simulate_user(api, 10_000 + i, steps, random.Random(rng.random()), latencies, errors)
+                for i in range(users)
+            ))
+            elapsed = time.perf_counter() - started
+
+            await application.updater.stop()
+            await application.stop()
+            stats_manager = application.bot_data['stats_manager']
+            rate_limiter = application.bot.rate_limiter
+            await main.post_shutdown(application)
+            bytes_written = _stats_bytes_written(stats_manager, work_dir)
+    await api.stop()
+
+    return {
+        'users': users,
+        'steps': steps,
+        'backend': backend,
+        'api_latency_ms': api_latency * 1000,
+        'concurrency': config.CONCURRENT_UPDATES,
+        'updates': len(latencies),
+        'errors': len(errors),
+        'elapsed_s': elapsed,
+        'throughput_per_s': len(latencies) / elapsed if elapsed else 0.0,
+        'latency': summarize(latencies),
+        'stats_bytes_written': bytes_written,
+        'rate_limiter': rate_limiter.metrics() if rate_limiter else None,
+        'api_calls': dict(sorted(api.calls.items())),
+    }
+
+
+def main(argv=None) -> int:
+    """Run the load test and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--users', type=int, default=100, help='simulated users (default: 100)')
+    parser.add_argument('--steps', type=int, default=20, help='button presses per user (default: 20)')
+    parser.add_argument('--backend', choices=('json', 'sqlite'), default='json',
+                        help='statistics backend (default: json)')
+    parser.add_argument('--seed', type=int, default=1, help='random seed (default: 1)')
+    parser.add_argument('--api-latency', type=float, default=0.0,
+                        help='milliseconds each Bot API call takes (default: 0)')
+    parser.add_argument('--concurrency', type=int,
+                        help=f'updates processed at once (default: {config.CONCURRENT_UPDATES})')
+    parser.add_argument('--no-rate-limit', dest='rate_limit', action='store_false',
+                        help="do not hold requests to Telegram's flood limits")
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.WARNING)
+    results = asyncio.run(run(
+        args.users, args.steps, args.backend, args.seed,
+        api_latency=args.api_latency / 1000,
+        concurrency=args.concurrency,
+        rate_limit=args.rate_limit,
+    ))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        latency = results['latency']
+        print(f"{results['updates']} updates from {results['users']} users "
+              f"in {results['elapsed_s']:.2f} s ({results['throughput_per_s']:.0f} updates/s), "
+              f"{results['errors']} errors "
+              f"(concurrency {results['concurrency']}, API latency {results['api_latency_ms']:.0f} ms)")
+        print(f"Handler latency: p50 {latency['p50_ms']:.1f} ms, p95 {latency['p95_ms']:.1f} ms, "
+              f"p99 {latency['p99_ms']:.1f} ms, max {latency['max_ms']:.1f} ms")
+        print(f"Statistics written ({results['backend']}): {results['stats_bytes_written'] / 1024:.1f} KB")
+        print(f"Bot API calls: {results['api_calls']}")
+        if results['rate_limiter']:
+            queues = ', '.join(
+                f"{name} peak {queue['peak_queued']} avg wait {queue['avg_wait_ms']:.0f} ms"
+                for name, queue in results['rate_limiter']['classes'].items() if queue['sent']
+            )
+            print(f"Rate limiter: {queues}; RetryAfter {results['rate_limiter']['retry_after_hits']}")
+    return 1 if results['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
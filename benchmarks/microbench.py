@@ -0,0 +1,287 @@
+"""Microbenchmarks for the content and statistics hot paths.
+
+Runs each benchmark on synthetic data at two scales and stores the results
+as JSON, so runs before and after a change can be compared:
+
+    python -m benchmarks.microbench --output before.json
+    python -m benchmarks.microbench --output after.json --compare before.json
+
+``--compare`` flags every benchmark that got slower than the threshold and
+exits with status 1 if any did. ``--scale`` limits the run to one scale.
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# config refuses to load without a token; nothing here talks to Telegram
+os.environ.setdefault('BOT_TOKEN', '123456:BENCHMARK')
+
+from data_manager import DataManager  # noqa: E402
+from handlers.navigation import build_keyboard_for_entry, get_message_content  # noqa: E402
+from stats_manager import StatsManager  # noqa: E402
+from stats_storage import SECONDS_PER_DAY  # noqa: E402
+
+# 'realistic' is about the size of the real handbook and audience;
+# '100x' is the growth the bot should still handle
+SCALES = {
+    'realistic': {'entries': 50, 'fanout': 6, 'users': 1_000, 'clicks': 10_000},
+    '100x': {'entries': 5_000, 'fanout': 6, 'users': 100_000, 'clicks': 1_000_000},
+}
+
+# History spread over this many days, so activity and daily stats have depth
+HISTORY_DAYS = 60
+
+WORDS = (
+    'однострій відзнака пластун юнак юначка новак новачка вмілість ступінь '
+    'хустка крайка пояс рукав погон нашивка курінь гурток станиця правильник '
+    'носіння місце розмір колір вишивка емблема'
+).split()
+
+DEFAULT_THRESHOLD = 0.2
+
+
+def generate_content_csv(path: Path, entries: int, fanout: int, seed: int = 1) -> List[str]:
+    """
+    Write a synthetic content CSV: a tree under 'main' with the given fanout.
+
+    Args:
+        path: Where to write the CSV
+        entries: Number of entries besides 'main'
+        fanout: Children per menu entry
+        seed: Random seed for the texts
+
+    Returns:
+        IDs of all entries, in breadth-first order
+    """
+    rng = random.Random(seed)
+    ids = ['main']
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'parent_id', 'title', 'content_type', 'content', 'image_url', 'has_subtopics'])
+        writer.writerow(['main', 'null', 'Головне меню', 'menu', 'Оберіть розділ:', 'null', 'TRUE'])
+        for i in range(entries):
+            entry_id = f"entry_{i}"
+            parent_id = ids[i // fanout]
+            has_children = (i + 1) * fanout < entries
+            content = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(20, 80)))
+            writer.writerow([
+                entry_id,
+                parent_id,
+                f"Розділ {i}: {rng.choice(WORDS)}",
+                'menu' if has_children else 'text',
+                content,
+                'null',
+                'TRUE' if has_children else 'FALSE',
+            ])
+            ids.append(entry_id)
+    return ids
+
+
+def generate_stats(stats_manager: StatsManager, entry_ids: List[str], users: int, clicks: int,
+                   seed: int = 1) -> None:
+    """
+    Fill statistics with users and clicks spread over the last HISTORY_DAYS days.
+
+    Events are applied straight to the storage engine's in-memory state (so
+    a million clicks do not pile up in the write buffer) and then saved once.
+
+    Args:
+        stats_manager: A StatsManager with the JSON backend
+        entry_ids: Entries to click
+        users: Number of distinct users
+        clicks: Number of clicks
+        seed: Random seed
+    """
+    rng = random.Random(seed)
+    storage = stats_manager.storage
+    now = int(time.time())
+    for user_id in range(1, users + 1):
+        storage._apply_event({
+            'type': 'user',
+            'ts': now - rng.randrange(HISTORY_DAYS * SECONDS_PER_DAY),
+            'user_id': str(user_id),
+            'username': f"user{user_id}",
+            'first_name': f"User {user_id}",
+        })
+    for _ in range(clicks):
+        storage._apply_event({
+            'type': 'click',
+            'ts': now - rng.randrange(HISTORY_DAYS * SECONDS_PER_DAY),
+            'entry_id': rng.choice(entry_ids),
+            'user_id': str(rng.randint(1, users)),
+        })
+    storage._save_stats(storage._snapshot())
+
+
+def measure(func: Callable[[], Any], number: int, repeat: int = 5) -> Dict[str, float]:
+    """
+    Time a callable.
+
+    Args:
+        func: The operation to time
+        number: Calls per sample
+        repeat: Number of samples
+
+    Returns:
+        Per-call best and median time in microseconds, and the call count
+    """
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - started) / number)
+    return {
+        'best_us': min(samples) * 1e6,
+        'median_us': statistics.median(samples) * 1e6,
+        'calls': number * repeat,
+    }
+
+
+def run_scale(name: str, params: Dict[str, int], work_dir: Path) -> Dict[str, Dict[str, float]]:
+    """
+    Run every benchmark at one scale.
+
+    Args:
+        name: Scale name (for progress output)
+        params: Scale parameters (entries, fanout, users, clicks)
+        work_dir: Scratch directory
+
+    Returns:
+        Benchmark name -> timings
+    """
+    results = {}
+    csv_path = work_dir / f"content-{name}.csv"
+    entry_ids = generate_content_csv(csv_path, params['entries'], params['fanout'])
+    deepest = entry_ids[-1]
+    menu_id = entry_ids[len(entry_ids) // (params['fanout'] * 2)]
+    load_number = max(1, 500 // params['entries'])
+
+    def bench(label: str, func: Callable[[], Any], number: int) -> None:
+        results[label] = measure(func, number)
+        print(f"  {name:>9} {label:<40} {results[label]['median_us']:>12.2f} us", file=sys.stderr)
+
+    data_manager = DataManager(csv_path)
+    bench('DataManager.load_data', data_manager.load_data, load_number)
+    bundle_manager = DataManager(csv_path, bundle_path=work_dir / f"content-{name}.bundle")
+    bench('DataManager.load_data (bundle)', bundle_manager.load_data, load_number)
+    # Startup: no previous snapshot whose search analysis could be reused
+    bench('DataManager() (bundle, cold)',
+          lambda: DataManager(csv_path, bundle_path=work_dir / f"content-{name}.bundle"), load_number)
+    bench('get_children_entries', lambda: data_manager.get_children_entries(menu_id), 100_000)
+    bench('get_breadcrumb_path (deepest)', lambda: data_manager.get_breadcrumb_path(deepest), 100_000)
+    bench('build_keyboard_for_entry', lambda: build_keyboard_for_entry(data_manager, menu_id), 5_000)
+    bench('get_message_content', lambda: get_message_content(data_manager, deepest), 20_000)
+
+    stats_manager = StatsManager(work_dir / f"stats-{name}.json", flush_every=0,
+                                 compact_every=10 ** 9)
+    generate_stats(stats_manager, entry_ids, params['users'], params['clicks'])
+    rng = random.Random(2)
+    bench('StatsManager.track_click',
+          lambda: stats_manager.track_click(rng.choice(entry_ids), rng.randint(1, params['users'])),
+          20_000)
+    stats_manager.flush()
+    storage = stats_manager.storage
+    # The copy is taken under the stats lock; the save runs without it
+    bench('JsonStatsStorage._snapshot', storage._snapshot, max(1, 10_000 // params['users']))
+    snapshot = storage._snapshot()
+    bench('JsonStatsStorage._save_stats', lambda: storage._save_stats(snapshot),
+          max(1, 10_000 // params['users']))
+    bench('StatsManager.get_active_users(7)', lambda: stats_manager.get_active_users(7), 2_000)
+    bench('StatsManager.get_daily_stats(30)', lambda: stats_manager.get_daily_stats(30), 2_000)
+    stats_manager.close()
+    return results
+
+
+def _git_revision() -> Optional[str]:
+    """Current commit of the working tree, if it is a git checkout."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Find benchmarks that got slower than a baseline run.
+
+    Args:
+        current: Results of this run
+        baseline: Results loaded from an earlier run
+        threshold: Allowed slowdown (0.2 = 20%) of the best time, which is
+            less sensitive to noise from other processes than the median
+
+    Returns:
+        Descriptions of the regressions
+    """
+    regressions = []
+    for scale, benches in current['results'].items():
+        for label, timing in benches.items():
+            before = baseline.get('results', {}).get(scale, {}).get(label)
+            if not before:
+                continue
+            change = timing['best_us'] / before['best_us'] - 1
+            line = f"{scale:>9} {label:<40} {before['best_us']:>12.2f} -> {timing['best_us']:>12.2f} us ({change:+.0%})"
+            print(line)
+            if change > threshold:
+                regressions.append(line)
+    return regressions
+
+
+def main(argv=None) -> int:
+    """Run the benchmarks, write the results and compare them to a baseline."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--scale', choices=sorted(SCALES), action='append',
+                        help='scale to run (repeatable; default: all)')
+    parser.add_argument('--output', type=Path, help='write the results to this JSON file')
+    parser.add_argument('--compare', type=Path, help='results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'slowdown flagged as a regression (default: {DEFAULT_THRESHOLD})')
+    args = parser.parse_args(argv)
+
+    run = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'scales': {name: SCALES[name] for name in (args.scale or SCALES)},
+        'results': {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, params in run['scales'].items():
+            run['results'][name] = run_scale(name, params, Path(tmp))
+
+    if args.output:
+        args.output.write_text(json.dumps(run, indent=2), encoding='utf-8')
+    else:
+        print(json.dumps(run, indent=2))
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding='utf-8'))
+        regressions = compare(run, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}:")
+            for line in regressions:
+                print(line)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,292 @@
+"""Resumable broadcasts of a message to every tracked user."""
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from telegram import Bot
+from telegram.error import BadRequest, Forbidden, RetryAfter, TelegramError
+
+from rate_limiter import PRIORITY_BULK
+from stats_manager import StatsManager
+
+logger = logging.getLogger(__name__)
+
+# Outcome of sending to one user
+DELIVERED = 'delivered'
+FAILED = 'failed'
+UNREACHABLE = 'unreachable'  # blocked the bot, deleted the account or never started it
+
+
+class BroadcastManager:
+    """
+    Sends one message to every user StatsManager knows, in the background.
+
+    Recipients are read page by page in user ID order and sent to in
+    batches. Each message waits for its own turn, so messages go out
+    evenly at no more than ``rate`` per second even without the bot's rate
+    limiter; ``RetryAfter`` pauses all sends for the time Telegram asks
+    for, after which the same user is tried again. After every batch the
+    progress (the last user ID done plus counters) is written atomically to
+    ``state_file``, so a broadcast interrupted by a restart resumes after
+    the last finished batch; at most one batch of users can receive the
+    message twice. Users who blocked the bot or deleted their account are
+    removed from the statistics as they are found.
+    """
+
+    def __init__(
+        self,
+        state_file: Path,
+        batch_size: int = 50,
+        rate: float = 20,
+        progress_interval: float = 15,
+    ):
+        """
+        Initialize BroadcastManager.
+
+        Args:
+            state_file: Path to the JSON file holding the current broadcast
+            batch_size: Users per checkpoint
+            rate: Messages per second
+            progress_interval: Seconds between progress reports
+        """
+        self.state_file = state_file
+        self.batch_size = batch_size
+        self.rate = rate
+        self.progress_interval = progress_interval
+        self.state: Optional[Dict[str, Any]] = self._load()
+        self._sending = False
+        # Sends take turns: each waits for the previous one's interval and any pause
+        self._turn = asyncio.Lock()
+        self._next_send = 0.0
+        self._paused_until = 0.0
+
+    def _load(self) -> Optional[Dict[str, Any]]:
+        """Load the last broadcast, if any."""
+        if not self.state_file.exists():
+            return None
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading broadcast state: {e}")
+            return None
+
+    def _save(self) -> bool:
+        """Atomically write the broadcast state to file."""
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(
+                dir=self.state_file.parent,
+                prefix=f".{self.state_file.name}.",
+                suffix='.tmp',
+            )
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.state_file)
+            return True
+        except Exception as e:
+            logger.error(f"Error saving broadcast state: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            return False
+
+    @property
+    def is_running(self) -> bool:
+        """Whether a broadcast is in progress (or was interrupted and should resume)."""
+        return bool(self.state) and self.state['status'] == 'running'
+
+    def start(self, message: Dict[str, str], admin_chat_id: int, total: int) -> Dict[str, Any]:
+        """
+        Record a new broadcast; ``run()`` sends it.
+
+        Args:
+            message: ``{'text': ...}`` or ``{'entry_id': ...}``
+            admin_chat_id: Chat that receives progress reports
+            total: Number of users at the start (for progress and ETA)
+
+        Returns:
+            The new broadcast state
+
+        Raises:
+            RuntimeError: If another broadcast is running or a cancelled one
+                is still finishing its last batch
+        """
+        if self.is_running or self._sending:
+            raise RuntimeError("A broadcast is already running")
+        self.state = {
+            'status': 'running',
+            'message': message,
+            'admin_chat_id': admin_chat_id,
+            'progress_message_id': None,
+            'total': total,
+            'cursor': '',
+            'delivered': 0,
+            'failed': 0,
+            'pruned': 0,
+            'elapsed_s': 0.0,
+            'started_at': datetime.now().isoformat(),
+            'finished_at': None,
+        }
+        self._save()
+        return self.state
+
+    def set_progress_message(self, message_id: int) -> None:
+        """Remember the admin's message that progress reports edit."""
+        self.state['progress_message_id'] = message_id
+        self._save()
+
+    def cancel(self) -> bool:
+        """
+        Stop the running broadcast after the current batch.
+
+        Returns:
+            True if a broadcast was running
+        """
+        if not self.is_running:
+            return False
+        self._finish('cancelled')
+        return True
+
+    def _finish(self, status: str) -> None:
+        self.state['status'] = status
+        self.state['finished_at'] = datetime.now().isoformat()
+        self._save()
+
+    def progress(self) -> Dict[str, Any]:
+        """
+        Progress of the current or last broadcast.
+
+        Returns:
+            The state plus ``processed`` users, ``percent``, ``rate`` in
+            messages per second and ``eta_s`` (None until measurable)
+        """
+        state = self.state
+        processed = state['delivered'] + state['failed'] + state['pruned']
+        # Users who joined meanwhile can push the count past the initial total
+        total = max(state['total'], processed)
+        rate = processed / state['elapsed_s'] if state['elapsed_s'] else 0.0
+        return dict(
+            state,
+            processed=processed,
+            percent=processed / total * 100 if total else 100.0,
+            rate=rate,
+            eta_s=(total - processed) / rate if rate else None,
+        )
+
+    async def _wait_for_turn(self) -> None:
+        """Wait until ``1 / rate`` seconds after the previous send and past any pause."""
+        async with self._turn:
+            while True:
+                delay = max(self._next_send, self._paused_until) - time.monotonic()
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+            self._next_send = time.monotonic() + 1 / self.rate
+
+    async def _send(self, bot: Bot, user_id: str, send_kwargs: Dict[str, Any]) -> str:
+        """Send the message to one user, retrying after flood limits, and classify the outcome."""
+        while True:
+            await self._wait_for_turn()
+            try:
+                await bot.send_message(chat_id=int(user_id), **send_kwargs)
+                return DELIVERED
+            except RetryAfter as e:
+                logger.warning(f"Broadcast flood limited; pausing for {e.retry_after} s")
+                self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+            except Forbidden:
+                return UNREACHABLE
+            except BadRequest as e:
+                if 'chat not found' in e.message.lower():
+                    return UNREACHABLE
+                logger.warning(f"Broadcast to {user_id} failed: {e}")
+                return FAILED
+            except TelegramError as e:
+                logger.warning(f"Broadcast to {user_id} failed: {e}")
+                return FAILED
+
+    async def run(
+        self,
+        bot: Bot,
+        stats_manager: StatsManager,
+        send_kwargs: Dict[str, Any],
+        on_progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+        keep_going: Callable[[], bool] = lambda: True,
+    ) -> None:
+        """
+        Send the running broadcast from its checkpoint to the last user.
+
+        Args:
+            bot: The bot to send with
+            stats_manager: Source of user IDs; unreachable users are removed from it
+            send_kwargs: Arguments for ``bot.send_message`` besides ``chat_id``
+            on_progress: Called with ``progress()`` every ``progress_interval``
+                seconds and once at the end
+            keep_going: Checked after every batch; once it returns False the
+                broadcast stops where it is and stays running, so that it
+                resumes on the next start (used on shutdown)
+        """
+        if not self.is_running or self._sending:
+            return
+        self._sending = True
+        try:
+            await self._send_all(bot, stats_manager, send_kwargs, on_progress, keep_going)
+        finally:
+            self._sending = False
+
+    async def _send_all(
+        self,
+        bot: Bot,
+        stats_manager: StatsManager,
+        send_kwargs: Dict[str, Any],
+        on_progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]],
+        keep_going: Callable[[], bool],
+    ) -> None:
+        state = self.state
+        if getattr(bot, 'rate_limiter', None):
+            send_kwargs = dict(send_kwargs, rate_limit_args=PRIORITY_BULK)
+        logger.info(f"Broadcast running from user {state['cursor'] or 'start'}")
+
+        last_report = time.monotonic()
+        while self.is_running:
+            batch = stats_manager.get_user_ids_after(state['cursor'], self.batch_size)
+            if not batch:
+                self._finish('done')
+                break
+
+            started = time.monotonic()
+            outcomes = await asyncio.gather(*(
+                self._send(bot, user_id, send_kwargs) for user_id in batch
+            ))
+            for user_id, outcome in zip(batch, outcomes):
+                if outcome == UNREACHABLE:
+                    stats_manager.forget_user(user_id)
+                    state['pruned'] += 1
+                else:
+                    state[outcome] += 1
+
+            state['cursor'] = batch[-1]
+            state['elapsed_s'] += time.monotonic() - started
+            self._save()
+
+            if on_progress and time.monotonic() - last_report >= self.progress_interval:
+                last_report = time.monotonic()
+                await on_progress(self.progress())
+
+            if not keep_going():
+                logger.info(f"Broadcast interrupted after user {state['cursor']}; it resumes on the next start")
+                return
+
+        progress = self.progress()
+        logger.info(
+            f"Broadcast {state['status']}: {state['delivered']} delivered, {state['failed']} failed, "
+            f"{state['pruned']} unreachable users removed in {state['elapsed_s']:.0f} s "
+            f"({progress['rate']:.1f} messages/s)"
+        )
+        if on_progress:
+            await on_progress(progress)
@@ -15,8 +15,19 @@ if not BOT_TOKEN:
 BASE_DIR = Path(__file__).resolve().parent
 DATA_DIR = BASE_DIR / 'data'
 IMAGES_DIR = BASE_DIR / 'images'
+IMAGES_OPTIMIZED_DIR = IMAGES_DIR / '.optimized'  # Output of image_pipeline.py
 CSV_FILE = DATA_DIR / 'content.csv'
+CONTENT_BUNDLE_FILE = DATA_DIR / 'content.bundle'
 STATS_FILE = DATA_DIR / 'stats.json'
+STATS_DB_FILE = DATA_DIR / 'stats.db'
+MEDIA_CACHE_FILE = DATA_DIR / 'media_cache.json'
+BROADCAST_STATE_FILE = DATA_DIR / 'broadcast.json'
+PROFILES_DIR = DATA_DIR / 'profiles'  # Reports of /profile
+
+# Telegram user IDs allowed to use /reload, /broadcast and /profile (comma-separated in .env)
+ADMIN_USER_IDS = {
+    int(user_id) for user_id in os.getenv('ADMIN_USER_IDS', '').replace(',', ' ').split()
+}
 
 # Bot settings
 REQUEST_KWARGS = {
@@ -24,6 +35,74 @@ REQUEST_KWARGS = {
     'read_timeout': 15.0,
 }
 
+# Updates processed at the same time (1 = strictly one after another); updates
+# from the same chat are always processed in the order they arrived
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '32'))
+
+# Outgoing Bot API requests are kept under Telegram's flood limits; requests
+# over the limits wait in a queue where answers to users go before admin and
+# bulk traffic, and requests hitting RetryAfter anyway are retried
+RATE_LIMIT_ENABLED = True
+RATE_LIMIT_OVERALL_PER_SECOND = 30
+RATE_LIMIT_CHAT_PER_SECOND = 1
+RATE_LIMIT_CHAT_BURST = 5  # Messages a private chat may get at once
+RATE_LIMIT_GROUP_PER_MINUTE = 20
+RATE_LIMIT_MAX_RETRIES = 2
+
+# Prometheus metrics (handler latency, Bot API calls) on
+# http://METRICS_LISTEN:METRICS_PORT/metrics; 0 disables the endpoint
+METRICS_LISTEN = os.getenv('METRICS_LISTEN', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9464'))
+
+# /profile: sample the running bot's stacks for a while (admins only)
+PROFILE_DEFAULT_SECONDS = 30
+PROFILE_MAX_SECONDS = 300
+PROFILE_SAMPLE_INTERVAL = 0.005  # Seconds between samples
+
+# How updates are received: 'polling' (getUpdates) or 'webhook'
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+# Webhook mode: Telegram posts updates to WEBHOOK_URL, which the reverse proxy
+# forwards to the local server on WEBHOOK_LISTEN:WEBHOOK_PORT/WEBHOOK_PATH
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')  # Public HTTPS URL, including the path
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '127.0.0.1')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8080'))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'telegram')
+# Sent by Telegram in X-Telegram-Bot-Api-Secret-Token; other requests are rejected
+WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN')
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))  # 1-100
+if BOT_MODE == 'webhook' and not (WEBHOOK_URL and WEBHOOK_SECRET_TOKEN):
+    raise ValueError("BOT_MODE=webhook requires WEBHOOK_URL and WEBHOOK_SECRET_TOKEN in environment variables")
+
+# Statistics persistence (write-behind)
+STATS_BACKEND = os.getenv('STATS_BACKEND', 'json')  # 'json' or 'sqlite'
+STATS_FLUSH_INTERVAL = 30  # seconds between background flushes
+STATS_FLUSH_EVERY = 100  # flush early once this many events are pending
+STATS_COMPACT_EVERY = 1000  # fold the journal into stats.json after this many events
+# Daily unique users: 'exact' (ID sets) or 'hll' (fixed-size HyperLogLog sketches, ~1.6% error)
+STATS_UNIQUE_MODE = os.getenv('STATS_UNIQUE_MODE', 'exact')
+# Per-day statistics (with the IDs of each day's users) are kept for this many
+# days; older days are rolled up into weekly and monthly totals with estimated
+# unique users. At least 30, the longest window /stats_daily counts exactly
+STATS_DAILY_RETENTION_DAYS = int(os.getenv('STATS_DAILY_RETENTION_DAYS', '90'))
+if STATS_DAILY_RETENTION_DAYS < 30:
+    raise ValueError("STATS_DAILY_RETENTION_DAYS must be at least 30")
+STATS_ROLLUP_INTERVAL = 6 * 3600  # seconds between rollup runs (the first runs at startup)
+
+# Content hot reload
+CONTENT_WATCH_INTERVAL = 5  # seconds between checks of CSV_FILE (0 disables the watcher)
+CONTENT_RELOAD_DEBOUNCE = 2  # seconds the file must stay unchanged before reloading
+
+# Broadcasts (/broadcast): messages per second stay below RATE_LIMIT_OVERALL_PER_SECOND
+# so users browsing the handbook meanwhile are not held up
+BROADCAST_BATCH_SIZE = 50  # Users per batch; progress is saved after each batch
+BROADCAST_RATE = 20  # Messages per second, spaced evenly
+BROADCAST_PROGRESS_INTERVAL = 15  # Seconds between progress updates to the admin
+
+# Entry images: 'upload' sends images from IMAGES_DIR as photos, uploading each
+# once and reusing Telegram's file_id (cached in MEDIA_CACHE_FILE); 'link' shows
+# the image_url as a link preview above the text
+IMAGE_DELIVERY = os.getenv('IMAGE_DELIVERY', 'upload')
+
 # Callback data constants
 CALLBACK_PREFIX_TOPIC = 'topic_'
 CALLBACK_PREFIX_BACK = 'back_'
@@ -31,6 +110,16 @@ CALLBACK_RELOAD = 'reload_data'
 
 # Emoji and symbols
 BACK_BUTTON_TEXT = '← Назад'
+BREADCRUMB_SEPARATOR = ' › '
+
+# Navigation settings
+SHOW_BREADCRUMBS = True  # Path to the current screen above its text
+SEARCH_RESULTS_LIMIT = 8  # Result buttons shown by /search
+
+# Inline mode (@bot <query>)
+INLINE_RESULTS_LIMIT = 20  # Telegram accepts at most 50
+INLINE_CACHE_TIME = 300  # Seconds Telegram may serve cached results for a query
+INLINE_RESULTS_CACHE_SIZE = 1000  # Queries with prepared results kept in memory
 
 # Keyboard settings
 BUTTONS_PER_ROW = 2
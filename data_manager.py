@@ -1,103 +1,144 @@
 """Data manager module for loading and managing content from CSV file."""
+import asyncio
+import csv
 import logging
+import sys
+import threading
+import time
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Optional, Any
-import pandas as pd
+from typing import Callable, Dict, List, Optional, Any, Tuple
+from content_bundle import read_bundle, write_bundle
+from search_index import PrefixIndex, SearchIndex
 
 logger = logging.getLogger(__name__)
 
+REQUIRED_COLUMNS = {'id', 'parent_id', 'title', 'content_type', 'content', 'has_subtopics'}
+
+# Cell values treated as missing (the same defaults pandas.read_csv used)
+NA_VALUES = frozenset({
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+    '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a',
+    'nan', 'null',
+})
+
+
+def _cell(value: Optional[str]) -> Optional[str]:
+    """Return a raw CSV cell, or None if it is missing."""
+    if value is None or value in NA_VALUES:
+        return None
+    return value
+
 
 def _normalize_multiline_text(value: Any) -> str:
     """Convert escaped newline sequences to real line breaks."""
-    if pd.isna(value):
+    if value is None:
         return ''
     return str(value).replace('\\n', '\n').strip()
 
 
-class DataManager:
-    """Manages loading and organizing content from CSV file."""
-
-    def __init__(self, csv_path: Path):
+@dataclass(frozen=True, slots=True)
+class Entry:
+    """One content entry (a row of the CSV file)."""
+    id: str
+    parent_id: Optional[str]
+    title: str
+    content_type: str
+    content: str
+    image_url: Optional[str]
+    has_subtopics: bool
+
+
+def _parse_row(row: Dict[str, Optional[str]]) -> Optional[Entry]:
+    """
+    Parse one CSV row into an entry.
+
+    Args:
+        row: Raw row from csv.DictReader
+
+    Returns:
+        Entry, or None if the row has no id
+    """
+    entry_id = (_cell(row['id']) or '').strip()
+    if not entry_id:
+        logger.warning(f"Skipping CSV row without id: {row}")
+        return None
+    parent_id = _cell(row['parent_id'])
+    # IDs repeat across entries, children and ancestor chains; share one copy
+    parent_id = sys.intern(parent_id.strip()) if parent_id is not None else None
+    image_url = _cell(row.get('image_url'))
+
+    return Entry(
+        id=sys.intern(entry_id),
+        parent_id=parent_id,
+        title=(_cell(row['title']) or '').strip(),
+        content_type=sys.intern((_cell(row['content_type']) or '').strip()),
+        content=_normalize_multiline_text(_cell(row['content'])),
+        image_url=image_url.strip() if image_url is not None else None,
+        has_subtopics=str(row['has_subtopics']).strip().lower() == 'true',
+    )
+
+
+class ContentSnapshot:
+    """
+    One fully indexed version of the content.
+
+    A snapshot is built completely before it is published by DataManager
+    and is never modified afterwards, so handlers holding a reference always
+    see a consistent tree.
+    """
+
+    def __init__(
+        self,
+        data: Dict[str, Entry],
+        children_map: Dict[str, Tuple[Entry, ...]],
+        ancestors: Dict[str, Tuple[str, ...]],
+        texts: Dict[str, str],
+        problems: List[str],
+        source_stat: Optional[Tuple[int, int]] = None,
+        version: int = 0,
+    ):
         """
-        Initialize DataManager.
+        Initialize ContentSnapshot.
 
         Args:
-            csv_path: Path to the CSV file containing content
+            data: entry_id -> Entry
+            children_map: parent_id -> child entries, in CSV order
+            ancestors: entry_id -> IDs from the root down to the parent
+            texts: entry_id -> message text
+            problems: Integrity warnings found while parsing
+            source_stat: (size, mtime_ns) of the CSV the snapshot was built from
+            version: Snapshot version number
         """
-        self.csv_path = csv_path
-        self.data: Dict[str, Dict[str, Any]] = {}
-        self.children_map: Dict[str, List[str]] = {}
-        self.load_data()
-
-    def load_data(self) -> bool:
+        self.data = data
+        self.children_map = children_map
+        self.ancestors = ancestors
+        self.texts = texts
+        self.problems = problems
+        self.source_stat = source_stat
+        self.version = version
+        self.render_cache: Dict[str, Any] = {}
+        self.search_index = SearchIndex()
+        self.prefix_index = PrefixIndex()
+
+    @classmethod
+    def empty(cls) -> 'ContentSnapshot':
+        """Snapshot with no content, used before the first successful load."""
+        return cls({}, {}, {}, {}, [])
+
+    def get_rendered(self, entry_id: str) -> Optional[Any]:
         """
-        Load and parse CSV file into memory.
+        Get the pre-rendered response for an entry.
+
+        Args:
+            entry_id: The entry ID
 
         Returns:
-            True if loaded successfully, False otherwise
+            The renderer's result for the entry, or None if not cached
         """
-        if not self.csv_path.exists():
-            logger.error(f"CSV file not found: {self.csv_path}")
-            return False
-
-        try:
-            df = pd.read_csv(self.csv_path)
-            
-            # Validate required columns
-            required_cols = {'id', 'parent_id', 'title', 'content_type', 'content', 'has_subtopics'}
-            if not required_cols.issubset(df.columns):
-                logger.error(f"CSV missing required columns. Required: {required_cols}")
-                return False
+        return self.render_cache.get(entry_id)
 
-            # Backward compatibility: allow CSV without image_url column
-            if 'image_url' not in df.columns:
-                logger.warning("CSV does not contain 'image_url' column. Defaulting image_url to None for all entries.")
-                df['image_url'] = None
-
-            # Reset data structures
-            self.data = {}
-            self.children_map = {}
-
-            # Process each row
-            for _, row in df.iterrows():
-                entry_id = str(row['id']).strip()
-                parent_id = str(row['parent_id']).strip() if pd.notna(row['parent_id']) else None
-
-                # Store entry data
-                self.data[entry_id] = {
-                    'id': entry_id,
-                    'parent_id': parent_id,
-                    'title': str(row['title']).strip(),
-                    'content_type': str(row['content_type']).strip(),
-                    'content': _normalize_multiline_text(row['content']),
-                    'image_url': str(row['image_url']).strip() if pd.notna(row['image_url']) else None,
-                    'has_subtopics': str(row['has_subtopics']).lower() == 'true',
-                }
-
-                # Build children map
-                if parent_id and parent_id != 'null':
-                    if parent_id not in self.children_map:
-                        self.children_map[parent_id] = []
-                    self.children_map[parent_id].append(entry_id)
-
-            logger.info(f"Successfully loaded {len(self.data)} entries from CSV")
-            self._validate_data()
-            return True
-
-        except Exception as e:
-            logger.error(f"Error loading CSV file: {e}")
-            return False
-
-    def _validate_data(self) -> None:
-        """Validate data integrity (warn about orphaned entries, etc)."""
-        for entry_id, entry in self.data.items():
-            parent_id = entry['parent_id']
-            
-            # Check if parent exists
-            if parent_id and parent_id not in self.data:
-                logger.warning(f"Entry '{entry_id}' has non-existent parent '{parent_id}'")
-
-    def get_entry(self, entry_id: str) -> Optional[Dict[str, Any]]:
+    def get_entry(self, entry_id: str) -> Optional[Entry]:
         """
         Get entry data by ID.
 
@@ -105,10 +146,22 @@ class DataManager:
             entry_id: The ID of the entry to retrieve
 
         Returns:
-            Entry data dictionary or None if not found
+            Entry or None if not found
         """
         return self.data.get(entry_id)
 
+    def get_text(self, entry_id: str) -> str:
+        """
+        Get the precomputed message text (title and content) for an entry.
+
+        Args:
+            entry_id: The entry ID
+
+        Returns:
+            Message text, or an empty string if the entry does not exist
+        """
+        return self.texts.get(entry_id, '')
+
     def get_children(self, parent_id: str) -> List[str]:
         """
         Get list of child entry IDs for a given parent.
@@ -119,9 +172,9 @@ class DataManager:
         Returns:
             List of child entry IDs
         """
-        return self.children_map.get(parent_id, [])
+        return [child.id for child in self.children_map.get(parent_id, ())]
 
-    def get_children_entries(self, parent_id: str) -> List[Dict[str, Any]]:
+    def get_children_entries(self, parent_id: str) -> Tuple[Entry, ...]:
         """
         Get full entry data for all children of a parent.
 
@@ -129,41 +182,470 @@ class DataManager:
             parent_id: The parent entry ID
 
         Returns:
-            List of child entry dictionaries
+            Tuple of child entries (shared, not copied)
         """
-        child_ids = self.get_children(parent_id)
-        return [self.data[cid] for cid in child_ids if cid in self.data]
+        return self.children_map.get(parent_id, ())
 
-    def get_root_entries(self) -> List[Dict[str, Any]]:
+    def get_root_entries(self) -> Tuple[Entry, ...]:
         """
         Get all root level entries (those with parent_id = null).
 
         Returns:
-            List of root entry dictionaries
+            Tuple of root entries
         """
         return self.get_children_entries('main')
 
-    def get_breadcrumb_path(self, entry_id: str) -> List[Dict[str, Any]]:
+    def get_breadcrumb_path(self, entry_id: str) -> List[Entry]:
         """
         Get the full path from root to the given entry.
 
+        Uses the ancestor chains computed at load time, so no parent
+        pointers are walked per call.
+
         Args:
             entry_id: The entry to get path for
 
         Returns:
-            List of entries from root to target, inclusive
+            List of entries from root to target, inclusive (empty if unknown)
+        """
+        entry = self.data.get(entry_id)
+        if not entry:
+            return []
+        return [self.data[ancestor_id] for ancestor_id in self.ancestors[entry_id]] + [entry]
+
+    def search(self, query: str, limit: int = 10) -> List[Entry]:
+        """
+        Full-text search over entry titles and content.
+
+        Root entries (the main menu and the intro) are not searchable.
+
+        Args:
+            query: Free-text query
+            limit: Maximum number of results
+
+        Returns:
+            Matching entries, best match first
+        """
+        return [self.data[entry_id] for entry_id, _ in self.search_index.search(query, limit)]
+
+    def complete(self, query: str, limit: int = 20) -> List[Entry]:
+        """
+        Autocomplete a partially typed query against entry titles and IDs.
+
+        Every word of the query must be a prefix of a title word or of an
+        ``_``-separated part of the ID. Root entries are not included.
+
+        Args:
+            query: Query text
+            limit: Maximum number of results
+
+        Returns:
+            Matching entries, shallowest first, then in CSV order
+        """
+        return [self.data[entry_id] for entry_id in self.prefix_index.complete(query, limit)]
+
+    def get_depth(self, entry_id: str) -> int:
+        """
+        Get how deep an entry sits in the tree.
+
+        Args:
+            entry_id: The entry ID
+
+        Returns:
+            Number of ancestors (0 for root entries and unknown IDs)
+        """
+        return len(self.ancestors.get(entry_id, ()))
+
+    def get_descendant_ids(self, entry_id: str) -> List[str]:
+        """
+        Get IDs of all entries below the given entry.
+
+        Args:
+            entry_id: The subtree root
+
+        Returns:
+            List of descendant entry IDs (the root itself excluded)
         """
-        path = []
-        current_id = entry_id
+        result = []
+        stack = list(self.children_map.get(entry_id, ()))
+        seen = set()
+        while stack:
+            child = stack.pop()
+            if child.id in seen:
+                continue
+            seen.add(child.id)
+            result.append(child.id)
+            stack.extend(self.children_map.get(child.id, ()))
+        return result
+
+    def is_valid(self) -> bool:
+        """Check if the snapshot holds any content."""
+        return len(self.data) > 0
+
+
+class DataManager:
+    """
+    Manages loading and organizing content from CSV file.
+
+    The loaded content lives in an immutable ContentSnapshot. (Re)loading
+    builds a complete new snapshot and publishes it with a single reference
+    assignment, so readers never observe an empty or partially parsed tree;
+    if loading fails, the previous snapshot stays in place. Handlers that
+    need several consistent lookups can take ``data_manager.snapshot`` once
+    and query it directly.
+    """
+
+    def __init__(
+        self,
+        csv_path: Path,
+        renderer: Optional[Callable[[ContentSnapshot, str], Any]] = None,
+        bundle_path: Optional[Path] = None,
+    ):
+        """
+        Initialize DataManager.
+
+        Args:
+            csv_path: Path to the CSV file containing content
+            renderer: Callable producing the ready-to-send response for an
+                entry (e.g. ``handlers.navigation.render_entry``). When given,
+                every entry is pre-rendered on each (re)load.
+            bundle_path: Compiled content bundle (see ``content_bundle``).
+                When given, it is loaded instead of parsing the CSV while it
+                matches the CSV, and rewritten after the CSV is parsed.
+        """
+        self.csv_path = csv_path
+        self.renderer = renderer
+        self.bundle_path = bundle_path
+        self.snapshot = ContentSnapshot.empty()
+        self._load_lock = threading.Lock()
+        self.load_data()
+
+    # Read-only views of the current snapshot
+    @property
+    def data(self) -> Dict[str, Entry]:
+        return self.snapshot.data
 
-        while current_id:
-            entry = self.get_entry(current_id)
-            if not entry:
-                break
-            path.insert(0, entry)
-            current_id = entry['parent_id']
+    @property
+    def children_map(self) -> Dict[str, Tuple[Entry, ...]]:
+        return self.snapshot.children_map
 
-        return path
+    @property
+    def ancestors(self) -> Dict[str, Tuple[str, ...]]:
+        return self.snapshot.ancestors
+
+    @property
+    def texts(self) -> Dict[str, str]:
+        return self.snapshot.texts
+
+    @property
+    def problems(self) -> List[str]:
+        return self.snapshot.problems
+
+    @property
+    def render_cache(self) -> Dict[str, Any]:
+        return self.snapshot.render_cache
+
+    @property
+    def version(self) -> int:
+        return self.snapshot.version
+
+    def load_data(self) -> bool:
+        """
+        Load content from the bundle or the CSV file and publish it.
+
+        Returns:
+            True if loaded successfully, False otherwise (the previously
+            loaded content is kept)
+        """
+        with self._load_lock:
+            snapshot = self._build_snapshot()
+            if snapshot is None:
+                return False
+            self.snapshot = snapshot
+            return True
+
+    def _build_snapshot(self) -> Optional[ContentSnapshot]:
+        """
+        Build a complete snapshot without touching the published one.
+
+        Returns:
+            The new snapshot, or None on error
+        """
+        if not self.csv_path.exists():
+            logger.error(f"CSV file not found: {self.csv_path}")
+            return None
+
+        # Stat before reading so edits made while parsing trigger another reload
+        source_stat = self.source_stat()
+        payload = read_bundle(self.bundle_path, self.csv_path) if self.bundle_path else None
+        if payload is not None:
+            logger.info(f"Successfully loaded {len(payload['data'])} entries from content bundle")
+        else:
+            payload = self._parse_csv()
+            if payload is None:
+                return None
+            payload['search_index'], payload['prefix_index'] = self._build_indexes(payload)
+            if self.bundle_path:
+                write_bundle(self.bundle_path, self.csv_path, payload)
+
+        snapshot = ContentSnapshot(
+            payload['data'],
+            payload['children_map'],
+            payload['ancestors'],
+            payload['texts'],
+            payload['problems'],
+            source_stat=source_stat,
+            version=self.snapshot.version + 1,
+        )
+        snapshot.search_index = payload['search_index']
+        snapshot.prefix_index = payload['prefix_index']
+        # Rendered with the current config and images; neither is in the bundle
+        if self.renderer:
+            snapshot.render_cache = {
+                entry_id: self.renderer(snapshot, entry_id)
+                for entry_id in snapshot.data
+            }
+        return snapshot
+
+    def _build_indexes(self, payload: Dict[str, Any]) -> Tuple[SearchIndex, PrefixIndex]:
+        """
+        Build the search and autocomplete indexes over the non-root entries.
+
+        Args:
+            payload: Parsed entries and ancestor chains from ``_parse_csv``
+
+        Returns:
+            Tuple of (search index, prefix index)
+        """
+        data, ancestors = payload['data'], payload['ancestors']
+        searchable = [entry for entry_id, entry in data.items() if ancestors.get(entry_id)]
+        # Entries whose text did not change keep their analysis from the previous index
+        search_index = SearchIndex.build(
+            {entry.id: (entry.title, entry.content) for entry in searchable},
+            previous=self.snapshot.search_index,
+        )
+        searchable.sort(key=lambda entry: len(ancestors[entry.id]))
+        prefix_index = PrefixIndex.build({entry.id: entry.title for entry in searchable})
+        return search_index, prefix_index
+
+    def _parse_csv(self) -> Optional[Dict[str, Any]]:
+        """
+        Parse the CSV file and build indexes.
+
+        Returns:
+            Payload with entries and indexes, or None on error
+        """
+        try:
+            data: Dict[str, Entry] = {}
+            child_ids: Dict[str, List[str]] = {}
+            with open(self.csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+                reader = csv.DictReader(f)
+
+                # Validate required columns
+                columns = set(reader.fieldnames or ())
+                if not REQUIRED_COLUMNS.issubset(columns):
+                    logger.error(f"CSV missing required columns. Required: {REQUIRED_COLUMNS}")
+                    return None
+
+                # Backward compatibility: allow CSV without image_url column
+                if 'image_url' not in columns:
+                    logger.warning("CSV does not contain 'image_url' column. Defaulting image_url to None for all entries.")
+
+                # Process each row
+                for row in reader:
+                    entry = _parse_row(row)
+                    if entry is None:
+                        continue
+                    entry_id = entry.id
+                    parent_id = entry.parent_id
+                    data[entry_id] = entry
+
+                    # Build children map
+                    if parent_id and parent_id != 'null':
+                        if parent_id not in child_ids:
+                            child_ids[parent_id] = []
+                        child_ids[parent_id].append(entry_id)
+
+            # Resolve child IDs to entries once, instead of on every lookup
+            children_map = {
+                parent_id: tuple(data[cid] for cid in ids if cid in data)
+                for parent_id, ids in child_ids.items()
+            }
+
+            logger.info(f"Successfully loaded {len(data)} entries from CSV")
+            ancestors, hierarchy_problems = self._build_hierarchy(data, children_map)
+            return {
+                'data': data,
+                'children_map': children_map,
+                'ancestors': ancestors,
+                'texts': self._build_texts(data),
+                'problems': self._validate_data(data) + hierarchy_problems,
+            }
+
+        except Exception as e:
+            logger.error(f"Error loading CSV file: {e}")
+            return None
+
+    @staticmethod
+    def _validate_data(data: Dict[str, Entry]) -> List[str]:
+        """Validate data integrity (warn about orphaned entries, etc)."""
+        problems = []
+        for entry_id, entry in data.items():
+            parent_id = entry.parent_id
+            
+            # Check if parent exists
+            if parent_id and parent_id not in data:
+                problems.append(f"Entry '{entry_id}' has non-existent parent '{parent_id}'")
+
+        for problem in problems:
+            logger.warning(problem)
+        return problems
+
+    @staticmethod
+    def _build_texts(data: Dict[str, Entry]) -> Dict[str, str]:
+        """Precompute the message text (title and content) of every entry."""
+        texts = {}
+        for entry_id, entry in data.items():
+            text = entry.title
+            # Show content for both text and menu entries when content exists
+            if entry.content:
+                text += f"\n\n{entry.content}"
+            texts[entry_id] = text
+        return texts
+
+    @staticmethod
+    def _build_hierarchy(
+        data: Dict[str, Entry],
+        children_map: Dict[str, Tuple[Entry, ...]],
+    ) -> Tuple[Dict[str, Tuple[str, ...]], List[str]]:
+        """
+        Compute every entry's ancestor chain in one pass over the tree.
+
+        Entries are visited top-down from the root entries, so each chain is
+        the parent's chain plus the parent. Entries whose parent is missing
+        start their own chain. Whatever is left after that sits on or below
+        a parent cycle: each cycle is reported and broken at one of its
+        entries, which then acts as a root, so lookups never loop.
+
+        Args:
+            data: entry_id -> Entry
+            children_map: parent_id -> child entries
+
+        Returns:
+            Tuple of (entry_id -> ancestor IDs from the root down to the
+            parent, list of hierarchy problems)
+        """
+        ancestors: Dict[str, Tuple[str, ...]] = {}
+        problems = []
+
+        def descend(root_id: str) -> None:
+            ancestors[root_id] = ()
+            stack = [root_id]
+            while stack:
+                parent_id = stack.pop()
+                chain = ancestors[parent_id] + (parent_id,)
+                for child in children_map.get(parent_id, ()):
+                    if child.id not in ancestors:
+                        ancestors[child.id] = chain
+                        stack.append(child.id)
+
+        roots = [
+            entry_id for entry_id, entry in data.items()
+            if not entry.parent_id or entry.parent_id == 'null'
+        ]
+        for entry_id in roots:
+            descend(entry_id)
+        for entry_id, entry in data.items():
+            if entry_id not in ancestors and entry.parent_id not in data:
+                descend(entry_id)
+
+        for entry_id in data:
+            if entry_id in ancestors:
+                continue
+            # Walk up until the walk repeats itself: that entry is on a cycle
+            path = []
+            on_path = set()
+            current_id = entry_id
+            while current_id not in on_path and current_id not in ancestors:
+                on_path.add(current_id)
+                path.append(current_id)
+                current_id = data[current_id].parent_id
+            if current_id in on_path:
+                cycle = path[path.index(current_id):]
+                problems.append(
+                    f"Entries form a parent cycle: {' -> '.join(cycle + [current_id])}"
+                )
+                descend(current_id)
+
+        # Orphaned and cyclic subtrees were given their own top entries above
+        root_ids = set(roots)
+        unreachable = []
+        for entry_id in data:
+            chain = ancestors[entry_id]
+            top_id = chain[0] if chain else entry_id
+            if top_id not in root_ids:
+                unreachable.append(entry_id)
+        if unreachable:
+            problems.append(
+                f"{len(unreachable)} entries are not reachable from a root entry: "
+                f"{', '.join(unreachable)}"
+            )
+
+        for problem in problems:
+            logger.warning(problem)
+        return ancestors, problems
+
+    def source_stat(self) -> Optional[Tuple[int, int]]:
+        """(size, mtime_ns) of the CSV file, or None if it does not exist."""
+        try:
+            stat = self.csv_path.stat()
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def get_rendered(self, entry_id: str) -> Optional[Any]:
+        """Get the pre-rendered response for an entry (see ContentSnapshot)."""
+        return self.snapshot.get_rendered(entry_id)
+
+    def get_entry(self, entry_id: str) -> Optional[Entry]:
+        """Get entry data by ID (see ContentSnapshot)."""
+        return self.snapshot.get_entry(entry_id)
+
+    def get_text(self, entry_id: str) -> str:
+        """Get the precomputed message text for an entry (see ContentSnapshot)."""
+        return self.snapshot.get_text(entry_id)
+
+    def get_children(self, parent_id: str) -> List[str]:
+        """Get list of child entry IDs for a given parent (see ContentSnapshot)."""
+        return self.snapshot.get_children(parent_id)
+
+    def get_children_entries(self, parent_id: str) -> Tuple[Entry, ...]:
+        """Get full entry data for all children of a parent (see ContentSnapshot)."""
+        return self.snapshot.get_children_entries(parent_id)
+
+    def get_root_entries(self) -> Tuple[Entry, ...]:
+        """Get all root level entries (see ContentSnapshot)."""
+        return self.snapshot.get_root_entries()
+
+    def get_breadcrumb_path(self, entry_id: str) -> List[Entry]:
+        """Get the full path from root to the given entry (see ContentSnapshot)."""
+        return self.snapshot.get_breadcrumb_path(entry_id)
+
+    def search(self, query: str, limit: int = 10) -> List[Entry]:
+        """Full-text search over entry titles and content (see ContentSnapshot)."""
+        return self.snapshot.search(query, limit)
+
+    def complete(self, query: str, limit: int = 20) -> List[Entry]:
+        """Autocomplete a query against entry titles and IDs (see ContentSnapshot)."""
+        return self.snapshot.complete(query, limit)
+
+    def get_depth(self, entry_id: str) -> int:
+        """Get how deep an entry sits in the tree (see ContentSnapshot)."""
+        return self.snapshot.get_depth(entry_id)
+
+    def get_descendant_ids(self, entry_id: str) -> List[str]:
+        """Get IDs of all entries below the given entry (see ContentSnapshot)."""
+        return self.snapshot.get_descendant_ids(entry_id)
 
     def reload(self) -> bool:
         """
@@ -175,6 +657,68 @@ class DataManager:
         logger.info("Reloading data from CSV...")
         return self.load_data()
 
+    async def reload_async(self) -> bool:
+        """
+        Reload data in a worker thread so the event loop keeps serving updates.
+
+        Returns:
+            True if reload successful, False otherwise
+        """
+        return await asyncio.to_thread(self.reload)
+
     def is_valid(self) -> bool:
         """Check if data was loaded successfully."""
-        return len(self.data) > 0
+        return self.snapshot.is_valid()
+
+
+class ContentWatcher:
+    """
+    Polls the content CSV and reloads DataManager once edits have settled.
+
+    A change is only acted on after the file's size and mtime have stayed
+    the same for ``debounce`` seconds, so saving a file several times in a
+    row (or copying it over slowly) causes a single reload. A file that
+    failed to load is not retried until it changes again.
+    """
+
+    def __init__(self, data_manager: DataManager, debounce: float = 2.0):
+        """
+        Initialize ContentWatcher.
+
+        Args:
+            data_manager: The DataManager to reload
+            debounce: Seconds the file must stay unchanged before reloading
+        """
+        self.data_manager = data_manager
+        self.debounce = debounce
+        self._pending_stat: Optional[Tuple[int, int]] = None
+        self._pending_since = 0.0
+        self._failed_stat: Optional[Tuple[int, int]] = None
+
+    async def poll(self) -> bool:
+        """
+        Check the CSV file and reload it if it changed and has settled.
+
+        Returns:
+            True if a reload happened and succeeded, False otherwise
+        """
+        stat = self.data_manager.source_stat()
+        if stat is None or stat == self.data_manager.snapshot.source_stat or stat == self._failed_stat:
+            self._pending_stat = None
+            return False
+
+        now = time.monotonic()
+        if stat != self._pending_stat:
+            self._pending_stat = stat
+            self._pending_since = now
+            return False
+        if now - self._pending_since < self.debounce:
+            return False
+
+        self._pending_stat = None
+        logger.info(f"Content file {self.data_manager.csv_path} changed, reloading")
+        if await self.data_manager.reload_async():
+            self._failed_stat = None
+            return True
+        self._failed_stat = stat
+        return False
@@ -1,27 +1,59 @@
 """Admin command handlers."""
 import logging
+from datetime import datetime
+from typing import Dict
 from telegram import Update, constants
 from telegram.ext import ContextTypes
+from data_manager import DataManager
+from rate_limiter import PRIORITY_ADMIN, PriorityRateLimiter, set_request_priority
 from stats_manager import StatsManager
+import config
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_TOP_ENTRIES = 5
+MAX_TOP_ENTRIES = 50
+WEEKS_SHOWN = 8
+MONTHS_SHOWN = 6
+
 
 async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
     Show bot statistics.
 
+    Usage: /stats [N] [entry_id] - show the top N entries, optionally only
+    those under the given menu entry (e.g. /stats 10 vidznaky).
+
     Args:
         update: The update object
         context: The context object
     """
+    set_request_priority(PRIORITY_ADMIN)
     stats_manager: StatsManager = context.bot_data.get('stats_manager')
     if not stats_manager:
         await update.message.reply_text("❌ Статистика недоступна.")
         return
 
+    # Parse optional leaderboard size and subtree
+    args = context.args or []
+    top_limit = DEFAULT_TOP_ENTRIES
+    subtree_id = None
+    for arg in args:
+        if arg.isdigit():
+            top_limit = max(1, min(int(arg), MAX_TOP_ENTRIES))
+        else:
+            subtree_id = arg
+
+    top_within = None
+    if subtree_id:
+        data_manager: DataManager = context.bot_data.get('data_manager')
+        if not data_manager or not data_manager.get_entry(subtree_id):
+            await update.message.reply_text(f"❌ Розділ '{subtree_id}' не знайдено.")
+            return
+        top_within = set(data_manager.get_descendant_ids(subtree_id))
+
     # Get stats summary
-    summary = stats_manager.get_stats_summary()
+    summary = stats_manager.get_stats_summary(top_limit=top_limit, top_within=top_within)
     top_entries = summary['top_entries']
     commands = summary['commands_used']
 
@@ -36,7 +68,10 @@ async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     text += f"🖱 <b>Кліки:</b> {summary['total_clicks']}\n\n"
     
     if top_entries:
-        text += "🔝 <b>Популярні розділи:</b>\n"
+        if subtree_id:
+            text += f"🔝 <b>Популярні розділи в {subtree_id}:</b>\n"
+        else:
+            text += "🔝 <b>Популярні розділи:</b>\n"
         for entry_id, count in top_entries:
             text += f"  • {entry_id}: {count} кліків\n"
         text += "\n"
@@ -47,6 +82,17 @@ async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
             text += f"  • /{cmd}: {count}\n"
         text += "\n"
     
+    rate_limiter = context.bot.rate_limiter
+    if isinstance(rate_limiter, PriorityRateLimiter):
+        queues = rate_limiter.metrics()
+        text += "📤 <b>Черга запитів до Telegram:</b>\n"
+        for name, queue in queues['classes'].items():
+            text += (
+                f"  • {name}: зараз {queue['queued']}, максимум {queue['peak_queued']}, "
+                f"надіслано {queue['sent']}, очікування {queue['avg_wait_ms']:.0f} мс\n"
+            )
+        text += f"  • RetryAfter: {queues['retry_after_hits']}\n\n"
+
     text += f"📅 Створено: {summary['created_at'][:10]}\n"
     text += f"🔄 Оновлено: {summary['last_updated'][:19].replace('T', ' ')}"
 
@@ -56,6 +102,34 @@ async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     )
 
 
+async def reload(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Reload content from the CSV file without restarting the bot (admins only).
+
+    Args:
+        update: The update object
+        context: The context object
+    """
+    set_request_priority(PRIORITY_ADMIN)
+    if update.effective_user.id not in config.ADMIN_USER_IDS:
+        await update.message.reply_text("⛔ Ця команда доступна лише адміністраторам.")
+        return
+
+    data_manager: DataManager = context.bot_data.get('data_manager')
+    if not data_manager:
+        await update.message.reply_text("❌ Data manager не ініціалізований.")
+        return
+
+    if await data_manager.reload_async():
+        await update.message.reply_text(
+            f"✅ Дані успішно перезавантажені! Записів: {len(data_manager.data)}"
+        )
+    else:
+        await update.message.reply_text(
+            "❌ Помилка при перезавантаженні даних. Залишено попередню версію."
+        )
+
+
 async def stats_daily(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
     Show daily statistics for the last week.
@@ -64,6 +138,7 @@ async def stats_daily(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         update: The update object
         context: The context object
     """
+    set_request_priority(PRIORITY_ADMIN)
     stats_manager: StatsManager = context.bot_data.get('stats_manager')
     if not stats_manager:
         await update.message.reply_text("❌ Статистика недоступна.")
@@ -80,12 +155,79 @@ async def stats_daily(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         text += f"  👥 Користувачів: {day_data['unique_users']}\n"
         text += f"  🖱 Кліків: {day_data['clicks']}\n\n"
 
+    text += "👥 <b>Унікальні користувачі:</b>\n"
+    text += f"  • За 7 днів: {stats_manager.get_unique_users(7)}\n"
+    text += f"  • За 30 днів: {stats_manager.get_unique_users(30)}"
+
     await update.message.reply_text(
         text=text,
         parse_mode=constants.ParseMode.HTML
     )
 
 
+def format_period_stats(title: str, periods: Dict[str, Dict[str, int]]) -> str:
+    """
+    Format weekly or monthly statistics, most recent first.
+
+    Args:
+        title: Message heading
+        periods: Result of ``get_weekly_stats`` or ``get_monthly_stats``
+
+    Returns:
+        Message text (HTML)
+    """
+    text = f"{title}\n\n"
+    for key in sorted(periods, reverse=True):
+        period = periods[key]
+        text += f"<b>{key}</b>\n"
+        text += f"  👥 Користувачів: {period['unique_users']}\n"
+        text += f"  🖱 Кліків: {period['clicks']}\n"
+        text += f"  📆 Днів з активністю: {period['days']}\n\n"
+    return text.rstrip()
+
+
+async def stats_weekly(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Show statistics of the last weeks.
+
+    Args:
+        update: The update object
+        context: The context object
+    """
+    set_request_priority(PRIORITY_ADMIN)
+    stats_manager: StatsManager = context.bot_data.get('stats_manager')
+    if not stats_manager:
+        await update.message.reply_text("❌ Статистика недоступна.")
+        return
+
+    weekly = stats_manager.get_weekly_stats(WEEKS_SHOWN)
+    await update.message.reply_text(
+        text=format_period_stats(f"📆 <b>Тижнева статистика (останні {WEEKS_SHOWN} тижнів)</b>", weekly),
+        parse_mode=constants.ParseMode.HTML
+    )
+
+
+async def stats_monthly(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Show statistics of the last months.
+
+    Args:
+        update: The update object
+        context: The context object
+    """
+    set_request_priority(PRIORITY_ADMIN)
+    stats_manager: StatsManager = context.bot_data.get('stats_manager')
+    if not stats_manager:
+        await update.message.reply_text("❌ Статистика недоступна.")
+        return
+
+    monthly = stats_manager.get_monthly_stats(MONTHS_SHOWN)
+    await update.message.reply_text(
+        text=format_period_stats(f"🗓 <b>Місячна статистика (останні {MONTHS_SHOWN} місяців)</b>", monthly),
+        parse_mode=constants.ParseMode.HTML
+    )
+
+
 async def stats_users(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
     Show user list with details.
@@ -94,39 +236,36 @@ async def stats_users(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         update: The update object
         context: The context object
     """
+    set_request_priority(PRIORITY_ADMIN)
     stats_manager: StatsManager = context.bot_data.get('stats_manager')
     if not stats_manager:
         await update.message.reply_text("❌ Статистика недоступна.")
         return
 
-    users = stats_manager.stats['users']
+    total_users = stats_manager.get_total_users()
     
-    if not users:
+    if not total_users:
         await update.message.reply_text("Ще немає користувачів.")
         return
 
-    text = f"👥 <b>Користувачі ({len(users)})</b>\n\n"
+    text = f"👥 <b>Користувачі ({total_users})</b>\n\n"
     
-    # Sort by last seen (most recent first)
-    sorted_users = sorted(
-        users.items(),
-        key=lambda x: x[1]['last_seen'],
-        reverse=True
-    )
+    # Most recently seen first
+    recent_users = stats_manager.get_recent_users(20)  # Show max 20 users
     
-    for user_id, user_data in sorted_users[:20]:  # Show max 20 users
+    for user_id, user_data in recent_users:
         username = user_data.get('username', 'N/A')
         first_name = user_data.get('first_name', 'N/A')
         interactions = user_data.get('interactions', 0)
-        last_seen = user_data['last_seen'][:10]
+        last_seen = datetime.fromtimestamp(user_data['last_seen']).strftime('%Y-%m-%d')
         
         text += f"<b>{first_name}</b> (@{username})\n"
         text += f"  ID: {user_id}\n"
         text += f"  Взаємодій: {interactions}\n"
         text += f"  Останній візит: {last_seen}\n\n"
     
-    if len(users) > 20:
-        text += f"... і ще {len(users) - 20} користувачів"
+    if total_users > 20:
+        text += f"... і ще {total_users - 20} користувачів"
 
     await update.message.reply_text(
         text=text,
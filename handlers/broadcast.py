@@ -0,0 +1,215 @@
+"""Broadcast command handler and background job."""
+import logging
+from typing import Any, Dict, Optional
+from telegram import Update, constants
+from telegram.error import BadRequest
+from telegram.ext import ContextTypes, JobQueue
+from handlers.navigation import get_rendered_entry
+from broadcast_manager import BroadcastManager
+from data_manager import DataManager
+from rate_limiter import PRIORITY_ADMIN, set_request_priority
+from stats_manager import StatsManager
+import config
+
+logger = logging.getLogger(__name__)
+
+USAGE = (
+    "📣 Розсилка всім користувачам бота:\n"
+    "/broadcast <текст> - надіслати оголошення\n"
+    "/broadcast entry <id> - надіслати розділ довідника\n"
+    "/broadcast status - хід поточної розсилки\n"
+    "/broadcast cancel - зупинити розсилку"
+)
+
+STATUS_TITLES = {
+    'running': "📣 Розсилка триває",
+    'done': "✅ Розсилку завершено",
+    'cancelled': "⏹ Розсилку зупинено",
+}
+
+
+def format_duration(seconds: float) -> str:
+    """Format a duration as e.g. '1 год 5 хв' or '40 с'."""
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds} с"
+    hours, minutes = divmod(seconds // 60, 60)
+    return f"{hours} год {minutes} хв" if hours else f"{minutes} хв"
+
+
+def format_progress(progress: Dict[str, Any]) -> str:
+    """
+    Describe broadcast progress for the admin.
+
+    Args:
+        progress: Result of ``BroadcastManager.progress()``
+
+    Returns:
+        Message text
+    """
+    text = (
+        f"{STATUS_TITLES.get(progress['status'], progress['status'])}\n\n"
+        f"Оброблено: {progress['processed']} з {max(progress['total'], progress['processed'])} "
+        f"({progress['percent']:.0f}%)\n"
+        f"✉️ Доставлено: {progress['delivered']}\n"
+        f"⚠️ Помилки: {progress['failed']}\n"
+        f"🚫 Видалено (заблокували бота): {progress['pruned']}\n"
+        f"⚡️ Швидкість: {progress['rate']:.1f} повідомл./с"
+    )
+    if progress['status'] == 'running' and progress['eta_s'] is not None:
+        text += f"\n⏳ Залишилось: ~{format_duration(progress['eta_s'])}"
+    return text
+
+
+def build_send_kwargs(message: Dict[str, str], data_manager: DataManager) -> Optional[Dict[str, Any]]:
+    """
+    Build ``send_message`` arguments for a broadcast message.
+
+    Args:
+        message: ``{'text': ...}`` or ``{'entry_id': ...}``
+        data_manager: Content source for handbook entries
+
+    Returns:
+        Keyword arguments, or None if the entry no longer exists
+    """
+    if 'text' in message:
+        return {'text': message['text']}
+    content = data_manager.snapshot
+    if not content.get_entry(message['entry_id']):
+        return None
+    # Same message as inline mode: the entry's text with its keyboard
+    rendered = get_rendered_entry(content, message['entry_id'])
+    return {
+        'text': rendered.text,
+        'reply_markup': rendered.keyboard,
+        'parse_mode': constants.ParseMode.MARKDOWN,
+        'link_preview_options': rendered.link_preview,
+    }
+
+
+def schedule_broadcast(job_queue: JobQueue) -> None:
+    """
+    Run the current broadcast in the background.
+
+    Args:
+        job_queue: The application's job queue
+    """
+    job_queue.run_once(run_broadcast, when=0, name='broadcast')
+
+
+async def run_broadcast(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Job sending the current broadcast, reporting progress to the admin.
+
+    Args:
+        context: The job context
+    """
+    broadcast_manager: BroadcastManager = context.bot_data.get('broadcast_manager')
+    stats_manager: StatsManager = context.bot_data.get('stats_manager')
+    data_manager: DataManager = context.bot_data.get('data_manager')
+    if not broadcast_manager or not broadcast_manager.is_running or not stats_manager:
+        return
+
+    state = broadcast_manager.state
+    send_kwargs = build_send_kwargs(state['message'], data_manager)
+    if send_kwargs is None:
+        broadcast_manager.cancel()
+        logger.error(f"Broadcast cancelled: entry {state['message']['entry_id']} no longer exists")
+
+    async def report(progress: Dict[str, Any]) -> None:
+        text = format_progress(progress)
+        try:
+            if progress['progress_message_id']:
+                await context.bot.edit_message_text(
+                    text,
+                    chat_id=progress['admin_chat_id'],
+                    message_id=progress['progress_message_id'],
+                )
+            else:
+                await context.bot.send_message(progress['admin_chat_id'], text)
+        except BadRequest as e:
+            # Unchanged text, or the admin deleted the progress message
+            logger.debug(f"Broadcast progress not updated: {e}")
+
+    set_request_priority(PRIORITY_ADMIN)
+    if send_kwargs is None:
+        await report(broadcast_manager.progress())
+        return
+    await broadcast_manager.run(
+        context.bot,
+        stats_manager,
+        send_kwargs,
+        on_progress=report,
+        # Stop after the current batch when the bot shuts down
+        keep_going=lambda: context.application.running,
+    )
+
+
+async def broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Handle /broadcast command (admins only).
+
+    Usage: /broadcast <text> | entry <id> | status | cancel
+
+    Args:
+        update: The update object
+        context: The context object
+    """
+    set_request_priority(PRIORITY_ADMIN)
+    if update.effective_user.id not in config.ADMIN_USER_IDS:
+        await update.message.reply_text("⛔ Ця команда доступна лише адміністраторам.")
+        return
+
+    broadcast_manager: BroadcastManager = context.bot_data.get('broadcast_manager')
+    stats_manager: StatsManager = context.bot_data.get('stats_manager')
+    if not broadcast_manager or not stats_manager:
+        await update.message.reply_text("❌ Розсилка недоступна.")
+        return
+
+    # Keep the announcement's line breaks: take the text after the command as is
+    parts = update.message.text.split(None, 1)
+    argument = parts[1].strip() if len(parts) > 1 else ''
+    if not argument:
+        await update.message.reply_text(USAGE)
+        return
+
+    if argument == 'status':
+        if not broadcast_manager.state:
+            await update.message.reply_text("Розсилок ще не було.")
+        else:
+            await update.message.reply_text(format_progress(broadcast_manager.progress()))
+        return
+
+    if argument == 'cancel':
+        if broadcast_manager.cancel():
+            await update.message.reply_text("⏹ Розсилку буде зупинено після поточної партії.")
+        else:
+            await update.message.reply_text("Зараз немає активної розсилки.")
+        return
+
+    keyword, _, entry_id = argument.partition(' ')
+    if keyword == 'entry':
+        entry_id = entry_id.strip()
+        data_manager: DataManager = context.bot_data.get('data_manager')
+        if not data_manager or not data_manager.get_entry(entry_id):
+            await update.message.reply_text(f"❌ Розділ '{entry_id}' не знайдено.")
+            return
+        message = {'entry_id': entry_id}
+    else:
+        message = {'text': argument}
+
+    try:
+        broadcast_manager.start(
+            message,
+            admin_chat_id=update.effective_chat.id,
+            total=stats_manager.get_total_users(),
+        )
+    except RuntimeError:
+        await update.message.reply_text(
+            "⏳ Інша розсилка ще триває. Дивіться /broadcast status або /broadcast cancel."
+        )
+        return
+
+    progress_message = await update.message.reply_text(format_progress(broadcast_manager.progress()))
+    broadcast_manager.set_progress_message(progress_message.message_id)
+    schedule_broadcast(context.job_queue)
@@ -1,45 +1,134 @@
 """Callback query handlers for inline buttons."""
 import logging
-from telegram import LinkPreviewOptions, Update, constants
+from telegram import InputMediaPhoto, Message, Update, constants
+from telegram.error import BadRequest, RetryAfter
 from telegram.ext import ContextTypes
 from handlers.navigation import (
-    build_keyboard_for_entry,
-    get_message_content,
+    RenderedEntry,
+    get_rendered_entry,
     extract_entry_id_from_callback,
 )
 from data_manager import DataManager
+from media_cache import MediaCache
+from rate_limiter import PRIORITY_ADMIN, set_request_priority
 from stats_manager import StatsManager
 import config
 
 logger = logging.getLogger(__name__)
 
+# Parts of BadRequest messages that mean Telegram no longer accepts a file_id
+FILE_ID_ERRORS = ('file identifier', 'file reference', 'file_id', 'wrong remote file')
+
+
+def _is_file_id_error(error: BadRequest) -> bool:
+    """Whether a BadRequest rejects the file itself, not e.g. the caption's markup."""
+    message = error.message.lower()
+    return any(part in message for part in FILE_ID_ERRORS)
+
+
+async def _send_photo(
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    rendered: RenderedEntry,
+    media_cache: MediaCache,
+) -> None:
+    """Send an entry as a photo, by cached file_id when the image was uploaded before."""
+    digest, file_id = media_cache.lookup(rendered.photo)
+    if file_id:
+        try:
+            await context.bot.send_photo(
+                chat_id=chat_id,
+                photo=file_id,
+                caption=rendered.text,
+                reply_markup=rendered.keyboard,
+                parse_mode=constants.ParseMode.MARKDOWN,
+            )
+            return
+        except BadRequest as e:
+            if not _is_file_id_error(e):
+                raise
+            logger.warning(f"Cached file_id for {rendered.photo.name} was rejected, uploading again")
+            media_cache.forget(digest)
+
+    with open(rendered.photo, 'rb') as photo:
+        message = await context.bot.send_photo(
+            chat_id=chat_id,
+            photo=photo,
+            caption=rendered.text,
+            reply_markup=rendered.keyboard,
+            parse_mode=constants.ParseMode.MARKDOWN,
+        )
+    media_cache.remember(digest, message.photo[-1].file_id)
+
+
+async def _edit_photo(
+    update: Update,
+    rendered: RenderedEntry,
+    media_cache: MediaCache,
+) -> None:
+    """Replace the photo and caption of a photo message with an entry's."""
+    query = update.callback_query
+    digest, file_id = media_cache.lookup(rendered.photo)
+    if file_id:
+        try:
+            await query.edit_message_media(
+                media=InputMediaPhoto(
+                    file_id,
+                    caption=rendered.text,
+                    parse_mode=constants.ParseMode.MARKDOWN,
+                ),
+                reply_markup=rendered.keyboard,
+            )
+            return
+        except BadRequest as e:
+            if 'not modified' in str(e):
+                return
+            if not _is_file_id_error(e):
+                raise
+            logger.warning(f"Cached file_id for {rendered.photo.name} was rejected, uploading again")
+            media_cache.forget(digest)
+
+    with open(rendered.photo, 'rb') as photo:
+        message = await query.edit_message_media(
+            media=InputMediaPhoto(
+                photo,
+                caption=rendered.text,
+                parse_mode=constants.ParseMode.MARKDOWN,
+            ),
+            reply_markup=rendered.keyboard,
+        )
+    if isinstance(message, Message) and message.photo:
+        media_cache.remember(digest, message.photo[-1].file_id)
+
 
 async def _render_entry(
     update: Update,
     context: ContextTypes.DEFAULT_TYPE,
-    text: str,
-    keyboard,
-    image_url: str | None,
+    rendered: RenderedEntry,
 ) -> None:
-    """Render entry content as a text message with optional image link preview."""
+    """Render entry content as a photo with caption, or as text with optional image link preview."""
     query = update.callback_query
     message = query.message
+    text, keyboard, link_preview, photo = rendered
+    media_cache: MediaCache = context.bot_data.get('media_cache')
 
-    # Build link preview options for image URLs
-    link_preview = None
-    if image_url and image_url != 'null' and image_url.startswith('http'):
-        link_preview = LinkPreviewOptions(
-            url=image_url,
-            prefer_large_media=True,
-            show_above_text=True,
-        )
-
-    # If previous message was a photo, delete and send fresh text message
-    if message and message.photo:
+    # Messages sent in inline mode (no message object) cannot be deleted and
+    # resent, so they always fall back to text with a link preview
+    if photo and media_cache and message:
+        if message.photo:
+            await _edit_photo(update, rendered, media_cache)
+            return
+        # A text message cannot be edited into a photo: send the photo, then
+        # delete the old message, so a failed send leaves the menu in place
+        await _send_photo(context, message.chat_id, rendered, media_cache)
         try:
             await message.delete()
         except Exception:
-            logger.warning("Failed to delete previous photo message", exc_info=True)
+            logger.warning("Failed to delete previous text message", exc_info=True)
+        return
+
+    # If previous message was a photo, send a fresh text message and delete the photo
+    if message and message.photo:
         await context.bot.send_message(
             chat_id=message.chat_id,
             text=text,
@@ -47,6 +136,10 @@ async def _render_entry(
             parse_mode=constants.ParseMode.MARKDOWN,
             link_preview_options=link_preview,
         )
+        try:
+            await message.delete()
+        except Exception:
+            logger.warning("Failed to delete previous photo message", exc_info=True)
         return
 
     await query.edit_message_text(
@@ -73,6 +166,9 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         await query.edit_message_text("❌ Виникла помилка. Спробуйте пізніше.")
         return
 
+    # Use one content version for the whole update, even if a reload lands meanwhile
+    content = data_manager.snapshot
+
     callback_data = query.data
     
     # Extract entry ID based on callback prefix
@@ -98,45 +194,51 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         stats_manager.track_click(entry_id, user_id=user.id)
 
     # Get entry data
-    entry = data_manager.get_entry(entry_id)
+    entry = content.get_entry(entry_id)
     if not entry:
         # Entry not found - redirect to main menu gracefully
-        main_entry = data_manager.get_entry('main')
+        main_entry = content.get_entry('main')
         if main_entry:
-            text, _ = get_message_content(data_manager, 'main')
-            keyboard = build_keyboard_for_entry(data_manager, 'main')
-            await query.edit_message_text(
-                text=text,
-                reply_markup=keyboard,
-                parse_mode=constants.ParseMode.MARKDOWN
-            )
+            # The current message may be a photo, which cannot be edited into text
+            await _render_entry(update, context, get_rendered_entry(content, 'main'))
         else:
             await query.edit_message_text("❌ Помилка завантаження даних. Спробуйте /start")
         return
 
-    # Get content and keyboard
-    text, image_path = get_message_content(data_manager, entry_id)
-    keyboard = build_keyboard_for_entry(data_manager, entry_id)
+    # Get pre-rendered content and keyboard
+    rendered = get_rendered_entry(content, entry_id)
 
     try:
-        await _render_entry(update, context, text, keyboard, image_path)
+        await _render_entry(update, context, rendered)
+
+    except RetryAfter as e:
+        # Still flood-limited after the rate limiter's retries; an error
+        # message would be refused as well
+        logger.warning(f"Gave up rendering {entry_id} for user {update.effective_user.id}: {e}")
 
     except Exception as e:
         logger.error(f"Error editing message: {e}")
-        await query.edit_message_text(
-            f"❌ Помилка при оновленні: {str(e)}"
-        )
+        error_text = f"❌ Помилка при оновленні: {str(e)}"
+        if query.message and query.message.photo:
+            # A photo has no text to replace with the error
+            await context.bot.send_message(chat_id=query.message.chat_id, text=error_text)
+        else:
+            await query.edit_message_text(error_text)
 
 
 async def reload_data(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
-    Handle reload data callback.
+    Handle reload data callback (admins only).
 
     Args:
         update: The update object
         context: The context object
     """
+    set_request_priority(PRIORITY_ADMIN)
     query = update.callback_query
+    if update.effective_user.id not in config.ADMIN_USER_IDS:
+        await query.answer("⛔ Ця дія доступна лише адміністраторам.", show_alert=True)
+        return
     await query.answer()
 
     data_manager: DataManager = context.bot_data.get('data_manager')
@@ -144,7 +246,7 @@ async def reload_data(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         await query.edit_message_text("❌ Data manager не ініціалізований.")
         return
 
-    if data_manager.reload():
+    if await data_manager.reload_async():
         await query.edit_message_text(
             "✅ Дані успішно перезавантажені!"
         )
@@ -0,0 +1,82 @@
+"""Inline query handler (@bot <query> in any chat)."""
+import logging
+from typing import List
+from telegram import InlineQueryResultArticle, InputTextMessageContent, Update, constants
+from telegram.ext import ContextTypes
+from handlers.navigation import build_breadcrumb, get_rendered_entry
+from data_manager import ContentSnapshot, DataManager
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def build_inline_results(content: ContentSnapshot, query: str) -> List[InlineQueryResultArticle]:
+    """
+    Build inline results for a query.
+
+    An empty query lists the sections of the main menu.
+
+    Args:
+        content: The content snapshot to answer from
+        query: The text typed after the bot's username
+
+    Returns:
+        List of article results, each sending the entry with its keyboard
+    """
+    if query:
+        entries = content.complete(query, limit=config.INLINE_RESULTS_LIMIT)
+    else:
+        entries = content.get_root_entries()[:config.INLINE_RESULTS_LIMIT]
+
+    results = []
+    for entry in entries:
+        rendered = get_rendered_entry(content, entry.id)
+        results.append(InlineQueryResultArticle(
+            id=entry.id,
+            title=entry.title,
+            description=build_breadcrumb(content, entry.id) or None,
+            input_message_content=InputTextMessageContent(
+                rendered.text,
+                parse_mode=constants.ParseMode.MARKDOWN,
+                link_preview_options=rendered.link_preview,
+            ),
+            reply_markup=rendered.keyboard,
+        ))
+    return results
+
+
+async def inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Answer an inline query with matching entries.
+
+    Results are prepared once per query and content version, and Telegram
+    is allowed to cache them for all users (``is_personal=False``).
+
+    Args:
+        update: The update object
+        context: The context object
+    """
+    data_manager: DataManager = context.bot_data.get('data_manager')
+    if not data_manager or not data_manager.is_valid():
+        await update.inline_query.answer([], cache_time=0)
+        return
+
+    content = data_manager.snapshot
+    query = ' '.join(update.inline_query.query.split()).casefold()
+
+    # Prepared results are only valid for the content version they came from
+    cache = context.bot_data.get('inline_results')
+    if cache is None or cache['version'] != content.version:
+        cache = context.bot_data['inline_results'] = {'version': content.version, 'results': {}}
+    results = cache['results'].get(query)
+    if results is None:
+        results = build_inline_results(content, query)
+        if len(cache['results']) >= config.INLINE_RESULTS_CACHE_SIZE:
+            cache['results'].clear()
+        cache['results'][query] = results
+
+    await update.inline_query.answer(
+        results,
+        cache_time=config.INLINE_CACHE_TIME,
+        is_personal=False,
+    )
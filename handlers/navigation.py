@@ -1,19 +1,38 @@
 """Navigation utilities for menu handling."""
 import logging
-from typing import List, Tuple
-from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-from data_manager import DataManager
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, LinkPreviewOptions
+from data_manager import ContentSnapshot, DataManager
+from media_cache import resolve_local_image
 import config
 
 logger = logging.getLogger(__name__)
 
+# Navigation helpers accept the manager or one of its snapshots
+ContentSource = DataManager | ContentSnapshot
 
-def build_keyboard_for_entry(data_manager: DataManager, entry_id: str) -> InlineKeyboardMarkup:
+
+# Telegram's limit for photo captions
+PHOTO_CAPTION_LIMIT = 1024
+
+
+class RenderedEntry(NamedTuple):
+    """Ready-to-send response for an entry (Telegram objects are immutable)."""
+    text: str
+    keyboard: InlineKeyboardMarkup
+    link_preview: Optional[LinkPreviewOptions]
+    # Local image to send as a photo with the text as caption; where a photo
+    # cannot be sent, the text is sent with link_preview instead
+    photo: Optional[Path] = None
+
+
+def build_keyboard_for_entry(data_manager: ContentSource, entry_id: str) -> InlineKeyboardMarkup:
     """
     Build inline keyboard for an entry.
 
     Args:
-        data_manager: The DataManager instance
+        data_manager: The DataManager or ContentSnapshot
         entry_id: The entry ID to build keyboard for
 
     Returns:
@@ -28,17 +47,17 @@ def build_keyboard_for_entry(data_manager: DataManager, entry_id: str) -> Inline
     # Build buttons for any children, regardless of content_type
     children = data_manager.get_children_entries(entry_id)
     for child in children:
-        callback_data = f"{config.CALLBACK_PREFIX_TOPIC}{child['id']}"
+        callback_data = f"{config.CALLBACK_PREFIX_TOPIC}{child.id}"
         buttons.append([
             InlineKeyboardButton(
-                text=child['title'],
+                text=child.title,
                 callback_data=callback_data
             )
         ])
 
     # Add back button if not at root
     if entry_id != 'main':
-        parent_id = entry['parent_id']
+        parent_id = entry.parent_id
         if parent_id and parent_id != 'null':
             back_callback = f"{config.CALLBACK_PREFIX_BACK}{parent_id}"
             buttons.append([
@@ -51,12 +70,12 @@ def build_keyboard_for_entry(data_manager: DataManager, entry_id: str) -> Inline
     return InlineKeyboardMarkup(buttons)
 
 
-def get_message_content(data_manager: DataManager, entry_id: str) -> Tuple[str, str]:
+def get_message_content(data_manager: ContentSource, entry_id: str) -> Tuple[str, str]:
     """
     Get text content and image path for an entry.
 
     Args:
-        data_manager: The DataManager instance
+        data_manager: The DataManager or ContentSnapshot
         entry_id: The entry ID to get content for
 
     Returns:
@@ -66,15 +85,87 @@ def get_message_content(data_manager: DataManager, entry_id: str) -> Tuple[str,
     if not entry:
         return "Інформацію не знайдено.", None
 
-    text = entry['title']
+    text = data_manager.get_text(entry_id)
+    if config.SHOW_BREADCRUMBS:
+        breadcrumb = build_breadcrumb(data_manager, entry_id)
+        if breadcrumb:
+            text = f"{breadcrumb}\n\n{text}"
+    image_path = entry.image_url
 
-    # Show content for both text and menu entries when content exists
-    if entry['content']:
-        text += f"\n\n{entry['content']}"
+    return text, image_path
 
-    image_path = entry['image_url']
 
-    return text, image_path
+def build_breadcrumb(data_manager: ContentSource, entry_id: str) -> str:
+    """
+    Build the breadcrumb header (titles of the entry's ancestors).
+
+    Args:
+        data_manager: The DataManager or ContentSnapshot
+        entry_id: The entry ID
+
+    Returns:
+        Ancestor titles joined with the breadcrumb separator, or an empty
+        string for root entries
+    """
+    path = data_manager.get_breadcrumb_path(entry_id)[:-1]
+    return config.BREADCRUMB_SEPARATOR.join(entry.title for entry in path)
+
+
+def build_link_preview(image_url: Optional[str]) -> Optional[LinkPreviewOptions]:
+    """
+    Build link preview options that show an entry image above the text.
+
+    Args:
+        image_url: The entry's image URL (only http(s) URLs are previewed)
+
+    Returns:
+        LinkPreviewOptions or None if there is nothing to preview
+    """
+    if image_url and image_url != 'null' and image_url.startswith('http'):
+        return LinkPreviewOptions(
+            url=image_url,
+            prefer_large_media=True,
+            show_above_text=True,
+        )
+    return None
+
+
+def render_entry(data_manager: ContentSource, entry_id: str) -> RenderedEntry:
+    """
+    Render text, keyboard, link preview and photo for an entry.
+
+    Used by DataManager to fill its render cache at load time.
+
+    Args:
+        data_manager: The DataManager or ContentSnapshot
+        entry_id: The entry ID to render
+
+    Returns:
+        RenderedEntry for the entry
+    """
+    text, image_url = get_message_content(data_manager, entry_id)
+    keyboard = build_keyboard_for_entry(data_manager, entry_id)
+    photo = None
+    if config.IMAGE_DELIVERY == 'upload' and len(text) <= PHOTO_CAPTION_LIMIT:
+        photo = resolve_local_image(image_url, config.IMAGES_DIR, config.IMAGES_OPTIMIZED_DIR)
+    return RenderedEntry(text, keyboard, build_link_preview(image_url), photo)
+
+
+def get_rendered_entry(data_manager: ContentSource, entry_id: str) -> RenderedEntry:
+    """
+    Get the cached rendering of an entry, rendering it if it is not cached.
+
+    Args:
+        data_manager: The DataManager or ContentSnapshot
+        entry_id: The entry ID
+
+    Returns:
+        RenderedEntry for the entry
+    """
+    rendered = data_manager.get_rendered(entry_id)
+    if rendered is None:
+        rendered = render_entry(data_manager, entry_id)
+    return rendered
 
 
 def extract_entry_id_from_callback(callback_data: str, prefix: str) -> str:
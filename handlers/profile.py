@@ -0,0 +1,111 @@
+"""Profile command handler and the job that finishes a profile."""
+import asyncio
+import logging
+from pathlib import Path
+from telegram import Update
+from telegram.ext import ContextTypes
+from profiler import SamplingProfiler, is_own_code
+from rate_limiter import PRIORITY_ADMIN, set_request_priority
+import config
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_FUNCTIONS = 8
+
+
+def format_profile_summary(profiler: SamplingProfiler, report_path: Path, folded_path: Path) -> str:
+    """
+    Describe a finished profile for the admin.
+
+    Args:
+        profiler: The stopped profiler
+        report_path: Saved text report
+        folded_path: Saved flame graph stacks
+
+    Returns:
+        Message text
+    """
+    busy = profiler.samples
+    text = (
+        f"🔬 Профіль за {profiler.duration:.0f} с\n"
+        f"Зразків: {busy} у роботі, {profiler.idle_samples} в очікуванні\n"
+    )
+    if busy:
+        hot = profiler.hot_functions(limit=None)
+        own = [row for row in hot if is_own_code(row['function'])][:SUMMARY_FUNCTIONS]
+        text += "\n🔥 Код бота (разом з викликами):\n"
+        for row in own:
+            text += f"  • {row['total'] / busy * 100:.1f}% {row['function']}\n"
+        text += "\n⏱ Найбільше власного часу:\n"
+        for row in sorted(hot, key=lambda row: row['self'], reverse=True)[:SUMMARY_FUNCTIONS]:
+            text += f"  • {row['self'] / busy * 100:.1f}% {row['function']}\n"
+    text += f"\n📄 Звіт: {report_path}\n🔥 Flame graph: {folded_path}"
+    return text
+
+
+async def finish_profile(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Job stopping the running profile, saving it and sending the summary.
+
+    Args:
+        context: The job context
+    """
+    set_request_priority(PRIORITY_ADMIN)
+    profiler: SamplingProfiler = context.bot_data.get('profiler')
+    if not profiler or not profiler.is_running:
+        return
+    profiler.stop()
+    try:
+        report_path, folded_path = await asyncio.to_thread(profiler.write_report, config.PROFILES_DIR)
+    except OSError as e:
+        logger.error(f"Error saving profile: {e}")
+        await context.bot.send_message(context.job.chat_id, f"❌ Не вдалося зберегти профіль: {e}")
+        return
+    await context.bot.send_message(
+        context.job.chat_id,
+        format_profile_summary(profiler, report_path, folded_path),
+    )
+
+
+async def profile(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Handle /profile command (admins only).
+
+    Usage: /profile [seconds] - sample the running bot for the given time
+    and send a summary of where it spent it.
+
+    Args:
+        update: The update object
+        context: The context object
+    """
+    set_request_priority(PRIORITY_ADMIN)
+    if update.effective_user.id not in config.ADMIN_USER_IDS:
+        await update.message.reply_text("⛔ Ця команда доступна лише адміністраторам.")
+        return
+
+    args = context.args or []
+    if args and not args[0].isdigit():
+        await update.message.reply_text(
+            f"Використання: /profile [секунди] (1-{config.PROFILE_MAX_SECONDS}, "
+            f"типово {config.PROFILE_DEFAULT_SECONDS})"
+        )
+        return
+    seconds = int(args[0]) if args else config.PROFILE_DEFAULT_SECONDS
+    seconds = max(1, min(seconds, config.PROFILE_MAX_SECONDS))
+
+    running: SamplingProfiler = context.bot_data.get('profiler')
+    if running and running.is_running:
+        await update.message.reply_text("⏳ Профілювання вже триває.")
+        return
+
+    profiler = SamplingProfiler(interval=config.PROFILE_SAMPLE_INTERVAL)
+    profiler.start()
+    context.bot_data['profiler'] = profiler
+    context.job_queue.run_once(
+        finish_profile,
+        when=seconds,
+        chat_id=update.effective_chat.id,
+        name='profile',
+    )
+    logger.info(f"Profiling for {seconds} s, requested by {update.effective_user.id}")
+    await update.message.reply_text(f"🔬 Профілювання запущено на {seconds} с. Підсумок надішлю сюди.")
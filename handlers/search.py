@@ -0,0 +1,59 @@
+"""Search command handler."""
+import logging
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.ext import ContextTypes
+from data_manager import DataManager
+from stats_manager import StatsManager
+import config
+
+logger = logging.getLogger(__name__)
+
+
+async def search(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Handle /search command.
+
+    Usage: /search <query> - reply with buttons leading straight to the
+    best matching sections.
+
+    Args:
+        update: The update object
+        context: The context object
+    """
+    data_manager: DataManager = context.bot_data.get('data_manager')
+    if not data_manager or not data_manager.is_valid():
+        await update.message.reply_text(
+            "❌ Виникла помилка при завантаженні даних. Спробуйте пізніше."
+        )
+        return
+
+    # Track statistics
+    stats_manager: StatsManager = context.bot_data.get('stats_manager')
+    if stats_manager:
+        user = update.effective_user
+        stats_manager.track_user(user.id, username=user.username, first_name=user.first_name)
+        stats_manager.track_command('search')
+
+    query = ' '.join(context.args or []).strip()
+    if not query:
+        await update.message.reply_text(
+            "🔎 Напишіть, що шукати, наприклад: /search відзнаки"
+        )
+        return
+
+    results = data_manager.search(query, limit=config.SEARCH_RESULTS_LIMIT)
+    if not results:
+        await update.message.reply_text(f"🔎 За запитом «{query}» нічого не знайдено.")
+        return
+
+    buttons = [
+        [InlineKeyboardButton(
+            text=entry.title,
+            callback_data=f"{config.CALLBACK_PREFIX_TOPIC}{entry.id}",
+        )]
+        for entry in results
+    ]
+    await update.message.reply_text(
+        f"🔎 Результати пошуку «{query}»:",
+        reply_markup=InlineKeyboardMarkup(buttons),
+    )
@@ -2,7 +2,7 @@
 import logging
 from telegram import Update, constants
 from telegram.ext import ContextTypes
-from handlers.navigation import build_keyboard_for_entry, get_message_content
+from handlers.navigation import get_rendered_entry
 from data_manager import DataManager
 from stats_manager import StatsManager
 
@@ -37,20 +37,18 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 
     # Send intro text (if configured as separate entry)
     intro_entry = data_manager.get_entry('start_intro')
-    if intro_entry and intro_entry.get('content'):
+    if intro_entry and intro_entry.content:
         await update.message.reply_text(
-            text=intro_entry['content'],
+            text=intro_entry.content,
             parse_mode=constants.ParseMode.MARKDOWN
         )
 
-    # Get main menu entry
-    entry_id = 'main'
-    text, image_path = get_message_content(data_manager, entry_id)
-    keyboard = build_keyboard_for_entry(data_manager, entry_id)
+    # Get pre-rendered main menu entry
+    rendered = get_rendered_entry(data_manager, 'main')
 
     # Send message with keyboard
     await update.message.reply_text(
-        text=text,
-        reply_markup=keyboard,
+        text=rendered.text,
+        reply_markup=rendered.keyboard,
         parse_mode=constants.ParseMode.MARKDOWN
     )
@@ -0,0 +1,101 @@
+"""HyperLogLog sketch for approximate unique-user counts in fixed memory."""
+import base64
+import hashlib
+import math
+from typing import Iterable
+
+
+class HyperLogLog:
+    """
+    HyperLogLog cardinality estimator.
+
+    Uses ``2 ** precision`` one-byte registers regardless of how many items
+    are added. The standard error is about ``1.04 / sqrt(2 ** precision)``
+    (~1.6% at the default precision of 12). Sketches with the same
+    precision can be merged to count the union of their items.
+    """
+
+    __slots__ = ('precision', 'registers')
+
+    def __init__(self, precision: int = 12, registers: bytes = None):
+        """
+        Initialize HyperLogLog.
+
+        Args:
+            precision: Number of index bits (4-16)
+            registers: Existing register values to load (optional)
+        """
+        if not 4 <= precision <= 16:
+            raise ValueError(f"HyperLogLog precision must be between 4 and 16, got {precision}")
+        self.precision = precision
+        size = 1 << precision
+        if registers is None:
+            self.registers = bytearray(size)
+        else:
+            if len(registers) != size:
+                raise ValueError(f"Expected {size} registers, got {len(registers)}")
+            self.registers = bytearray(registers)
+
+    def add(self, item: str) -> None:
+        """
+        Add an item to the sketch.
+
+        Args:
+            item: The item to count (e.g., a user ID string)
+        """
+        x = int.from_bytes(hashlib.blake2b(item.encode('utf-8'), digest_size=8).digest(), 'big')
+        index = x >> (64 - self.precision)
+        remaining_bits = 64 - self.precision
+        w = x & ((1 << remaining_bits) - 1)
+        rank = remaining_bits - w.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, items: Iterable[str]) -> None:
+        """Add several items to the sketch."""
+        for item in items:
+            self.add(item)
+
+    def merge(self, other: 'HyperLogLog') -> None:
+        """
+        Merge another sketch into this one (in place).
+
+        Args:
+            other: Sketch with the same precision
+        """
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches with different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self) -> int:
+        """Estimate the number of distinct items added."""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        # Linear counting is more accurate for small cardinalities
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def copy(self) -> 'HyperLogLog':
+        """Return an independent copy of the sketch."""
+        return HyperLogLog(self.precision, bytes(self.registers))
+
+    def to_string(self) -> str:
+        """Serialize the sketch to a compact string for JSON storage."""
+        return f"{self.precision}:{base64.b64encode(bytes(self.registers)).decode('ascii')}"
+
+    @classmethod
+    def from_string(cls, value: str) -> 'HyperLogLog':
+        """
+        Load a sketch serialized with ``to_string()``.
+
+        Args:
+            value: Serialized sketch
+
+        Returns:
+            The loaded sketch
+        """
+        precision, encoded = value.split(':', 1)
+        return cls(int(precision), base64.b64decode(encoded))
@@ -0,0 +1,267 @@
+"""Build-time image pipeline: validate, deduplicate and optimize images/.
+
+Checks every image referenced by content.csv, groups byte-identical files,
+and writes a resized, recompressed variant of each distinct image into a
+content-addressed output directory together with a manifest mapping image
+names to variants. The bot sends the variant instead of the original while
+the original is unchanged (see ``media_cache.resolve_local_image``).
+
+Variants are named after the SHA-256 of the original plus the variant
+settings, so unchanged inputs are skipped and duplicates are stored once.
+Optimizing needs Pillow, which the bot itself does not use, so it is
+listed in ``requirements-build.txt`` (``pip install -r
+requirements-build.txt``); without it the images are still validated and
+deduplicated, and no variants are written.
+
+    python image_pipeline.py [path/to/content.csv] [path/to/images] [path/to/output]
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from media_cache import MANIFEST_NAME, image_file_name
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FORMAT = 1
+
+# Telegram scales photos down to 1280 px on the long side for most clients
+MAX_SIDE = 1280
+JPEG_QUALITY = 85
+VARIANT_SETTINGS = f"max{MAX_SIDE}-q{JPEG_QUALITY}"
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+JPEG_SIGNATURE = b'\xff\xd8\xff'
+
+
+def _load_manifest(output_dir: Path) -> Dict[str, Any]:
+    """Load the previous manifest, or an empty one."""
+    try:
+        with open(output_dir / MANIFEST_NAME, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {'images': {}}
+    if manifest.get('format') != MANIFEST_FORMAT or manifest.get('settings') != VARIANT_SETTINGS:
+        return {'images': {}}
+    return manifest
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    """Write a file via a temp file and rename."""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def collect_references(csv_path: Path) -> Dict[str, List[str]]:
+    """
+    Collect the image files referenced by the content.
+
+    Args:
+        csv_path: Path to the content CSV
+
+    Returns:
+        Image file name -> IDs of the entries using it
+    """
+    from data_manager import DataManager
+
+    references: Dict[str, List[str]] = {}
+    for entry_id, entry in DataManager(csv_path).data.items():
+        name = image_file_name(entry.image_url)
+        if name:
+            references.setdefault(name, []).append(entry_id)
+    return references
+
+
+def check_image(data: bytes) -> Optional[str]:
+    """
+    Check that file contents look like an image Telegram accepts as a photo.
+
+    Args:
+        data: File contents
+
+    Returns:
+        Description of the problem, or None if the image is fine
+    """
+    if not data:
+        return "is empty"
+    if not data.startswith((PNG_SIGNATURE, JPEG_SIGNATURE)):
+        return "is not a PNG or JPEG image"
+    return None
+
+
+def optimize(data: bytes) -> Optional[Tuple[bytes, str]]:
+    """
+    Resize and recompress an image for sending as a Telegram photo.
+
+    Args:
+        data: Original image contents
+
+    Returns:
+        Tuple of (variant contents, file suffix), or None if Pillow is not
+        installed
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+        if image.mode in ('RGBA', 'LA', 'P'):
+            # Photos have no transparency: flatten onto white like Telegram does
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+        image.thumbnail((MAX_SIDE, MAX_SIDE), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return buffer.getvalue(), '.jpg'
+
+
+def run(csv_path: Path, images_dir: Path, output_dir: Path) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Validate, deduplicate and optimize the referenced images.
+
+    Args:
+        csv_path: Path to the content CSV
+        images_dir: Directory with the original images
+        output_dir: Directory for the variants and the manifest
+
+    Returns:
+        Tuple of (manifest, list of problems)
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    previous = _load_manifest(output_dir)['images']
+    references = collect_references(csv_path)
+    problems = []
+
+    images: Dict[str, Dict[str, Any]] = {}
+    by_digest: Dict[str, List[str]] = {}
+    can_optimize = True
+    stats = {'optimized': 0, 'skipped': 0, 'bytes_in': 0, 'bytes_out': 0}
+    for name in sorted(references):
+        path = images_dir / name
+        used_by = ', '.join(references[name])
+        try:
+            stat = path.stat()
+        except OSError:
+            problems.append(f"Image '{name}' (used by {used_by}) does not exist")
+            continue
+
+        # Unchanged since the last run: reuse the recorded digest and variant
+        known = previous.get(name)
+        if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns \
+                and (output_dir / known['file']).exists():
+            images[name] = known
+            by_digest.setdefault(known['sha256'], []).append(name)
+            stats['skipped'] += 1
+            stats['bytes_in'] += stat.st_size
+            stats['bytes_out'] += known['bytes']
+            continue
+
+        data = path.read_bytes()
+        problem = check_image(data)
+        if problem:
+            problems.append(f"Image '{name}' (used by {used_by}) {problem}")
+            continue
+        digest = hashlib.sha256(data).hexdigest()
+        by_digest.setdefault(digest, []).append(name)
+
+        key = hashlib.sha256(f"{digest}:{VARIANT_SETTINGS}".encode('ascii')).hexdigest()
+        existing = next(output_dir.glob(f"{key}.*"), None)
+        if existing is not None:
+            variant_file = existing
+        else:
+            if not can_optimize:
+                continue
+            try:
+                result = optimize(data)
+            except Exception as e:
+                problems.append(f"Image '{name}' (used by {used_by}) cannot be decoded: {e}")
+                continue
+            if result is None:
+                logger.warning("Pillow is not installed; images are validated but not optimized")
+                can_optimize = False
+                continue
+            variant, suffix = result
+            # Keep the original where recompressing does not help
+            if len(variant) >= len(data):
+                variant, suffix = data, path.suffix.lower()
+            variant_file = output_dir / f"{key}{suffix}"
+            _write_atomic(variant_file, variant)
+            stats['optimized'] += 1
+
+        images[name] = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': digest,
+            'file': variant_file.name,
+            'bytes': variant_file.stat().st_size,
+        }
+        stats['bytes_in'] += stat.st_size
+        stats['bytes_out'] += images[name]['bytes']
+
+    for names in by_digest.values():
+        # Only images that got a variant share one
+        shared = [name for name in names if name in images]
+        if len(shared) > 1:
+            logger.info(f"Byte-identical images (sharing one variant): {', '.join(shared)}")
+
+    unreferenced = sorted(
+        path.name for path in images_dir.iterdir()
+        if path.is_file() and path.name not in references and not path.name.startswith('.')
+    )
+    if unreferenced:
+        logger.info(f"Images not used by any entry: {', '.join(unreferenced)}")
+
+    # Drop variants no image maps to any more
+    in_use = {image['file'] for image in images.values()}
+    for path in output_dir.iterdir():
+        if path.is_file() and path.name != MANIFEST_NAME and path.name not in in_use:
+            path.unlink()
+
+    manifest = {'format': MANIFEST_FORMAT, 'settings': VARIANT_SETTINGS, 'images': images}
+    _write_atomic(
+        output_dir / MANIFEST_NAME,
+        json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'),
+    )
+    logger.info(
+        f"{len(images)} images: {stats['optimized']} optimized, {stats['skipped']} unchanged, "
+        f"{stats['bytes_in'] / 1024:.0f} KB -> {stats['bytes_out'] / 1024:.0f} KB"
+    )
+    for problem in problems:
+        logger.error(problem)
+    return manifest, problems
+
+
+def main(argv=None) -> int:
+    """Run the pipeline; exit with 1 if referenced images have problems."""
+    logging.basicConfig(format='%(levelname)s - %(message)s', level=logging.INFO)
+    argv = sys.argv[1:] if argv is None else argv
+    base_dir = Path(__file__).resolve().parent
+    csv_path = Path(argv[0]) if argv else base_dir / 'data' / 'content.csv'
+    images_dir = Path(argv[1]) if len(argv) > 1 else base_dir / 'images'
+    output_dir = Path(argv[2]) if len(argv) > 2 else images_dir / '.optimized'
+
+    _, problems = run(csv_path, images_dir, output_dir)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,12 +1,35 @@
 """Main bot application."""
+import time
+
+# Reference point for the startup timing report in post_init
+_STARTED_AT = time.perf_counter()
+
+import asyncio
 import logging
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler
+from typing import Optional
+from telegram.ext import (
+    Application,
+    CallbackQueryHandler,
+    CommandHandler,
+    ContextTypes,
+    InlineQueryHandler,
+)
 import config
-from data_manager import DataManager
+import metrics
+from broadcast_manager import BroadcastManager
+from data_manager import ContentWatcher, DataManager
+from media_cache import MediaCache
+from rate_limiter import PriorityRateLimiter
 from stats_manager import StatsManager
+from update_processor import PerChatUpdateProcessor
 from handlers.start import start
+from handlers.navigation import render_entry
 from handlers.callbacks import button_callback, reload_data
-from handlers.admin import stats, stats_daily, stats_users
+from handlers.admin import reload, stats, stats_daily, stats_monthly, stats_users, stats_weekly
+from handlers.search import search
+from handlers.broadcast import broadcast, schedule_broadcast
+from handlers.profile import profile
+from handlers.inline import inline_query
 
 # Configure logging
 logging.basicConfig(
@@ -15,6 +38,16 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+_IMPORTS_DONE_AT = time.perf_counter()
+
+# Update types the bot handles, in both polling and webhook mode
+ALLOWED_UPDATES = [
+    "message",
+    "callback_query",
+    "inline_query",
+    "edited_message",
+]
+
 
 async def post_init(application: Application) -> None:
     """
@@ -24,44 +57,274 @@ async def post_init(application: Application) -> None:
         application: The application object
     """
     logger.info("Initializing bot...")
+    init_started_at = time.perf_counter()
     
     # Load data from CSV
-    data_manager = DataManager(config.CSV_FILE)
+    data_manager = DataManager(
+        config.CSV_FILE,
+        renderer=render_entry,
+        bundle_path=config.CONTENT_BUNDLE_FILE,
+    )
     if not data_manager.is_valid():
         logger.error("Failed to initialize data manager")
         raise RuntimeError("Failed to load data from CSV")
+    data_loaded_at = time.perf_counter()
     
     # Initialize statistics manager
-    stats_manager = StatsManager(config.STATS_FILE)
+    if config.STATS_BACKEND == 'sqlite':
+        stats_file = config.STATS_DB_FILE
+        # One-shot migration of the existing JSON statistics; the database
+        # only appears once the migration is complete, so a failed one is retried
+        if not stats_file.exists() and config.STATS_FILE.exists():
+            from stats_storage import migrate_json_to_sqlite
+            migrate_json_to_sqlite(config.STATS_FILE, stats_file)
+    else:
+        stats_file = config.STATS_FILE
+    stats_manager = StatsManager(
+        stats_file,
+        flush_every=config.STATS_FLUSH_EVERY,
+        compact_every=config.STATS_COMPACT_EVERY,
+        backend=config.STATS_BACKEND,
+        unique_mode=config.STATS_UNIQUE_MODE,
+        # Handlers only buffer events; a busy burst gets the flush job early
+        on_flush_due=lambda: application.job_queue.run_once(flush_stats, 0),
+    )
+    stats_loaded_at = time.perf_counter()
     
     # Store managers in bot_data for access in handlers
     application.bot_data['data_manager'] = data_manager
     application.bot_data['stats_manager'] = stats_manager
+
+    # Telegram file_ids of uploaded images, so each image is uploaded once
+    if config.IMAGE_DELIVERY == 'upload':
+        application.bot_data['media_cache'] = MediaCache(config.MEDIA_CACHE_FILE)
+
+    # Resume a broadcast interrupted by the last shutdown
+    broadcast_manager = BroadcastManager(
+        config.BROADCAST_STATE_FILE,
+        batch_size=config.BROADCAST_BATCH_SIZE,
+        rate=config.BROADCAST_RATE,
+        progress_interval=config.BROADCAST_PROGRESS_INTERVAL,
+    )
+    application.bot_data['broadcast_manager'] = broadcast_manager
+    if broadcast_manager.is_running:
+        logger.info("Resuming interrupted broadcast")
+        schedule_broadcast(application.job_queue)
+
+    # Local Prometheus endpoint; the bot keeps running without it
+    if config.METRICS_PORT:
+        try:
+            application.bot_data['metrics_server'] = await metrics.serve(
+                config.METRICS_LISTEN, config.METRICS_PORT,
+            )
+        except OSError as e:
+            logger.error(f"Metrics endpoint not started: {e}")
+
+    # Persist buffered statistics in the background
+    application.job_queue.run_repeating(
+        flush_stats,
+        interval=config.STATS_FLUSH_INTERVAL,
+        first=config.STATS_FLUSH_INTERVAL,
+        name='flush_stats',
+    )
+
+    # Fold days past the retention window into weekly and monthly rollups;
+    # the first run also shrinks statistics kept before rollups existed
+    application.job_queue.run_repeating(
+        roll_up_stats,
+        interval=config.STATS_ROLLUP_INTERVAL,
+        first=0,
+        name='roll_up_stats',
+    )
+
+    # Reload content automatically when the CSV file changes
+    if config.CONTENT_WATCH_INTERVAL:
+        application.bot_data['content_watcher'] = ContentWatcher(
+            data_manager,
+            debounce=config.CONTENT_RELOAD_DEBOUNCE,
+        )
+        application.job_queue.run_repeating(
+            watch_content,
+            interval=config.CONTENT_WATCH_INTERVAL,
+            first=config.CONTENT_WATCH_INTERVAL,
+            name='watch_content',
+        )
     logger.info("Data manager and stats manager initialized successfully")
 
+    done_at = time.perf_counter()
+    logger.info(
+        f"Startup timing: imports {(_IMPORTS_DONE_AT - _STARTED_AT) * 1000:.1f} ms, "
+        f"content {(data_loaded_at - init_started_at) * 1000:.1f} ms, "
+        f"stats {(stats_loaded_at - data_loaded_at) * 1000:.1f} ms, "
+        f"total {(done_at - _STARTED_AT) * 1000:.1f} ms from start to post_init"
+    )
 
-def main():
-    """Start the bot."""
-    # Create application
-    application = Application.builder().token(config.BOT_TOKEN).build()
+
+async def post_shutdown(application: Application) -> None:
+    """
+    Flush pending statistics and stop the profiler and metrics endpoint before the process exits.
+
+    Args:
+        application: The application object
+    """
+    profiler = application.bot_data.get('profiler')
+    if profiler:
+        profiler.stop()
+
+    metrics_server = application.bot_data.get('metrics_server')
+    if metrics_server:
+        metrics_server.close()
+        await metrics_server.wait_closed()
+
+    stats_manager: StatsManager = application.bot_data.get('stats_manager')
+    if stats_manager:
+        stats_manager.close()
+        logger.info("Statistics flushed on shutdown")
+
+
+async def flush_stats(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Periodic job writing buffered statistics to disk.
+
+    Args:
+        context: The job context
+    """
+    stats_manager: StatsManager = context.bot_data.get('stats_manager')
+    if stats_manager and stats_manager.is_dirty:
+        # Write in a worker thread; the lock is only held to take the events,
+        # so handlers recording new ones are not held up by the write
+        started = time.perf_counter()
+        await asyncio.to_thread(stats_manager.flush)
+        metrics.STATS_FLUSH_DURATION.observe(time.perf_counter() - started)
+
+
+async def roll_up_stats(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Periodic job rolling up daily statistics past the retention window.
+
+    Args:
+        context: The job context
+    """
+    stats_manager: StatsManager = context.bot_data.get('stats_manager')
+    if stats_manager:
+        # Rewrites the statistics file, so keep it off the event loop
+        await asyncio.to_thread(stats_manager.roll_up_daily_stats, config.STATS_DAILY_RETENTION_DAYS)
+
+
+async def watch_content(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Periodic job reloading content after the CSV file changes.
+
+    Args:
+        context: The job context
+    """
+    watcher: ContentWatcher = context.bot_data.get('content_watcher')
+    if watcher:
+        await watcher.poll()
+
+
+def register_rate_limiter_metrics(rate_limiter: PriorityRateLimiter) -> None:
+    """
+    Expose the rate limiter's queue in the metrics.
+
+    Args:
+        rate_limiter: The application's rate limiter
+    """
+    metrics.REGISTRY.register(metrics.Gauge(
+        'bot_rate_limit_queued_requests',
+        'Bot API requests waiting for the global rate limit, by priority class.',
+        ('priority',),
+        lambda: {
+            (name,): values['queued'] for name, values in rate_limiter.metrics()['classes'].items()
+        },
+    ))
+    metrics.REGISTRY.register(metrics.Gauge(
+        'bot_rate_limit_retry_after_hits',
+        'RetryAfter (flood limit) errors returned by Telegram since the start.',
+        (),
+        lambda: {(): rate_limiter.retry_after_hits},
+    ))
+
+
+def build_application(base_url: Optional[str] = None) -> Application:
+    """
+    Create the application with all hooks and handlers registered.
+
+    Args:
+        base_url: Bot API base URL to use instead of Telegram's (e.g. a local
+            stand-in for load tests)
+
+    Returns:
+        The configured application
+    """
+    builder = (
+        Application.builder()
+        .token(config.BOT_TOKEN)
+        .concurrent_updates(PerChatUpdateProcessor(config.CONCURRENT_UPDATES))
+        # Times every Bot API call for the metrics; same pool size as the default
+        .request(metrics.InstrumentedRequest(connection_pool_size=256, **config.REQUEST_KWARGS))
+    )
+    if config.RATE_LIMIT_ENABLED:
+        rate_limiter = PriorityRateLimiter(
+            overall_per_second=config.RATE_LIMIT_OVERALL_PER_SECOND,
+            chat_per_second=config.RATE_LIMIT_CHAT_PER_SECOND,
+            chat_burst=config.RATE_LIMIT_CHAT_BURST,
+            group_per_minute=config.RATE_LIMIT_GROUP_PER_MINUTE,
+            max_retries=config.RATE_LIMIT_MAX_RETRIES,
+        )
+        register_rate_limiter_metrics(rate_limiter)
+        builder = builder.rate_limiter(rate_limiter)
+    if base_url:
+        builder = builder.base_url(base_url)
+    application = builder.build()
     
-    # Set up post init
+    # Set up post init and shutdown hooks
     application.post_init = post_init
+    application.post_shutdown = post_shutdown
     
-    # Add handlers
-    application.add_handler(CommandHandler("start", start))
-    application.add_handler(CommandHandler("stats", stats))
-    application.add_handler(CommandHandler("stats_daily", stats_daily))
-    application.add_handler(CommandHandler("stats_users", stats_users))
-    application.add_handler(CallbackQueryHandler(button_callback))
-    
+    # Add handlers, each instrumented for the metrics under its own name
+    instrument = metrics.instrument
+    application.add_handler(CommandHandler("start", instrument('start', start)))
+    application.add_handler(CommandHandler("search", instrument('search', search)))
+    application.add_handler(CommandHandler("stats", instrument('stats', stats)))
+    application.add_handler(CommandHandler("stats_daily", instrument('stats_daily', stats_daily)))
+    application.add_handler(CommandHandler("stats_weekly", instrument('stats_weekly', stats_weekly)))
+    application.add_handler(CommandHandler("stats_monthly", instrument('stats_monthly', stats_monthly)))
+    application.add_handler(CommandHandler("stats_users", instrument('stats_users', stats_users)))
+    application.add_handler(CommandHandler("reload", instrument('reload', reload)))
+    application.add_handler(CommandHandler("broadcast", instrument('broadcast', broadcast)))
+    application.add_handler(CommandHandler("profile", instrument('profile', profile)))
+    application.add_handler(CallbackQueryHandler(
+        instrument('reload_data', reload_data), pattern=f"^{config.CALLBACK_RELOAD}$",
+    ))
+    application.add_handler(CallbackQueryHandler(instrument('button_callback', button_callback)))
+    application.add_handler(InlineQueryHandler(instrument('inline_query', inline_query)))
+    return application
+
+
+def main():
+    """Start the bot."""
+    application = build_application()
+
     # Start the bot
-    logger.info("Starting bot...")
-    application.run_polling(allowed_updates=[
-        "message",
-        "callback_query",
-        "edited_message",
-    ])
+    if config.BOT_MODE == 'webhook':
+        # Updates are pushed to the local server; getUpdates is never called
+        logger.info(
+            f"Starting bot in webhook mode on {config.WEBHOOK_LISTEN}:{config.WEBHOOK_PORT}"
+            f"/{config.WEBHOOK_PATH}..."
+        )
+        application.run_webhook(
+            listen=config.WEBHOOK_LISTEN,
+            port=config.WEBHOOK_PORT,
+            url_path=config.WEBHOOK_PATH,
+            webhook_url=config.WEBHOOK_URL,
+            secret_token=config.WEBHOOK_SECRET_TOKEN,
+            max_connections=config.WEBHOOK_MAX_CONNECTIONS,
+            allowed_updates=ALLOWED_UPDATES,
+        )
+    else:
+        logger.info("Starting bot...")
+        application.run_polling(allowed_updates=ALLOWED_UPDATES)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,204 @@
+"""Persistent cache of Telegram file_ids for local images."""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Written by image_pipeline into its output directory
+MANIFEST_NAME = 'manifest.json'
+
+
+def image_file_name(image_url: Optional[str]) -> Optional[str]:
+    """
+    Get the image file name an entry's image_url refers to.
+
+    Accepts a bare file name (``awards.png``) or a URL whose last path
+    component names a file in the images directory (e.g. the
+    ``raw.githubusercontent.com/.../images/awards.png`` links in the CSV).
+
+    Args:
+        image_url: The entry's image_url value
+
+    Returns:
+        The file name, or None if the entry has no image
+    """
+    if not image_url or image_url == 'null':
+        return None
+    return Path(urlparse(image_url).path).name or None
+
+
+# optimized_dir -> (manifest mtime_ns, manifest images)
+_manifests: Dict[Path, Tuple[int, Dict[str, Dict[str, Any]]]] = {}
+
+
+def _optimized_images(optimized_dir: Path) -> Dict[str, Dict[str, Any]]:
+    """Images listed in the image pipeline's manifest, re-read when it changes."""
+    manifest_file = optimized_dir / MANIFEST_NAME
+    try:
+        mtime_ns = manifest_file.stat().st_mtime_ns
+    except OSError:
+        return {}
+    memo = _manifests.get(optimized_dir)
+    if memo and memo[0] == mtime_ns:
+        return memo[1]
+    try:
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            images = json.load(f).get('images', {})
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable image manifest {manifest_file}: {e}")
+        images = {}
+    _manifests[optimized_dir] = (mtime_ns, images)
+    return images
+
+
+def resolve_local_image(
+    image_url: Optional[str],
+    images_dir: Path,
+    optimized_dir: Optional[Path] = None,
+) -> Optional[Path]:
+    """
+    Find the local file to send for an entry's image reference.
+
+    Args:
+        image_url: The entry's image_url value
+        images_dir: Directory holding the bot's images
+        optimized_dir: Output of the image pipeline (see ``image_pipeline``);
+            its variant is preferred while it was built from the current file
+
+    Returns:
+        Path to a non-empty local image, or None if there is none
+    """
+    name = image_file_name(image_url)
+    if not name:
+        return None
+    path = images_dir / name
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    if not stat.st_size:
+        return None
+
+    if optimized_dir:
+        variant = _optimized_images(optimized_dir).get(name)
+        if variant and variant['size'] == stat.st_size and variant['mtime_ns'] == stat.st_mtime_ns:
+            optimized = optimized_dir / variant['file']
+            if optimized.exists():
+                return optimized
+    return path
+
+
+class MediaCache:
+    """
+    Maps image contents (SHA-256) to the file_id Telegram assigned on upload.
+
+    Keying by content hash means an image is uploaded once, stays cached
+    across restarts and renames, and is uploaded again only after the file
+    itself changes. Hashes are memoized by the file's size and mtime, so
+    unchanged files are read only once per process.
+    """
+
+    def __init__(self, cache_file: Path):
+        """
+        Initialize MediaCache.
+
+        Args:
+            cache_file: Path to the JSON file holding the file_ids
+        """
+        self.cache_file = cache_file
+        self._lock = threading.Lock()
+        self._digests: Dict[Path, Tuple[int, int, str]] = {}
+        self.file_ids: Dict[str, str] = self._load()
+
+    def _load(self) -> Dict[str, str]:
+        """Load cached file_ids, starting empty if the file is missing or unreadable."""
+        if not self.cache_file.exists():
+            return {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading media cache, starting empty: {e}")
+            return {}
+
+    def _save(self) -> bool:
+        """Atomically write the cache to file."""
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(
+                dir=self.cache_file.parent,
+                prefix=f".{self.cache_file.name}.",
+                suffix='.tmp',
+            )
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.file_ids, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.cache_file)
+            return True
+        except Exception as e:
+            logger.error(f"Error saving media cache: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            return False
+
+    def digest(self, path: Path) -> str:
+        """
+        Get the SHA-256 of a file's contents.
+
+        Args:
+            path: The file
+
+        Returns:
+            Hex digest
+        """
+        stat = path.stat()
+        memo = self._digests.get(path)
+        if memo and memo[0] == stat.st_size and memo[1] == stat.st_mtime_ns:
+            return memo[2]
+        digest = hashlib.sha256(path.read_bytes()).hexdigest()
+        self._digests[path] = (stat.st_size, stat.st_mtime_ns, digest)
+        return digest
+
+    def lookup(self, path: Path) -> Tuple[str, Optional[str]]:
+        """
+        Find the cached file_id for an image.
+
+        Args:
+            path: The local image
+
+        Returns:
+            Tuple of (content digest, file_id or None if not uploaded yet)
+        """
+        digest = self.digest(path)
+        return digest, self.file_ids.get(digest)
+
+    def remember(self, digest: str, file_id: str) -> None:
+        """
+        Store the file_id Telegram returned for an uploaded image.
+
+        Args:
+            digest: Content digest from ``lookup()``
+            file_id: The uploaded photo's file_id
+        """
+        with self._lock:
+            if self.file_ids.get(digest) == file_id:
+                return
+            self.file_ids[digest] = file_id
+            self._save()
+
+    def forget(self, digest: str) -> None:
+        """
+        Drop a file_id Telegram no longer accepts, so the image is re-uploaded.
+
+        Args:
+            digest: Content digest from ``lookup()``
+        """
+        with self._lock:
+            if self.file_ids.pop(digest, None) is not None:
+                self._save()
@@ -0,0 +1,312 @@
+"""Request metrics in Prometheus text format.
+
+Handlers are wrapped with ``instrument()``, which counts calls and errors
+and observes latency histograms for the whole update and for the time it
+spent in each phase: statistics storage (``timed('stats')`` in
+``StatsManager``), Telegram Bot API calls (``timed('telegram')`` in the
+request layer and rate limiter) and everything else (our own code).
+
+``serve()`` exposes the registry on a local HTTP endpoint:
+
+    curl http://127.0.0.1:9464/metrics
+"""
+import asyncio
+import functools
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from telegram.request import HTTPXRequest
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds, from a cache hit to a slow Bot API round trip
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PHASES = ('stats', 'telegram')
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """Monotonically increasing count per label combination."""
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        """Add ``amount`` to the series with these label values."""
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, values)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Distribution of observed values per label combination, in fixed buckets."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> [count per bucket (non-cumulative) ..., +Inf count, sum]
+        self._series: Dict[LabelValues, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        """Record one value in the series with these label values."""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for values, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), series):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    labels = _format_labels(self.labels, values, f'le="{le}"')
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, values)} {_format_value(series[-1])}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, values)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Current values read from a callback when the metrics are scraped."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Tuple[str, ...],
+        collect: Callable[[], Dict[LabelValues, float]],
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for values, value in sorted(self.collect().items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, values)} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    """Named metrics rendered together."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+
+    def register(self, metric: Any) -> Any:
+        """Add a metric, replacing one with the same name; returns it."""
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """All metrics in Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                lines.extend(metric.render())
+            except Exception:
+                logger.exception(f"Failed to collect metric {metric.name}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+HANDLER_REQUESTS = REGISTRY.register(Counter(
+    'bot_handler_requests_total', 'Updates handled, by handler.', ('handler',),
+))
+HANDLER_ERRORS = REGISTRY.register(Counter(
+    'bot_handler_errors_total', 'Updates whose handler raised an exception, by handler.', ('handler',),
+))
+HANDLER_DURATION = REGISTRY.register(Histogram(
+    'bot_handler_duration_seconds',
+    'Time to handle an update (phase="total"), split into statistics storage (stats), '
+    'Telegram Bot API calls including rate limiting (telegram) and the rest (code).',
+    ('handler', 'phase'),
+))
+TELEGRAM_DURATION = REGISTRY.register(Histogram(
+    'bot_telegram_request_duration_seconds', 'Bot API HTTP round trips, by method.', ('method',),
+))
+TELEGRAM_ERRORS = REGISTRY.register(Counter(
+    'bot_telegram_request_errors_total',
+    'Bot API calls answered with an error status or failed on the network, by method and status.',
+    ('method', 'status'),
+))
+STATS_FLUSH_DURATION = REGISTRY.register(Histogram(
+    'bot_stats_flush_duration_seconds', 'Background flushes of buffered statistics to disk.',
+))
+
+
+class _Timings:
+    """Time one update spent per phase; nested timers of a phase count once."""
+
+    __slots__ = ('seconds', 'active')
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self.active = set()
+
+
+_current_timings: ContextVar[Optional[_Timings]] = ContextVar('current_timings', default=None)
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    """
+    Attribute the time spent in the block to a phase of the current update.
+
+    Does nothing outside an instrumented handler (e.g. in jobs).
+
+    Args:
+        phase: One of PHASES
+    """
+    timings = _current_timings.get()
+    if timings is None or phase in timings.active:
+        yield
+        return
+    timings.active.add(phase)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.seconds[phase] += time.perf_counter() - started
+        timings.active.discard(phase)
+
+
+def instrument(name: str, callback: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Wrap a handler callback to record its calls, errors and latency.
+
+    Args:
+        name: Handler label in the metrics
+        callback: The handler callback
+
+    Returns:
+        The wrapped callback
+    """
+    @functools.wraps(callback)
+    async def wrapper(update: object, context: Any) -> Any:
+        timings = _Timings()
+        token = _current_timings.set(timings)
+        started = time.perf_counter()
+        try:
+            return await callback(update, context)
+        except Exception:
+            HANDLER_ERRORS.inc(name)
+            raise
+        finally:
+            total = time.perf_counter() - started
+            _current_timings.reset(token)
+            HANDLER_REQUESTS.inc(name)
+            HANDLER_DURATION.observe(total, name, 'total')
+            for phase, seconds in timings.seconds.items():
+                HANDLER_DURATION.observe(seconds, name, phase)
+            HANDLER_DURATION.observe(max(0.0, total - sum(timings.seconds.values())), name, 'code')
+
+    return wrapper
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """Bot API HTTP client timing every call per method and for the current update."""
+
+    async def do_request(self, url: str, method: str, *args: Any, **kwargs: Any) -> Tuple[int, bytes]:
+        api_method = url.rsplit('/', 1)[-1]
+        started = time.perf_counter()
+        try:
+            with timed('telegram'):
+                status, payload = await super().do_request(url, method, *args, **kwargs)
+        except Exception:
+            TELEGRAM_ERRORS.inc(api_method, 'network')
+            raise
+        finally:
+            TELEGRAM_DURATION.observe(time.perf_counter() - started, api_method)
+        if status >= 400:
+            TELEGRAM_ERRORS.inc(api_method, str(status))
+        return status, payload
+
+
+async def _handle_scrape(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """Answer one HTTP request: GET /metrics, or 404."""
+    try:
+        request_line = await reader.readline()
+        while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+            pass
+        parts = request_line.decode('latin-1').split()
+        if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+            status, content_type, body = '200 OK', 'text/plain; version=0.0.4; charset=utf-8', REGISTRY.render()
+        else:
+            status, content_type, body = '404 Not Found', 'text/plain; charset=utf-8', 'Not found\n'
+        payload = body.encode('utf-8')
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode('latin-1')
+            + payload
+        )
+        await writer.drain()
+    except (ConnectionError, UnicodeDecodeError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host: str, port: int) -> asyncio.AbstractServer:
+    """
+    Start the metrics endpoint.
+
+    Args:
+        host: Interface to listen on (keep it local; there is no authentication)
+        port: Port to listen on
+
+    Returns:
+        The running server; close it on shutdown
+    """
+    server = await asyncio.start_server(_handle_scrape, host, port)
+    logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return server
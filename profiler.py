@@ -0,0 +1,210 @@
+"""Sampling profiler for the running bot.
+
+``SamplingProfiler`` records the Python stack of every thread many times a
+second from a background thread, so it sees handlers on the event loop as
+well as statistics flushes in worker threads, at a small cost that does not
+depend on how many functions run. Samples where a thread is only waiting
+(for network events, or for work in a thread pool) are counted as idle and
+left out of the report.
+
+``write_report()`` saves two files: a text report of the hottest functions
+and the sampled stacks in the "folded" format read by flame graph tools
+(``flamegraph.pl``, speedscope.app), one ``frame;frame;... count`` line per
+distinct stack.
+"""
+import logging
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# Innermost Python frames of a thread that is waiting rather than working
+IDLE_FRAMES = {
+    ('selectors.py', 'select'),  # Event loop waiting for network events
+    ('thread.py', '_worker'),  # Thread pool worker waiting for a job
+    ('threading.py', 'wait'),
+    ('queue.py', 'get'),
+}
+
+
+def _frame_label(code: Any) -> str:
+    """'path:function' for our own modules, 'module.py:function' for libraries."""
+    path = Path(code.co_filename)
+    try:
+        name = path.resolve().relative_to(BASE_DIR).as_posix()
+    except ValueError:
+        name = path.name
+    if 'site-packages' in name:
+        name = path.name
+    return f"{name}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def is_own_code(label: str) -> bool:
+    """Whether a frame label belongs to the bot rather than Python or a library."""
+    path = label.split(':', 1)[0]
+    return path.endswith('.py') and (BASE_DIR / path).is_file()
+
+
+class SamplingProfiler:
+    """Collects stack samples of all threads until stopped."""
+
+    def __init__(self, interval: float = 0.005):
+        """
+        Initialize SamplingProfiler.
+
+        Args:
+            interval: Seconds between samples
+        """
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.idle_samples = 0
+        self.started_at: Optional[datetime] = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def is_running(self) -> bool:
+        """Whether samples are being collected."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """
+        Start sampling in a background thread.
+
+        Raises:
+            RuntimeError: If this profiler is already running
+        """
+        if self.is_running:
+            raise RuntimeError("Profiler is already running")
+        self._stop.clear()
+        self.started_at = datetime.now()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling and wait for the sampling thread to finish."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        names: Dict[int, str] = {}
+        labels: Dict[Any, str] = {}
+        started = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                self._sample(thread_id, frame, names, labels)
+        self.duration = time.perf_counter() - started
+
+    def _sample(
+        self,
+        thread_id: int,
+        frame: Any,
+        names: Dict[int, str],
+        labels: Dict[Any, str],
+    ) -> None:
+        """Count the stack of one thread; ``names`` and ``labels`` cache thread names and frame labels."""
+        code = frame.f_code
+        if (Path(code.co_filename).name, code.co_name) in IDLE_FRAMES:
+            self.idle_samples += 1
+            return
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            label = labels.get(code)
+            if label is None:
+                label = labels[code] = _frame_label(code)
+            stack.append(label)
+            frame = frame.f_back
+        if thread_id not in names:
+            names.update((thread.ident, thread.name) for thread in threading.enumerate())
+        stack.append(names.get(thread_id, str(thread_id)))
+        stack.reverse()
+        self.stacks[tuple(stack)] += 1
+        self.samples += 1
+
+    # Results -------------------------------------------------------------
+
+    def hot_functions(self, limit: Optional[int] = 20) -> List[Dict[str, Any]]:
+        """
+        Functions found most often in the samples.
+
+        Args:
+            limit: Maximum number of functions (None for all)
+
+        Returns:
+            Dictionaries with ``function``, ``self`` (samples where it was
+            running) and ``total`` (samples where it was on the stack), most
+            ``total`` first
+        """
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in self.stacks.items():
+            # stack[0] is the thread name
+            own[stack[-1]] += count
+            for label in set(stack[1:]):
+                total[label] += count
+        return [
+            {'function': label, 'self': own[label], 'total': count}
+            for label, count in total.most_common(limit)
+        ]
+
+    def folded_stacks(self) -> str:
+        """The samples in flame graph "folded" format."""
+        return ''.join(
+            f"{';'.join(stack)} {count}\n" for stack, count in sorted(self.stacks.items())
+        )
+
+    def write_report(self, directory: Path, limit: int = 40) -> Tuple[Path, Path]:
+        """
+        Save the text report and the folded stacks.
+
+        Args:
+            directory: Directory for the files (created if missing)
+            limit: Functions listed in each table of the report
+
+        Returns:
+            Paths of the report and of the folded stacks file
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        stamp = (self.started_at or datetime.now()).strftime('%Y%m%d-%H%M%S')
+        report_path = directory / f"profile-{stamp}.txt"
+        folded_path = directory / f"profile-{stamp}.folded"
+
+        busy = self.samples or 1
+        lines = [
+            f"Profile started {self.started_at:%Y-%m-%d %H:%M:%S}, {self.duration:.1f} s, "
+            f"sampled every {self.interval * 1000:g} ms",
+            f"Samples: {self.samples} busy, {self.idle_samples} idle (waiting for events or jobs)",
+            "",
+        ]
+        hot = self.hot_functions(limit=None)
+        for title, key in (("Including callees", 'total'), ("Own time", 'self')):
+            lines.append(f"{title} (% of busy samples):")
+            lines.append(f"{'total%':>7} {'self%':>7}  function")
+            for row in sorted(hot, key=lambda row: row[key], reverse=True)[:limit]:
+                if not row[key]:
+                    break
+                lines.append(
+                    f"{row['total'] / busy * 100:7.1f} {row['self'] / busy * 100:7.1f}  {row['function']}"
+                )
+            lines.append("")
+
+        report_path.write_text('\n'.join(lines), encoding='utf-8')
+        folded_path.write_text(self.folded_stacks(), encoding='utf-8')
+        logger.info(f"Profile written to {report_path} and {folded_path}")
+        return report_path, folded_path
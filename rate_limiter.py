@@ -0,0 +1,327 @@
+"""Rate limiting for outgoing Bot API requests.
+
+Telegram limits how fast a bot may send: about 30 messages per second
+overall, about one per second in a single chat (short bursts are allowed)
+and 20 per minute in a group. ``PriorityRateLimiter`` keeps the bot under
+these limits with token buckets, so bursts of traffic wait briefly in a
+queue instead of running into ``RetryAfter`` errors, and retries requests
+that hit one anyway.
+
+When requests wait, interactive ones (answers to users' clicks and
+commands) go first. Handlers for admin commands lower their priority with
+``set_request_priority(PRIORITY_ADMIN)``; bulk senders pass
+``rate_limit_args=PRIORITY_BULK`` to each Bot API call.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Tuple, Union
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from metrics import timed
+
+logger = logging.getLogger(__name__)
+
+# Priority classes; lower values are sent first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_ADMIN = 1
+PRIORITY_BULK = 2
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: 'interactive',
+    PRIORITY_ADMIN: 'admin',
+    PRIORITY_BULK: 'bulk',
+}
+
+# Priority of Bot API calls made by the current update's handler
+_request_priority: ContextVar[int] = ContextVar('request_priority', default=PRIORITY_INTERACTIVE)
+
+# Per-chat buckets are dropped once this many exist and they are full again
+CHAT_BUCKETS_SWEEP_AT = 1000
+
+
+def set_request_priority(priority: int) -> None:
+    """
+    Set the priority of the Bot API calls the current handler makes.
+
+    Applies until the handler returns (see ``PerChatUpdateProcessor``).
+
+    Args:
+        priority: One of the PRIORITY_* classes
+    """
+    _request_priority.set(priority)
+
+
+def reset_request_priority() -> Any:
+    """
+    Restore the default priority for the next handler.
+
+    Returns:
+        Token for ``restore_request_priority``
+    """
+    return _request_priority.set(PRIORITY_INTERACTIVE)
+
+
+def restore_request_priority(token: Any) -> None:
+    """Undo ``reset_request_priority`` and any later ``set_request_priority``."""
+    _request_priority.reset(token)
+
+
+class TokenBucket:
+    """
+    Token bucket: allows ``capacity`` requests at once, refilled at ``rate`` per second.
+
+    Tokens are reserved up front: a request that finds the bucket empty
+    takes a token anyway (the balance goes negative) and waits until it
+    would have been refilled, so requests are served in the order they
+    reserved.
+    """
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Initialize TokenBucket.
+
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum number of tokens (the allowed burst)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Seconds until a token is available (0 if one is)."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def reserve(self, now: float) -> float:
+        """
+        Take a token.
+
+        Returns:
+            Seconds to wait before using it
+        """
+        wait = self.delay(now)
+        self.tokens -= 1
+        return wait
+
+    def is_full(self, now: float) -> bool:
+        """Whether the bucket has refilled completely (and can be forgotten)."""
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class PriorityRateLimiter(BaseRateLimiter[int]):
+    """
+    Rate limiter with global and per-chat token buckets and priority classes.
+
+    Only requests addressed to a chat (those with a ``chat_id``) are
+    limited, like in python-telegram-bot's ``AIORateLimiter``; answering
+    callback and inline queries is never delayed. A request first waits for
+    its chat's bucket, then for the global bucket, where waiting requests
+    are released strictly by priority class and in arrival order within a
+    class. ``RetryAfter`` pauses all limited requests for the time Telegram
+    asks for, after which the request is retried up to ``max_retries``
+    times.
+    """
+
+    def __init__(
+        self,
+        overall_per_second: float = 30,
+        chat_per_second: float = 1,
+        chat_burst: int = 5,
+        group_per_minute: float = 20,
+        max_retries: int = 2,
+    ):
+        """
+        Initialize PriorityRateLimiter.
+
+        Args:
+            overall_per_second: Requests per second across all chats
+            chat_per_second: Requests per second in one private chat
+            chat_burst: Requests a chat may send at once before being limited
+            group_per_minute: Requests per minute in one group or channel
+            max_retries: Retries of a request that hit ``RetryAfter``
+        """
+        self.overall = TokenBucket(overall_per_second, overall_per_second)
+        self.chat_per_second = chat_per_second
+        self.chat_burst = chat_burst
+        self.group_per_minute = group_per_minute
+        self.max_retries = max_retries
+        self._chats: Dict[Union[int, str], TokenBucket] = {}
+        # Requests waiting for the global bucket: (priority, arrival, future)
+        self._waiting: List[Tuple[int, int, asyncio.Future]] = []
+        self._arrivals = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._paused_until = 0.0
+        self._queued = {priority: 0 for priority in PRIORITY_NAMES}
+        self._peak_queued = dict(self._queued)
+        self._sent = dict(self._queued)
+        self._wait_seconds = {priority: 0.0 for priority in PRIORITY_NAMES}
+        self.retry_after_hits = 0
+
+    async def initialize(self) -> None:
+        """Nothing to set up."""
+
+    async def shutdown(self) -> None:
+        """Stop releasing queued requests."""
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+
+    # Buckets -------------------------------------------------------------
+
+    def _chat_bucket(self, chat_id: Union[int, str], now: float) -> TokenBucket:
+        """Bucket of one chat; groups and channels have negative or @username IDs."""
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= CHAT_BUCKETS_SWEEP_AT:
+                self._chats = {
+                    key: value for key, value in self._chats.items() if not value.is_full(now)
+                }
+            if isinstance(chat_id, str) or chat_id < 0:
+                rate = self.group_per_minute / 60
+                bucket = TokenBucket(rate, self.group_per_minute)
+            else:
+                bucket = TokenBucket(self.chat_per_second, self.chat_burst)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    async def _acquire_overall(self, priority: int) -> None:
+        """Wait for a token of the global bucket, behind higher priorities."""
+        now = time.monotonic()
+        if not self._waiting and now >= self._paused_until and not self.overall.delay(now):
+            self.overall.reserve(now)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (priority, next(self._arrivals), future))
+        self._queued[priority] += 1
+        self._peak_queued[priority] = max(self._peak_queued[priority], self._queued[priority])
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        try:
+            await future
+        finally:
+            self._queued[priority] -= 1
+
+    async def _dispatch(self) -> None:
+        """Release waiting requests one token at a time, best priority first."""
+        while self._waiting:
+            now = time.monotonic()
+            wait = max(self._paused_until - now, self.overall.delay(now))
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            _, _, future = heapq.heappop(self._waiting)
+            if future.done():
+                # The request was cancelled while waiting
+                continue
+            self.overall.reserve(now)
+            future.set_result(None)
+
+    # Requests ------------------------------------------------------------
+
+    async def _acquire(self, chat_id: Union[int, str], priority: int) -> None:
+        started = time.monotonic()
+        wait = self._chat_bucket(chat_id, started).reserve(started)
+        if wait:
+            await asyncio.sleep(wait)
+        await self._acquire_overall(priority)
+        self._wait_seconds[priority] += time.monotonic() - started
+        self._sent[priority] += 1
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Union[bool, Dict[str, Any], List[Dict[str, Any]]]]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[int],
+    ) -> Union[bool, Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        Send a request once the buckets allow it, retrying after ``RetryAfter``.
+
+        Args:
+            callback: Sends the request
+            args: Positional arguments for ``callback``
+            kwargs: Keyword arguments for ``callback``
+            endpoint: Bot API method name
+            data: Request parameters
+            rate_limit_args: Priority class of this call; defaults to the
+                priority set for the current handler
+        """
+        chat_id = data.get('chat_id')
+        if chat_id is None:
+            return await callback(*args, **kwargs)
+        try:
+            chat_id = int(chat_id)
+        except (TypeError, ValueError):
+            pass
+        priority = _request_priority.get() if rate_limit_args is None else rate_limit_args
+        # Waiting in the queue counts as Bot API time in metrics
+        with timed('telegram'):
+            return await self._send_limited(callback, args, kwargs, endpoint, chat_id, priority)
+
+    async def _send_limited(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Union[bool, Dict[str, Any], List[Dict[str, Any]]]]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        chat_id: Union[int, str],
+        priority: int,
+    ) -> Union[bool, Dict[str, Any], List[Dict[str, Any]]]:
+        """Acquire the buckets and send, retrying after ``RetryAfter``."""
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(chat_id, priority)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                self.retry_after_hits += 1
+                if attempt == self.max_retries:
+                    raise
+                logger.warning(
+                    f"Flood limit hit by {endpoint} in chat {chat_id}; "
+                    f"pausing requests for {e.retry_after} s"
+                )
+                self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+
+    # Metrics -------------------------------------------------------------
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Current and cumulative queue metrics.
+
+        Returns:
+            Dictionary with, per priority class name: requests waiting for
+            the global bucket now, the most that ever waited at once,
+            requests sent and their average wait in milliseconds; plus the
+            number of RetryAfter errors and the remaining pause in seconds
+        """
+        classes = {}
+        for priority, name in PRIORITY_NAMES.items():
+            sent = self._sent[priority]
+            classes[name] = {
+                'queued': self._queued[priority],
+                'peak_queued': self._peak_queued[priority],
+                'sent': sent,
+                'avg_wait_ms': self._wait_seconds[priority] / sent * 1000 if sent else 0.0,
+            }
+        return {
+            'classes': classes,
+            'retry_after_hits': self.retry_after_hits,
+            'paused_for_s': max(0.0, self._paused_until - time.monotonic()),
+        }
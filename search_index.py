@@ -0,0 +1,251 @@
+"""Full-text search (inverted index) and autocomplete (prefix index) over entries."""
+import bisect
+import math
+import re
+from typing import Dict, List, Mapping, Optional, Tuple
+
+# Apostrophe variants used in Ukrainian texts (п'ять, пʼять, п’ять, ...)
+APOSTROPHES = "'ʼ’‘`´′"
+_NORMALIZE_TABLE = str.maketrans({
+    **{char: None for char in APOSTROPHES},
+    'ґ': 'г',
+    'ё': 'е',
+})
+_TOKEN_RE = re.compile(r'\w+')
+
+# Inflectional endings, longest first; stripped only from words long enough
+# to keep a stem of MIN_STEM_LENGTH letters
+SUFFIXES = tuple(sorted({
+    'ення', 'ість', 'ості', 'ньої', 'ями', 'ами', 'ові', 'еві', 'ого', 'ому',
+    'ему', 'ими', 'іми', 'ний', 'ною', 'ння', 'ася', 'ися',
+    'ий', 'ій', 'ої', 'ою', 'ею', 'ом', 'ем', 'ах', 'ях', 'ів', 'їв', 'ам',
+    'ям', 'им', 'ім', 'их', 'іх', 'ти', 'ть', 'ся', 'ла', 'ли', 'ло',
+    'а', 'я', 'у', 'ю', 'і', 'и', 'е', 'о', 'ь', 'й', 'ї',
+}, key=len, reverse=True))
+MIN_STEM_LENGTH = 3
+
+# Weight of a title match, relative to a single content match
+TITLE_WEIGHT = 3.0
+
+
+def normalize(text: str) -> str:
+    """
+    Normalize text for matching: case folding and spelling variants.
+
+    Args:
+        text: Raw text
+
+    Returns:
+        Case-folded text without apostrophes, with ґ folded into г
+    """
+    return text.casefold().translate(_NORMALIZE_TABLE)
+
+
+def stem(word: str) -> str:
+    """
+    Strip one inflectional ending from a normalized word.
+
+    A deliberately simple suffix stripper: it maps most case and number
+    forms of a noun or adjective to the same stem (відзнака, відзнаки,
+    відзнаками -> відзнак) without a dictionary.
+
+    Args:
+        word: Normalized word
+
+    Returns:
+        The word's stem
+    """
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM_LENGTH:
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text: str, stems: Optional[Dict[str, str]] = None) -> List[str]:
+    """
+    Split text into normalized, stemmed search terms.
+
+    Args:
+        text: Raw text
+        stems: Memo of word -> stem to reuse between calls (optional)
+
+    Returns:
+        List of terms, in order of appearance
+    """
+    terms = []
+    for word in _TOKEN_RE.findall(normalize(text).replace('_', ' ')):
+        if stems is None:
+            terms.append(stem(word))
+            continue
+        term = stems.get(word)
+        if term is None:
+            term = stems[word] = stem(word)
+        terms.append(term)
+    return terms
+
+
+class SearchIndex:
+    """
+    Inverted index mapping search terms to the entries that contain them.
+
+    Each posting carries a precomputed weight (damped content term
+    frequency plus a title bonus, times the term's inverse document
+    frequency), so a
+    lookup only sums the postings of the query terms. Building from a
+    previous index re-analyzes only the entries whose title or content
+    changed.
+    """
+
+    def __init__(self):
+        """Initialize an empty SearchIndex."""
+        self.postings: Dict[str, Dict[str, float]] = {}
+        # entry_id -> ((title, content), term -> weight before idf)
+        self._documents: Dict[str, Tuple[Tuple[str, str], Dict[str, float]]] = {}
+        self._stems: Dict[str, str] = {}
+
+    @classmethod
+    def build(
+        cls,
+        entries: Mapping[str, Tuple[str, str]],
+        previous: Optional['SearchIndex'] = None,
+    ) -> 'SearchIndex':
+        """
+        Build an index over entry titles and content.
+
+        Args:
+            entries: entry_id -> (title, content)
+            previous: Index of the previous content version, whose analysis
+                of unchanged entries is reused (optional)
+
+        Returns:
+            The new index
+        """
+        index = cls()
+        if previous is not None:
+            index._stems = previous._stems
+        old_documents = previous._documents if previous is not None else {}
+
+        for entry_id, fields in entries.items():
+            old = old_documents.get(entry_id)
+            if old is not None and old[0] == fields:
+                index._documents[entry_id] = old
+                continue
+            title, content = fields
+            counts: Dict[str, int] = {}
+            for term in tokenize(content, index._stems):
+                counts[term] = counts.get(term, 0) + 1
+            # Dampen repetition so long entries do not win on volume
+            weights = {term: 1 + math.log(count) for term, count in counts.items()}
+            for term in set(tokenize(title, index._stems)):
+                weights[term] = weights.get(term, 0.0) + TITLE_WEIGHT
+            index._documents[entry_id] = (fields, weights)
+
+        postings: Dict[str, Dict[str, float]] = {}
+        for entry_id, (_, weights) in index._documents.items():
+            for term, weight in weights.items():
+                postings.setdefault(term, {})[entry_id] = weight
+        total = len(index._documents)
+        for posting in postings.values():
+            idf = math.log(1 + total / len(posting))
+            for entry_id in posting:
+                posting[entry_id] *= idf
+        index.postings = postings
+        return index
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+    ) -> List[Tuple[str, float]]:
+        """
+        Find the entries best matching a query.
+
+        Entries matching more of the query terms rank first; ties are broken
+        by the summed term weights.
+
+        Args:
+            query: Free-text query
+            limit: Maximum number of results
+
+        Returns:
+            List of tuples (entry_id, score), best match first
+        """
+        # No memo here: queries are user input and would grow it without bound
+        terms = set(tokenize(query))
+        scores: Dict[str, float] = {}
+        matched: Dict[str, int] = {}
+        for term in terms:
+            for entry_id, weight in self.postings.get(term, {}).items():
+                scores[entry_id] = scores.get(entry_id, 0.0) + weight
+                matched[entry_id] = matched.get(entry_id, 0) + 1
+        ranked = sorted(scores, key=lambda entry_id: (-matched[entry_id], -scores[entry_id]))
+        return [(entry_id, scores[entry_id]) for entry_id in ranked[:limit]]
+
+
+class PrefixIndex:
+    """
+    Sorted-array prefix index over entry titles and IDs, for autocomplete.
+
+    Every word of an entry's title and every ``_``-separated part of its ID
+    is stored as a normalized key in one sorted list; all keys starting with
+    a prefix form a contiguous run found with two binary searches.
+    """
+
+    def __init__(self):
+        """Initialize an empty PrefixIndex."""
+        self._keys: List[str] = []
+        self._entry_ids: List[str] = []
+        self._rank: Dict[str, int] = {}
+
+    @classmethod
+    def build(cls, titles: Mapping[str, str]) -> 'PrefixIndex':
+        """
+        Build an index over entry titles and IDs.
+
+        Args:
+            titles: entry_id -> title, in the order results should be listed
+
+        Returns:
+            The new index
+        """
+        index = cls()
+        pairs = []
+        for rank, (entry_id, title) in enumerate(titles.items()):
+            index._rank[entry_id] = rank
+            words = set(_TOKEN_RE.findall(normalize(title).replace('_', ' ')))
+            words.update(normalize(entry_id).split('_'))
+            pairs.extend((word, entry_id) for word in words if word)
+        pairs.sort()
+        index._keys = [word for word, _ in pairs]
+        index._entry_ids = [entry_id for _, entry_id in pairs]
+        return index
+
+    def _lookup(self, prefix: str) -> set:
+        """IDs of entries having a title word or ID part starting with prefix."""
+        start = bisect.bisect_left(self._keys, prefix)
+        end = bisect.bisect_left(self._keys, prefix + '\U0010ffff', start)
+        return set(self._entry_ids[start:end])
+
+    def complete(self, query: str, limit: int = 20) -> List[str]:
+        """
+        Find entries matching every word of a (partially typed) query.
+
+        Args:
+            query: Query text; each word is matched as a prefix
+            limit: Maximum number of results
+
+        Returns:
+            Matching entry IDs, in index order
+        """
+        words = _TOKEN_RE.findall(normalize(query).replace('_', ' '))
+        if not words:
+            return []
+        matches = self._lookup(words[0])
+        for word in words[1:]:
+            if not matches:
+                break
+            matches &= self._lookup(word)
+        return sorted(matches, key=self._rank.__getitem__)[:limit]
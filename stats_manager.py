@@ -1,62 +1,118 @@
 """Statistics manager for tracking bot usage."""
-import json
 import logging
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from datetime import datetime
-from typing import Dict, List, Any
-from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Collection, Dict, Iterator, List, Optional, Tuple
+from metrics import timed
+from stats_storage import StatsStorage, open_storage, period_key
 
 logger = logging.getLogger(__name__)
 
 
 class StatsManager:
-    """Manages bot usage statistics."""
+    """
+    Manages bot usage statistics.
 
-    def __init__(self, stats_file: Path):
+    Every tracking call is recorded as a compact event and handed to a
+    pluggable storage engine (see ``stats_storage``). Tracking calls only
+    touch memory: ``flush()`` persists pending events and is expected to be
+    called periodically (see the job registered in ``main.py``), when
+    ``on_flush_due`` reports that ``flush_every`` events are pending, and
+    on shutdown. At most ``flush_every`` events or one flush interval of
+    data can be lost on a crash.
+
+    All methods are thread-safe: one lock serializes access to the storage
+    engine, so concurrent handlers and a flush running in a worker thread
+    (see ``flush_stats`` in ``main.py``) never interleave a read-modify-write.
+    A flush holds that lock only to take the pending events (and, when the
+    JSON snapshot is due, a copy of the stats); writing them happens after
+    releasing it.
+    """
+
+    def __init__(
+        self,
+        stats_file: Path,
+        flush_every: int = 100,
+        compact_every: int = 1000,
+        backend: str = 'json',
+        unique_mode: str = 'exact',
+        on_flush_due: Optional[Callable[[], None]] = None,
+    ):
         """
         Initialize StatsManager.
 
         Args:
-            stats_file: Path to the JSON file for storing stats
+            stats_file: Path to the JSON snapshot or SQLite database file
+            flush_every: Flush automatically after this many unsaved events
+                (0 disables event-count flushing)
+            compact_every: Rewrite the JSON snapshot after this many journaled events
+            backend: Storage engine, ``'json'`` or ``'sqlite'``
+            unique_mode: Daily unique users as exact sets (``'exact'``) or
+                HyperLogLog sketches (``'hll'``, JSON backend only)
+            on_flush_due: Called (without the lock) once ``flush_every``
+                events are pending, to have ``flush()`` run elsewhere
+                (optional)
         """
         self.stats_file = stats_file
-        self.stats = self._load_stats()
-
-    def _load_stats(self) -> Dict[str, Any]:
-        """Load statistics from file."""
-        if self.stats_file.exists():
-            try:
-                with open(self.stats_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception as e:
-                logger.error(f"Error loading stats: {e}")
-                return self._default_stats()
-        return self._default_stats()
-
-    def _default_stats(self) -> Dict[str, Any]:
-        """Return default stats structure."""
-        return {
-            'users': {},  # user_id: {first_seen, last_seen, username, first_name}
-            'clicks': {},  # entry_id: count
-            'total_clicks': 0,
-            'commands': defaultdict(int),  # command: count
-            'daily_stats': {},  # date: {users: set, clicks: count}
-            'created_at': datetime.now().isoformat(),
-            'last_updated': datetime.now().isoformat()
-        }
-
-    def _save_stats(self) -> bool:
-        """Save statistics to file."""
-        try:
-            self.stats['last_updated'] = datetime.now().isoformat()
-            # Convert sets to lists for JSON serialization
-            stats_copy = json.loads(json.dumps(self.stats, default=list))
-            with open(self.stats_file, 'w', encoding='utf-8') as f:
-                json.dump(stats_copy, f, ensure_ascii=False, indent=2)
-            return True
-        except Exception as e:
-            logger.error(f"Error saving stats: {e}")
-            return False
+        self.flush_every = flush_every
+        self.on_flush_due = on_flush_due
+        self._flush_requested = False
+        # Reentrant: the summary queries nest
+        self._lock = threading.RLock()
+        # Serializes flushes, which write without holding _lock
+        self._flush_lock = threading.Lock()
+        self.storage: StatsStorage = open_storage(
+            backend,
+            stats_file,
+            compact_every=compact_every,
+            unique_mode=unique_mode,
+        )
+
+    @contextmanager
+    def _storage_access(self) -> Iterator[None]:
+        """Hold the lock; time spent waiting and working counts as stats I/O in metrics."""
+        with timed('stats'), self._lock:
+            yield
+
+    def _record(self, event: Dict[str, Any]) -> None:
+        """Hand a new event to the storage engine and report once a flush is due."""
+        with self._storage_access():
+            self.storage.record(event)
+            due = (
+                self.flush_every
+                and not self._flush_requested
+                and self.storage.pending_events >= self.flush_every
+            )
+            if due:
+                self._flush_requested = True
+        if due and self.on_flush_due:
+            self.on_flush_due()
+
+    @property
+    def is_dirty(self) -> bool:
+        """Whether there are events not yet written to disk."""
+        return self.storage.pending_events > 0
+
+    def flush(self) -> bool:
+        """
+        Persist pending events.
+
+        Returns:
+            True if all events are on disk (or nothing was pending), False on error
+        """
+        with self._flush_lock:
+            with self._storage_access():
+                self._flush_requested = False
+                write = self.storage.prepare_flush()
+            return write()
+
+    def close(self) -> None:
+        """Flush pending events and release the storage engine."""
+        with self._flush_lock, self._storage_access():
+            self.storage.close()
 
     def track_user(self, user_id: int, username: str = None, first_name: str = None) -> None:
         """
@@ -67,26 +123,13 @@ class StatsManager:
             username: The user's username (optional)
             first_name: The user's first name (optional)
         """
-        user_id_str = str(user_id)
-        current_time = datetime.now().isoformat()
-
-        if user_id_str not in self.stats['users']:
-            self.stats['users'][user_id_str] = {
-                'first_seen': current_time,
-                'last_seen': current_time,
-                'username': username,
-                'first_name': first_name,
-                'interactions': 0
-            }
-        else:
-            self.stats['users'][user_id_str]['last_seen'] = current_time
-            if username:
-                self.stats['users'][user_id_str]['username'] = username
-            if first_name:
-                self.stats['users'][user_id_str]['first_name'] = first_name
-
-        self.stats['users'][user_id_str]['interactions'] += 1
-        self._save_stats()
+        self._record({
+            'type': 'user',
+            'ts': int(time.time()),
+            'user_id': str(user_id),
+            'username': username,
+            'first_name': first_name,
+        })
 
     def track_click(self, entry_id: str, user_id: int = None) -> None:
         """
@@ -96,27 +139,27 @@ class StatsManager:
             entry_id: The ID of the entry that was clicked
             user_id: The user who clicked (optional)
         """
-        if entry_id not in self.stats['clicks']:
-            self.stats['clicks'][entry_id] = 0
-        
-        self.stats['clicks'][entry_id] += 1
-        self.stats['total_clicks'] += 1
-
-        # Track daily stats
-        today = datetime.now().strftime('%Y-%m-%d')
-        if today not in self.stats['daily_stats']:
-            self.stats['daily_stats'][today] = {
-                'users': [],
-                'clicks': 0
-            }
-        
-        self.stats['daily_stats'][today]['clicks'] += 1
-        if user_id:
-            user_list = self.stats['daily_stats'][today]['users']
-            if str(user_id) not in user_list:
-                user_list.append(str(user_id))
+        self._record({
+            'type': 'click',
+            'ts': int(time.time()),
+            'entry_id': entry_id,
+            'user_id': str(user_id) if user_id else None,
+        })
+
+    def forget_user(self, user_id: int) -> None:
+        """
+        Remove a user who can no longer be reached (e.g. blocked the bot).
+
+        Their past clicks stay in the statistics.
 
-        self._save_stats()
+        Args:
+            user_id: The Telegram user ID
+        """
+        self._record({
+            'type': 'forget_user',
+            'ts': int(time.time()),
+            'user_id': str(user_id),
+        })
 
     def track_command(self, command: str) -> None:
         """
@@ -125,18 +168,37 @@ class StatsManager:
         Args:
             command: The command that was used (e.g., 'start', 'stats')
         """
-        if 'commands' not in self.stats:
-            self.stats['commands'] = {}
-        
-        if command not in self.stats['commands']:
-            self.stats['commands'][command] = 0
-        
-        self.stats['commands'][command] += 1
-        self._save_stats()
+        self._record({
+            'type': 'command',
+            'ts': int(time.time()),
+            'command': command,
+        })
+
+    @staticmethod
+    def _recent_dates(days: int) -> List[str]:
+        """Dates (YYYY-MM-DD) of the last N days, today first."""
+        today = datetime.now()
+        return [
+            (today - timedelta(days=i)).strftime('%Y-%m-%d')
+            for i in range(days)
+        ]
+
+    @staticmethod
+    def _recent_periods(period: str, count: int) -> List[str]:
+        """Keys of the last N weeks or months (see ``period_key``), current first."""
+        today = datetime.now()
+        if period == 'week':
+            return [
+                period_key('week', (today - timedelta(weeks=i)).strftime('%Y-%m-%d'))
+                for i in range(count)
+            ]
+        months = today.year * 12 + today.month - 1
+        return [f"{(months - i) // 12:04d}-{(months - i) % 12 + 1:02d}" for i in range(count)]
 
     def get_total_users(self) -> int:
         """Get total number of unique users."""
-        return len(self.stats['users'])
+        with self._storage_access():
+            return self.storage.total_users()
 
     def get_active_users(self, days: int = 7) -> int:
         """
@@ -148,79 +210,156 @@ class StatsManager:
         Returns:
             Count of active users
         """
-        from datetime import timedelta
         cutoff = datetime.now() - timedelta(days=days)
-        
-        active = 0
-        for user_data in self.stats['users'].values():
-            last_seen = datetime.fromisoformat(user_data['last_seen'])
-            if last_seen >= cutoff:
-                active += 1
-        
-        return active
+        with self._storage_access():
+            return self.storage.active_users(cutoff)
 
-    def get_top_entries(self, limit: int = 10) -> List[tuple]:
+    def get_recent_users(self, limit: int = 20) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Get the most recently seen users.
+
+        Args:
+            limit: Maximum number of users to return
+
+        Returns:
+            List of tuples (user_id, user_data), most recent first
+        """
+        with self._storage_access():
+            return self.storage.recent_users(limit)
+
+    def get_user_ids_after(self, after: str = '', limit: int = 100) -> List[str]:
+        """
+        Page through all user IDs.
+
+        Args:
+            after: Last user ID of the previous page ('' for the first page)
+            limit: Maximum number of IDs to return
+
+        Returns:
+            User IDs in ascending string order; an empty list after the last page
+        """
+        with self._storage_access():
+            return self.storage.user_ids_after(after, limit)
+
+    def get_top_entries(
+        self,
+        limit: int = 10,
+        within: Optional[Collection[str]] = None,
+    ) -> List[tuple]:
         """
         Get most clicked entries.
 
         Args:
             limit: Maximum number of entries to return
+            within: Only rank these entry IDs, e.g. one subtree (optional)
 
         Returns:
             List of tuples (entry_id, click_count)
         """
-        sorted_clicks = sorted(
-            self.stats['clicks'].items(),
-            key=lambda x: x[1],
-            reverse=True
-        )
-        return sorted_clicks[:limit]
+        with self._storage_access():
+            return self.storage.top_entries(limit, within)
 
-    def get_stats_summary(self) -> Dict[str, Any]:
+    def get_stats_summary(
+        self,
+        top_limit: int = 5,
+        top_within: Optional[Collection[str]] = None,
+    ) -> Dict[str, Any]:
         """
         Get a summary of all statistics.
 
+        Args:
+            top_limit: Number of entries in the leaderboard
+            top_within: Restrict the leaderboard to these entry IDs (optional)
+
         Returns:
             Dictionary with summary statistics
         """
-        return {
-            'total_users': self.get_total_users(),
-            'active_users_7d': self.get_active_users(7),
-            'active_users_30d': self.get_active_users(30),
-            'total_clicks': self.stats['total_clicks'],
-            'top_entries': self.get_top_entries(5),
-            'commands_used': dict(self.stats.get('commands', {})),
-            'created_at': self.stats['created_at'],
-            'last_updated': self.stats['last_updated']
-        }
+        # One consistent view: no events are applied between the queries
+        with self._storage_access():
+            metadata = self.storage.metadata()
+            return {
+                'total_users': self.get_total_users(),
+                'active_users_7d': self.get_active_users(7),
+                'active_users_30d': self.get_active_users(30),
+                'total_clicks': self.storage.total_clicks(),
+                'top_entries': self.get_top_entries(top_limit, top_within),
+                'commands_used': self.storage.commands(),
+                'created_at': metadata['created_at'],
+                'last_updated': metadata['last_updated']
+            }
 
     def get_daily_stats(self, days: int = 7) -> Dict[str, Any]:
         """
         Get daily statistics for the last N days.
 
+        Days older than the retention window (see ``roll_up_daily_stats``)
+        count as empty; their totals are in the weekly and monthly stats.
+
         Args:
             days: Number of days to include
 
         Returns:
             Dictionary with daily stats
         """
-        from datetime import timedelta
-        
-        result = {}
-        today = datetime.now()
-        
-        for i in range(days):
-            date = (today - timedelta(days=i)).strftime('%Y-%m-%d')
-            if date in self.stats['daily_stats']:
-                day_data = self.stats['daily_stats'][date]
-                result[date] = {
-                    'unique_users': len(day_data.get('users', [])),
-                    'clicks': day_data.get('clicks', 0)
-                }
-            else:
-                result[date] = {
-                    'unique_users': 0,
-                    'clicks': 0
-                }
-        
-        return result
+        with self._storage_access():
+            return self.storage.daily_stats(self._recent_dates(days))
+
+    def get_unique_users(self, days: int = 7) -> int:
+        """
+        Get number of distinct users who clicked in the last N days.
+
+        Args:
+            days: Number of days to include
+
+        Returns:
+            Count of unique users (approximate in HyperLogLog mode)
+        """
+        with self._storage_access():
+            return self.storage.unique_users(self._recent_dates(days))
+
+    def get_weekly_stats(self, weeks: int = 8) -> Dict[str, Dict[str, int]]:
+        """
+        Get statistics of the last N ISO weeks.
+
+        Args:
+            weeks: Number of weeks to include, the current one first
+
+        Returns:
+            Dictionary mapping week keys (e.g. '2024-W07') to unique users,
+            clicks and days with activity
+        """
+        with self._storage_access():
+            return self.storage.period_stats('week', self._recent_periods('week', weeks))
+
+    def get_monthly_stats(self, months: int = 6) -> Dict[str, Dict[str, int]]:
+        """
+        Get statistics of the last N calendar months.
+
+        Args:
+            months: Number of months to include, the current one first
+
+        Returns:
+            Dictionary mapping months (e.g. '2024-02') to unique users,
+            clicks and days with activity
+        """
+        with self._storage_access():
+            return self.storage.period_stats('month', self._recent_periods('month', months))
+
+    def roll_up_daily_stats(self, keep_days: int) -> int:
+        """
+        Keep per-day statistics for the last N days; fold older days into
+        weekly and monthly rollups.
+
+        Args:
+            keep_days: Days kept in full, today included
+
+        Returns:
+            Number of days rolled up
+        """
+        oldest_kept = self._recent_dates(keep_days)[-1]
+        # Compacts, so no flush may be writing meanwhile
+        with self._flush_lock, self._storage_access():
+            rolled_up = self.storage.roll_up(oldest_kept)
+        if rolled_up:
+            logger.info(f"Rolled up {rolled_up} days of statistics before {oldest_kept}")
+        return rolled_up
@@ -0,0 +1,1298 @@
+"""Storage backends for bot usage statistics."""
+import bisect
+import functools
+import json
+import logging
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from pathlib import Path
+from datetime import datetime
+from typing import Any, Callable, Collection, Dict, Iterable, List, Optional, Tuple
+from collections import defaultdict
+from hyperloglog import HyperLogLog
+
+logger = logging.getLogger(__name__)
+
+SECONDS_PER_DAY = 86400
+
+
+def to_epoch(value: Any) -> int:
+    """Convert an epoch or a legacy ISO timestamp string to epoch seconds."""
+    if isinstance(value, str):
+        return int(datetime.fromisoformat(value).timestamp())
+    return int(value)
+
+
+def day_key(ts: int) -> str:
+    """Local calendar date (YYYY-MM-DD) of an epoch timestamp."""
+    return datetime.fromtimestamp(ts).strftime('%Y-%m-%d')
+
+
+# Daily statistics past the retention window are rolled up into these periods
+PERIODS = ('week', 'month')
+
+
+def period_key(period: str, date: str) -> str:
+    """ISO week (``2024-W07``) or month (``2024-02``) of a ``YYYY-MM-DD`` date."""
+    if period == 'month':
+        return date[:7]
+    year, week, _ = datetime.strptime(date, '%Y-%m-%d').isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def period_start(period: str, key: str) -> str:
+    """First date (``YYYY-MM-DD``) of a week or month key from ``period_key``."""
+    if period == 'month':
+        return f"{key}-01"
+    return datetime.strptime(f"{key}-1", '%G-W%V-%u').strftime('%Y-%m-%d')
+
+
+# Rollups list the IDs of their users up to this many, then switch to a
+# HyperLogLog sketch, which is smaller than a longer list
+ROLLUP_EXACT_USERS = 400
+
+
+def new_rollup() -> Dict[str, Any]:
+    """Empty aggregate of a week or month: clicks, active days and its users."""
+    return {'clicks': 0, 'days': 0, 'users': set()}
+
+
+def add_rollup_users(
+    rollup: Dict[str, Any],
+    user_ids: Iterable[Any] = (),
+    sketch: Optional[HyperLogLog] = None,
+) -> None:
+    """
+    Add one day's users to a rollup.
+
+    Args:
+        rollup: Rollup holding ``users`` (a set of IDs) or ``hll`` (a sketch)
+        user_ids: The day's user IDs
+        sketch: The day's users as a sketch (days recorded in 'hll' mode)
+    """
+    if 'users' in rollup:
+        if sketch is None:
+            rollup['users'].update(user_ids)
+            if len(rollup['users']) <= ROLLUP_EXACT_USERS:
+                return
+            user_ids = ()
+        rollup['hll'] = HyperLogLog()
+        rollup['hll'].update(str(user_id) for user_id in rollup.pop('users'))
+    if sketch is not None:
+        rollup['hll'].merge(sketch)
+    rollup['hll'].update(str(user_id) for user_id in user_ids)
+
+
+class ClickRanking:
+    """
+    Entries kept sorted by click count, updated in O(1) per click.
+
+    Entries live in one list ordered by descending count, so entries with
+    equal counts form contiguous blocks. Incrementing an entry swaps it with
+    the first entry of its block and moves that block boundary by one, which
+    keeps the list sorted without re-sorting. Reading the top N is a slice.
+    """
+
+    def __init__(self, counts: Dict[str, int] = None):
+        """
+        Initialize ClickRanking.
+
+        Args:
+            counts: Existing ``{entry_id: count}`` values to rank (optional)
+        """
+        self._counts: Dict[str, int] = {}
+        self._order: List[str] = []
+        self._position: Dict[str, int] = {}
+        self._block_start: Dict[int, int] = {}  # count: index of its first entry
+        for entry_id, count in sorted((counts or {}).items(), key=lambda x: x[1], reverse=True):
+            self._position[entry_id] = len(self._order)
+            self._block_start.setdefault(count, len(self._order))
+            self._order.append(entry_id)
+            self._counts[entry_id] = count
+
+    def increment(self, entry_id: str) -> None:
+        """
+        Add one click to an entry.
+
+        Args:
+            entry_id: The clicked entry
+        """
+        if entry_id not in self._counts:
+            self._counts[entry_id] = 0
+            self._position[entry_id] = len(self._order)
+            self._block_start.setdefault(0, len(self._order))
+            self._order.append(entry_id)
+
+        count = self._counts[entry_id]
+        pos = self._position[entry_id]
+        first = self._block_start[count]
+
+        # Swap with the first entry of the block, which then joins the block above
+        other = self._order[first]
+        self._order[first], self._order[pos] = entry_id, other
+        self._position[entry_id], self._position[other] = first, pos
+
+        self._block_start.setdefault(count + 1, first)
+        nxt = first + 1
+        if nxt < len(self._order) and self._counts[self._order[nxt]] == count:
+            self._block_start[count] = nxt
+        else:
+            del self._block_start[count]
+        self._counts[entry_id] = count + 1
+
+    def top(self, limit: int, within: Optional[Collection[str]] = None) -> List[Tuple[str, int]]:
+        """
+        Get the most clicked entries.
+
+        Args:
+            limit: Maximum number of entries to return
+            within: Only rank these entry IDs (optional)
+
+        Returns:
+            List of tuples (entry_id, click_count), highest first
+        """
+        if within is None:
+            return [(entry_id, self._counts[entry_id]) for entry_id in self._order[:limit]]
+
+        result = []
+        for entry_id in self._order:
+            if len(result) >= limit:
+                break
+            if entry_id in within:
+                result.append((entry_id, self._counts[entry_id]))
+        return result
+
+
+def rollup_columns(rollup: Dict[str, Any]) -> Tuple[int, int, Optional[str], Optional[str]]:
+    """``clicks, days, user_ids, users_hll`` of a rollup for the SQLite ``rollups`` table."""
+    if 'hll' in rollup:
+        return rollup['clicks'], rollup['days'], None, rollup['hll'].to_string()
+    user_ids = sorted(str(user_id) for user_id in rollup['users'])
+    return rollup['clicks'], rollup['days'], json.dumps(user_ids), None
+
+
+class StatsStorage(ABC):
+    """
+    Base class for statistics storage engines.
+
+    ``StatsManager`` turns every tracking call into an event dictionary and
+    hands it to ``record()``. Backends decide how events are buffered and
+    persisted (``flush()``) and answer the aggregate queries used by the
+    admin commands.
+    """
+
+    # Bytes written to disk by this instance, or None if the engine does not
+    # track it (used by benchmarks)
+    bytes_written: Optional[int] = None
+
+    @property
+    @abstractmethod
+    def pending_events(self) -> int:
+        """Number of recorded events not yet persisted."""
+
+    @abstractmethod
+    def record(self, event: Dict[str, Any]) -> None:
+        """Record a tracking event."""
+
+    @abstractmethod
+    def flush(self) -> bool:
+        """Persist pending events. Returns False on error."""
+
+    def prepare_flush(self) -> Callable[[], bool]:
+        """
+        Take the pending events for a flush that finishes later.
+
+        ``StatsManager`` calls this while holding its lock and the returned
+        function after releasing it, so slow writes do not hold up the
+        tracking calls. By default the whole flush happens here.
+
+        Returns:
+            Function persisting the taken events; it returns False on error
+        """
+        result = self.flush()
+        return lambda: result
+
+    def close(self) -> None:
+        """Flush and release any resources held by the backend."""
+        self.flush()
+
+    @abstractmethod
+    def total_users(self) -> int:
+        """Number of unique users ever seen."""
+
+    @abstractmethod
+    def active_users(self, since: datetime) -> int:
+        """Number of users seen at or after ``since``."""
+
+    @abstractmethod
+    def recent_users(self, limit: int) -> List[Tuple[str, Dict[str, Any]]]:
+        """Most recently seen users as ``(user_id, user_data)`` pairs."""
+
+    @abstractmethod
+    def user_ids_after(self, after: str, limit: int) -> List[str]:
+        """Up to ``limit`` user IDs sorting after ``after``, in ascending string order."""
+
+    @abstractmethod
+    def total_clicks(self) -> int:
+        """Total number of tracked clicks."""
+
+    @abstractmethod
+    def top_entries(
+        self,
+        limit: int,
+        within: Optional[Collection[str]] = None,
+    ) -> List[Tuple[str, int]]:
+        """Most clicked entries as ``(entry_id, count)`` pairs, optionally only among ``within``."""
+
+    @abstractmethod
+    def commands(self) -> Dict[str, int]:
+        """Usage count per command."""
+
+    @abstractmethod
+    def daily_stats(self, dates: List[str]) -> Dict[str, Dict[str, int]]:
+        """``{date: {'unique_users', 'clicks'}}`` for the given ``YYYY-MM-DD`` dates."""
+
+    @abstractmethod
+    def unique_users(self, dates: List[str]) -> int:
+        """Number of distinct users who clicked on any of the given dates."""
+
+    @abstractmethod
+    def period_stats(self, period: str, keys: List[str]) -> Dict[str, Dict[str, int]]:
+        """
+        ``{key: {'unique_users', 'clicks', 'days'}}`` for weeks or months.
+
+        Combines the rollup of each period with its days that are still
+        kept in full. Unique users are estimated once a period's rollup has
+        switched to a sketch.
+        """
+
+    @abstractmethod
+    def roll_up(self, before: str) -> int:
+        """
+        Fold daily statistics of dates before ``before`` into weekly and
+        monthly rollups and delete them. Returns the number of days rolled up.
+        """
+
+    @abstractmethod
+    def metadata(self) -> Dict[str, str]:
+        """``created_at`` and ``last_updated`` timestamps."""
+
+
+class JsonStatsStorage(StatsStorage):
+    """
+    In-memory statistics persisted as a JSON snapshot plus an event journal.
+
+    Events are applied to the in-memory stats immediately and buffered for
+    the on-disk journal (``stats.journal`` next to ``stats.json``), so the
+    write cost per event does not depend on the size of the history.
+    ``flush()`` appends buffered events to the journal; once
+    ``compact_every`` events have been journaled the full stats are written
+    to an atomically replaced snapshot and the journal is truncated. On
+    startup the snapshot is loaded and the journal tail is replayed on top.
+    ``prepare_flush()`` only takes the buffer and, when compaction is due,
+    a copy of the stats; the serializing and fsyncing happen in the
+    function it returns.
+
+    Daily unique users are kept as a set of integer IDs per day
+    (``unique_mode='exact'``) or as a fixed-size HyperLogLog sketch per day
+    (``unique_mode='hll'``), which keeps memory flat for large audiences at
+    the cost of ~1.6% counting error.
+
+    User timestamps are epoch seconds. An activity index maps each UTC day
+    bucket to the number of users last seen in it, so active-user counts sum
+    a few buckets instead of scanning every user.
+
+    ``roll_up()`` replaces old days with weekly and monthly rollups (click
+    counts and the users' IDs, or a HyperLogLog sketch of them once there
+    are many), keeping the snapshot from growing with every day of history.
+    """
+
+    def __init__(self, stats_file: Path, compact_every: int = 1000, unique_mode: str = 'exact'):
+        """
+        Initialize JsonStatsStorage.
+
+        Args:
+            stats_file: Path to the JSON snapshot file
+            compact_every: Rewrite the snapshot after this many journaled events
+            unique_mode: ``'exact'`` (sets) or ``'hll'`` (HyperLogLog sketches)
+        """
+        if unique_mode not in ('exact', 'hll'):
+            raise ValueError(f"Unknown unique_mode: {unique_mode}")
+        self.stats_file = stats_file
+        self.journal_file = stats_file.with_suffix('.journal')
+        self.compact_every = compact_every
+        self.unique_mode = unique_mode
+        self._pending: List[Dict[str, Any]] = []
+        # Taken by a flush and not yet journaled; a failed flush leaves them here
+        self._unwritten: List[Dict[str, Any]] = []
+        self._journaled_events = 0
+        self.bytes_written = 0
+        self._activity: Dict[int, int] = defaultdict(int)  # day bucket: users last seen then
+        # Built on the first user_ids_after call, then kept sorted as users come and go
+        self._sorted_user_ids: Optional[List[str]] = None
+        self.stats = self._load_stats()
+        self._prepare_users()
+        self._prepare_daily_stats()
+        self._prepare_rollups()
+        self._ranking = ClickRanking(self.stats['clicks'])
+        self._replay_journal()
+
+    def _load_stats(self) -> Dict[str, Any]:
+        """Load the statistics snapshot from file."""
+        if self.stats_file.exists():
+            try:
+                with open(self.stats_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                # Keep the unreadable file for manual recovery instead of
+                # overwriting it with empty stats on the next save
+                backup = self.stats_file.with_name(
+                    f"{self.stats_file.name}.corrupt-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+                )
+                logger.error(f"Error loading stats: {e}. Moved unreadable file to {backup}")
+                try:
+                    os.replace(self.stats_file, backup)
+                except OSError:
+                    logger.exception("Failed to move unreadable stats file aside")
+                return self._default_stats()
+        return self._default_stats()
+
+    def _prepare_users(self) -> None:
+        """Convert legacy ISO user timestamps and build the activity index."""
+        for user_data in self.stats['users'].values():
+            user_data['first_seen'] = to_epoch(user_data['first_seen'])
+            user_data['last_seen'] = to_epoch(user_data['last_seen'])
+            self._activity[user_data['last_seen'] // SECONDS_PER_DAY] += 1
+
+    def _prepare_daily_stats(self) -> None:
+        """Convert persisted daily user data into in-memory sets or sketches."""
+        for day_data in self.stats['daily_stats'].values():
+            if 'hll' in day_data:
+                day_data['hll'] = HyperLogLog.from_string(day_data['hll'])
+                continue
+            # Older snapshots store user IDs as strings
+            users = {int(user_id) for user_id in day_data.get('users', [])}
+            if self.unique_mode == 'hll':
+                sketch = HyperLogLog()
+                sketch.update(str(user_id) for user_id in users)
+                day_data.pop('users', None)
+                day_data['hll'] = sketch
+            else:
+                day_data['users'] = users
+
+    def _prepare_rollups(self) -> None:
+        """Load rollup users as sets or sketches; snapshots older than rollups get none."""
+        rollups = self.stats.setdefault('rollups', {})
+        for period in PERIODS:
+            for rollup in rollups.setdefault(period, {}).values():
+                if 'hll' in rollup:
+                    rollup['hll'] = HyperLogLog.from_string(rollup['hll'])
+                else:
+                    rollup['users'] = set(rollup['users'])
+
+    @staticmethod
+    def _json_default(value: Any) -> Any:
+        """Serialize in-memory unique-user structures compactly."""
+        if isinstance(value, set):
+            return sorted(value)
+        if isinstance(value, HyperLogLog):
+            return value.to_string()
+        return list(value)
+
+    def _replay_journal(self) -> None:
+        """Apply journaled events newer than the loaded snapshot."""
+        if not self.journal_file.exists():
+            return
+
+        last_seq = self.stats.get('seq', 0)
+        replayed = 0
+        damaged = False
+        with open(self.journal_file, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line is expected after a crash mid-append
+                    logger.warning(f"Skipping unreadable stats journal line {line_no}")
+                    damaged = True
+                    continue
+                self._journaled_events += 1
+                # Skips events already in the snapshot, and second copies
+                # left by an append that failed after writing part of a batch
+                if event.get('seq', 0) <= last_seq:
+                    continue
+                self._apply_event(event)
+                last_seq = self.stats['seq'] = event['seq']
+                replayed += 1
+
+        if replayed:
+            logger.info(f"Replayed {replayed} events from stats journal")
+        if damaged:
+            # Start a clean journal so new events are not appended to a torn line
+            self._compact()
+
+    def _default_stats(self) -> Dict[str, Any]:
+        """Return default stats structure."""
+        return {
+            'users': {},  # user_id: {first_seen, last_seen, username, first_name}
+            'clicks': {},  # entry_id: count
+            'total_clicks': 0,
+            'commands': defaultdict(int),  # command: count
+            'daily_stats': {},  # date: {users: set or hll: sketch, clicks: count}
+            'rollups': {period: {} for period in PERIODS},  # period: key: {clicks, days, users or hll}
+            'seq': 0,  # sequence number of the last applied event
+            'created_at': datetime.now().isoformat(),
+            'last_updated': datetime.now().isoformat()
+        }
+
+    def _snapshot(self) -> Dict[str, Any]:
+        """Copy the stats, so they can be serialized while new events are applied."""
+        self.stats['last_updated'] = datetime.now().isoformat()
+        snapshot = dict(self.stats)
+        snapshot['users'] = {
+            user_id: dict(user_data) for user_id, user_data in self.stats['users'].items()
+        }
+        snapshot['clicks'] = dict(self.stats['clicks'])
+        snapshot['commands'] = dict(self.stats.get('commands', {}))
+        snapshot['daily_stats'] = {
+            date: self._copy_counts(day_data) for date, day_data in self.stats['daily_stats'].items()
+        }
+        snapshot['rollups'] = {
+            period: {key: self._copy_counts(rollup) for key, rollup in rollups.items()}
+            for period, rollups in self.stats['rollups'].items()
+        }
+        return snapshot
+
+    @staticmethod
+    def _copy_counts(data: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy a day or rollup record; sketches are copied in their saved form."""
+        return {
+            key: set(value) if isinstance(value, set)
+            else value.to_string() if isinstance(value, HyperLogLog)
+            else value
+            for key, value in data.items()
+        }
+
+    def _save_stats(self, snapshot: Dict[str, Any]) -> bool:
+        """Atomically write a statistics snapshot (see ``_snapshot``) to file."""
+        tmp_path = None
+        try:
+            # Write to a temp file in the same directory, then rename over the
+            # snapshot so a crash never leaves a truncated stats file behind
+            fd, tmp_path = tempfile.mkstemp(
+                dir=self.stats_file.parent,
+                prefix=f".{self.stats_file.name}.",
+                suffix='.tmp',
+            )
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(
+                    snapshot, f,
+                    ensure_ascii=False,
+                    separators=(',', ':'),
+                    default=self._json_default,
+                )
+                f.flush()
+                os.fsync(f.fileno())
+                self.bytes_written += f.tell()
+            os.replace(tmp_path, self.stats_file)
+            return True
+        except Exception as e:
+            logger.error(f"Error saving stats: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            return False
+
+    def _append_journal(self, events: List[Dict[str, Any]]) -> bool:
+        """Append events to the journal file, all or none of them."""
+        start = None
+        try:
+            with open(self.journal_file, 'a', encoding='utf-8') as f:
+                start = f.tell()
+                for event in events:
+                    f.write(json.dumps(event, ensure_ascii=False, separators=(',', ':')))
+                    f.write('\n')
+                f.flush()
+                os.fsync(f.fileno())
+                self.bytes_written += f.tell() - start
+            return True
+        except Exception as e:
+            logger.error(f"Error appending to stats journal: {e}")
+            # The events stay buffered and are appended again by the next
+            # flush, so drop whatever part of them reached the file
+            if start is not None:
+                try:
+                    os.truncate(self.journal_file, start)
+                except OSError:
+                    logger.exception("Failed to truncate stats journal after a failed append")
+            return False
+
+    def _compact(self, snapshot: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Write a snapshot and truncate the journal.
+
+        Args:
+            snapshot: Copy taken by ``_snapshot`` once every journaled event
+                was applied (default: the current state)
+        """
+        if not self._save_stats(snapshot if snapshot is not None else self._snapshot()):
+            return False
+        # Events already in the snapshot are skipped on replay by sequence
+        # number, so a crash between the rename and the truncate is harmless
+        try:
+            open(self.journal_file, 'w', encoding='utf-8').close()
+        except OSError as e:
+            logger.error(f"Error truncating stats journal: {e}")
+            return False
+        self._journaled_events = 0
+        return True
+
+    @property
+    def pending_events(self) -> int:
+        return len(self._unwritten) + len(self._pending)
+
+    def record(self, event: Dict[str, Any]) -> None:
+        self.stats['seq'] = self.stats.get('seq', 0) + 1
+        event['seq'] = self.stats['seq']
+        self._apply_event(event)
+        self._pending.append(event)
+
+    def prepare_flush(self) -> Callable[[], bool]:
+        events = self._unwritten = self._unwritten + self._pending
+        self._pending = []
+        snapshot = None
+        if self.compact_every and self._journaled_events + len(events) >= self.compact_every:
+            snapshot = self._snapshot()
+        return functools.partial(self._write, events, snapshot)
+
+    def _write(self, events: List[Dict[str, Any]], snapshot: Optional[Dict[str, Any]]) -> bool:
+        """Journal the events taken by ``prepare_flush``, then compact if a snapshot was taken."""
+        if events:
+            if not self._append_journal(events):
+                return False
+            self._journaled_events += len(events)
+            self._unwritten = []
+        if snapshot is not None:
+            return self._compact(snapshot)
+        return True
+
+    def flush(self) -> bool:
+        return self.prepare_flush()()
+
+    def close(self) -> None:
+        # Fold the journal into the snapshot so the next start has nothing to replay
+        if self.flush() and self._journaled_events:
+            self._compact()
+
+    def _apply_event(self, event: Dict[str, Any]) -> None:
+        """
+        Apply a single event to the in-memory stats.
+
+        Args:
+            event: Event dictionary as produced by ``StatsManager``
+        """
+        kind = event['type']
+        if kind == 'user':
+            self._apply_user(event)
+        elif kind == 'click':
+            self._apply_click(event)
+        elif kind == 'command':
+            self._apply_command(event)
+        elif kind == 'forget_user':
+            self._apply_forget_user(event)
+        else:
+            logger.warning(f"Unknown stats event type: {kind}")
+
+    def _apply_user(self, event: Dict[str, Any]) -> None:
+        user_id_str = event['user_id']
+        current_time = to_epoch(event['ts'])
+        username = event.get('username')
+        first_name = event.get('first_name')
+
+        user_data = self.stats['users'].get(user_id_str)
+        if user_data is None:
+            if self._sorted_user_ids is not None:
+                bisect.insort(self._sorted_user_ids, user_id_str)
+            user_data = self.stats['users'][user_id_str] = {
+                'first_seen': current_time,
+                'last_seen': current_time,
+                'username': username,
+                'first_name': first_name,
+                'interactions': 0
+            }
+        else:
+            # Move the user from their previous activity bucket
+            old_bucket = user_data['last_seen'] // SECONDS_PER_DAY
+            self._activity[old_bucket] -= 1
+            if not self._activity[old_bucket]:
+                del self._activity[old_bucket]
+            user_data['last_seen'] = current_time
+            if username:
+                user_data['username'] = username
+            if first_name:
+                user_data['first_name'] = first_name
+
+        self._activity[current_time // SECONDS_PER_DAY] += 1
+        user_data['interactions'] += 1
+
+    def _apply_click(self, event: Dict[str, Any]) -> None:
+        entry_id = event['entry_id']
+        user_id = event.get('user_id')
+
+        if entry_id not in self.stats['clicks']:
+            self.stats['clicks'][entry_id] = 0
+
+        self.stats['clicks'][entry_id] += 1
+        self.stats['total_clicks'] += 1
+        self._ranking.increment(entry_id)
+
+        # Track daily stats
+        today = day_key(to_epoch(event['ts']))
+        day_data = self.stats['daily_stats'].get(today)
+        if day_data is None:
+            day_data = {'clicks': 0}
+            if self.unique_mode == 'hll':
+                day_data['hll'] = HyperLogLog()
+            else:
+                day_data['users'] = set()
+            self.stats['daily_stats'][today] = day_data
+
+        day_data['clicks'] += 1
+        if user_id:
+            if 'hll' in day_data:
+                day_data['hll'].add(user_id)
+            else:
+                day_data['users'].add(int(user_id))
+
+    def _apply_forget_user(self, event: Dict[str, Any]) -> None:
+        # Clicks and daily unique counts are history and stay as they are
+        user_data = self.stats['users'].pop(event['user_id'], None)
+        if user_data is None:
+            return
+        if self._sorted_user_ids is not None:
+            index = bisect.bisect_left(self._sorted_user_ids, event['user_id'])
+            del self._sorted_user_ids[index]
+        bucket = user_data['last_seen'] // SECONDS_PER_DAY
+        self._activity[bucket] -= 1
+        if not self._activity[bucket]:
+            del self._activity[bucket]
+
+    def _apply_command(self, event: Dict[str, Any]) -> None:
+        command = event['command']
+        if 'commands' not in self.stats:
+            self.stats['commands'] = {}
+
+        if command not in self.stats['commands']:
+            self.stats['commands'][command] = 0
+
+        self.stats['commands'][command] += 1
+
+    def total_users(self) -> int:
+        return len(self.stats['users'])
+
+    def active_users(self, since: datetime) -> int:
+        # Day granularity: everyone seen on the cutoff's UTC day counts
+        cutoff_bucket = int(since.timestamp()) // SECONDS_PER_DAY
+        return sum(
+            count for bucket, count in self._activity.items()
+            if bucket >= cutoff_bucket
+        )
+
+    def recent_users(self, limit: int) -> List[Tuple[str, Dict[str, Any]]]:
+        sorted_users = sorted(
+            self.stats['users'].items(),
+            key=lambda x: x[1]['last_seen'],
+            reverse=True
+        )
+        return sorted_users[:limit]
+
+    def user_ids_after(self, after: str, limit: int) -> List[str]:
+        if self._sorted_user_ids is None:
+            self._sorted_user_ids = sorted(self.stats['users'])
+        start = bisect.bisect_right(self._sorted_user_ids, after)
+        return self._sorted_user_ids[start:start + limit]
+
+    def total_clicks(self) -> int:
+        return self.stats['total_clicks']
+
+    def top_entries(
+        self,
+        limit: int,
+        within: Optional[Collection[str]] = None,
+    ) -> List[Tuple[str, int]]:
+        return self._ranking.top(limit, within)
+
+    def commands(self) -> Dict[str, int]:
+        return dict(self.stats.get('commands', {}))
+
+    def daily_stats(self, dates: List[str]) -> Dict[str, Dict[str, int]]:
+        result = {}
+        for date in dates:
+            day_data = self.stats['daily_stats'].get(date, {})
+            if 'hll' in day_data:
+                unique_users = day_data['hll'].count()
+            else:
+                unique_users = len(day_data.get('users', ()))
+            result[date] = {
+                'unique_users': unique_users,
+                'clicks': day_data.get('clicks', 0)
+            }
+        return result
+
+    def unique_users(self, dates: List[str]) -> int:
+        days = [
+            self.stats['daily_stats'][date]
+            for date in dates
+            if date in self.stats['daily_stats']
+        ]
+        return self._count_unique(days)
+
+    @staticmethod
+    def _count_unique(days: List[Dict[str, Any]]) -> int:
+        """Distinct users across days (or rollups); exact unless one of them is a sketch."""
+        if not any('hll' in day_data for day_data in days):
+            return len(set().union(*(day_data.get('users', ()) for day_data in days)))
+
+        # Union of sketches; exact days are folded into a sketch first
+        merged = HyperLogLog()
+        for day_data in days:
+            if 'hll' in day_data:
+                merged.merge(day_data['hll'])
+            else:
+                merged.update(str(user_id) for user_id in day_data.get('users', ()))
+        return merged.count()
+
+    def period_stats(self, period: str, keys: List[str]) -> Dict[str, Dict[str, int]]:
+        days_by_key: Dict[str, List[Dict[str, Any]]] = {key: [] for key in keys}
+        for date, day_data in self.stats['daily_stats'].items():
+            key = period_key(period, date)
+            if key in days_by_key:
+                days_by_key[key].append(day_data)
+
+        result = {}
+        for key, days in days_by_key.items():
+            rollup = self.stats['rollups'][period].get(key)
+            result[key] = {
+                'unique_users': self._count_unique(days + [rollup] if rollup else days),
+                'clicks': sum(day_data['clicks'] for day_data in days) + (rollup['clicks'] if rollup else 0),
+                'days': len(days) + (rollup['days'] if rollup else 0),
+            }
+        return result
+
+    def roll_up(self, before: str) -> int:
+        old_dates = sorted(date for date in self.stats['daily_stats'] if date < before)
+        if not old_dates:
+            return 0
+        for date in old_dates:
+            day_data = self.stats['daily_stats'].pop(date)
+            for period in PERIODS:
+                rollups = self.stats['rollups'][period]
+                rollup = rollups.get(period_key(period, date))
+                if rollup is None:
+                    rollup = rollups[period_key(period, date)] = new_rollup()
+                rollup['clicks'] += day_data.get('clicks', 0)
+                rollup['days'] += 1
+                add_rollup_users(rollup, day_data.get('users', ()), day_data.get('hll'))
+        # Rewrite the snapshot now so it shrinks right away; the journal
+        # only holds events, so a rollup lost in a crash is simply redone
+        if self.flush():
+            self._compact()
+        return len(old_dates)
+
+    def metadata(self) -> Dict[str, str]:
+        return {
+            'created_at': self.stats['created_at'],
+            'last_updated': self.stats['last_updated'],
+        }
+
+
+class SqliteStatsStorage(StatsStorage):
+    """
+    Statistics stored in an SQLite database.
+
+    The database runs in WAL mode. Recorded events are buffered in memory
+    and written in a single transaction per ``flush()``; queries flush first
+    so they always see every recorded event. Aggregates are answered by
+    indexed SQL instead of scanning all users in Python. ``roll_up()``
+    moves old days from ``daily_clicks`` and ``daily_users`` into the
+    ``rollups`` table, one row per week and month.
+    """
+
+    SCHEMA_VERSION = 3
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id TEXT PRIMARY KEY,
+            first_seen INTEGER NOT NULL,
+            last_seen INTEGER NOT NULL,
+            username TEXT,
+            first_name TEXT,
+            interactions INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_users_last_seen ON users (last_seen);
+
+        CREATE TABLE IF NOT EXISTS clicks (
+            entry_id TEXT PRIMARY KEY,
+            count INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_clicks_count ON clicks (count);
+
+        CREATE TABLE IF NOT EXISTS commands (
+            command TEXT PRIMARY KEY,
+            count INTEGER NOT NULL DEFAULT 0
+        );
+
+        CREATE TABLE IF NOT EXISTS daily_clicks (
+            date TEXT PRIMARY KEY,
+            clicks INTEGER NOT NULL DEFAULT 0
+        );
+
+        CREATE TABLE IF NOT EXISTS daily_users (
+            date TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            PRIMARY KEY (date, user_id)
+        ) WITHOUT ROWID;
+
+        CREATE TABLE IF NOT EXISTS rollups (
+            period TEXT NOT NULL,
+            key TEXT NOT NULL,
+            clicks INTEGER NOT NULL DEFAULT 0,
+            days INTEGER NOT NULL DEFAULT 0,
+            user_ids TEXT,  -- JSON list, or NULL once users_hll holds a sketch
+            users_hll TEXT,
+            PRIMARY KEY (period, key)
+        ) WITHOUT ROWID;
+
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    def __init__(self, db_file: Path):
+        """
+        Initialize SqliteStatsStorage.
+
+        Args:
+            db_file: Path to the SQLite database file (created if missing)
+        """
+        self.db_file = db_file
+        self._pending: List[Dict[str, Any]] = []
+        # Imported lazily: only needed when this engine is selected
+        import sqlite3
+        self._db_error = sqlite3.Error
+        # StatsManager serializes all access, so the connection may be used
+        # from the worker thread that runs background flushes
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(self.SCHEMA)
+        self._upgrade_schema()
+        now = datetime.now().isoformat()
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO meta (key, value) VALUES ('created_at', ?)", (now,)
+            )
+            self.conn.execute(
+                "INSERT OR IGNORE INTO meta (key, value) VALUES ('last_updated', ?)", (now,)
+            )
+
+    def _upgrade_schema(self) -> None:
+        """Bring databases created by older versions up to date."""
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        if version >= self.SCHEMA_VERSION:
+            return
+        if version < 2:
+            # Version 1 stored user timestamps as ISO strings in TEXT columns;
+            # rebuild the table so the columns get INTEGER affinity
+            rows = self.conn.execute(
+                "SELECT user_id, first_seen, last_seen, username, first_name, interactions FROM users"
+            ).fetchall()
+            with self.conn:
+                self.conn.execute("DROP TABLE users")
+                self.conn.executescript(self.SCHEMA)
+                self.conn.executemany(
+                    "INSERT INTO users "
+                    "(user_id, first_seen, last_seen, username, first_name, interactions) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        (user_id, to_epoch(first), to_epoch(last), username, first_name, interactions)
+                        for user_id, first, last, username, first_name, interactions in rows
+                    )
+                )
+        # Version 3 added the rollups table, which SCHEMA creates
+        self.conn.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
+
+    @property
+    def pending_events(self) -> int:
+        return len(self._pending)
+
+    def record(self, event: Dict[str, Any]) -> None:
+        self._pending.append(event)
+
+    def flush(self) -> bool:
+        if not self._pending:
+            return True
+        try:
+            with self.conn:
+                for event in self._pending:
+                    self._write_event(event)
+                self.conn.execute(
+                    "UPDATE meta SET value = ? WHERE key = 'last_updated'",
+                    (datetime.now().isoformat(),)
+                )
+            self._pending = []
+            return True
+        except self._db_error as e:
+            logger.error(f"Error writing stats to database: {e}")
+            return False
+
+    def close(self) -> None:
+        self.flush()
+        self.conn.close()
+
+    def _write_event(self, event: Dict[str, Any]) -> None:
+        """Apply a single event inside the current transaction."""
+        kind = event['type']
+        if kind == 'user':
+            self.conn.execute(
+                """
+                INSERT INTO users (user_id, first_seen, last_seen, username, first_name, interactions)
+                VALUES (:user_id, :epoch, :epoch, :username, :first_name, 1)
+                ON CONFLICT (user_id) DO UPDATE SET
+                    last_seen = excluded.last_seen,
+                    username = COALESCE(excluded.username, username),
+                    first_name = COALESCE(excluded.first_name, first_name),
+                    interactions = interactions + 1
+                """,
+                dict(event, epoch=to_epoch(event['ts']))
+            )
+        elif kind == 'click':
+            date = day_key(to_epoch(event['ts']))
+            self.conn.execute(
+                "INSERT INTO clicks (entry_id, count) VALUES (?, 1) "
+                "ON CONFLICT (entry_id) DO UPDATE SET count = count + 1",
+                (event['entry_id'],)
+            )
+            self.conn.execute(
+                "INSERT INTO daily_clicks (date, clicks) VALUES (?, 1) "
+                "ON CONFLICT (date) DO UPDATE SET clicks = clicks + 1",
+                (date,)
+            )
+            if event.get('user_id'):
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO daily_users (date, user_id) VALUES (?, ?)",
+                    (date, event['user_id'])
+                )
+        elif kind == 'command':
+            self.conn.execute(
+                "INSERT INTO commands (command, count) VALUES (?, 1) "
+                "ON CONFLICT (command) DO UPDATE SET count = count + 1",
+                (event['command'],)
+            )
+        elif kind == 'forget_user':
+            self.conn.execute("DELETE FROM users WHERE user_id = ?", (event['user_id'],))
+        else:
+            logger.warning(f"Unknown stats event type: {kind}")
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[tuple]:
+        """Flush pending events and run a read query."""
+        self.flush()
+        return self.conn.execute(sql, params).fetchall()
+
+    def total_users(self) -> int:
+        return self._query("SELECT COUNT(*) FROM users")[0][0]
+
+    def active_users(self, since: datetime) -> int:
+        return self._query(
+            "SELECT COUNT(*) FROM users WHERE last_seen >= ?", (int(since.timestamp()),)
+        )[0][0]
+
+    def recent_users(self, limit: int) -> List[Tuple[str, Dict[str, Any]]]:
+        rows = self._query(
+            "SELECT user_id, first_seen, last_seen, username, first_name, interactions "
+            "FROM users ORDER BY last_seen DESC LIMIT ?",
+            (limit,)
+        )
+        return [
+            (row[0], {
+                'first_seen': row[1],
+                'last_seen': row[2],
+                'username': row[3],
+                'first_name': row[4],
+                'interactions': row[5],
+            })
+            for row in rows
+        ]
+
+    def user_ids_after(self, after: str, limit: int) -> List[str]:
+        rows = self._query(
+            "SELECT user_id FROM users WHERE user_id > ? ORDER BY user_id LIMIT ?", (after, limit)
+        )
+        return [user_id for user_id, in rows]
+
+    def total_clicks(self) -> int:
+        return self._query("SELECT COALESCE(SUM(count), 0) FROM clicks")[0][0]
+
+    def top_entries(
+        self,
+        limit: int,
+        within: Optional[Collection[str]] = None,
+    ) -> List[Tuple[str, int]]:
+        if within is None:
+            return self._query(
+                "SELECT entry_id, count FROM clicks ORDER BY count DESC LIMIT ?", (limit,)
+            )
+
+        # Walk the count index and stop as soon as enough entries match
+        self.flush()
+        result = []
+        for entry_id, count in self.conn.execute(
+            "SELECT entry_id, count FROM clicks ORDER BY count DESC"
+        ):
+            if len(result) >= limit:
+                break
+            if entry_id in within:
+                result.append((entry_id, count))
+        return result
+
+    def commands(self) -> Dict[str, int]:
+        return dict(self._query("SELECT command, count FROM commands"))
+
+    def daily_stats(self, dates: List[str]) -> Dict[str, Dict[str, int]]:
+        result = {date: {'unique_users': 0, 'clicks': 0} for date in dates}
+        if not dates:
+            return result
+        first, last = min(dates), max(dates)
+        for date, clicks in self._query(
+            "SELECT date, clicks FROM daily_clicks WHERE date BETWEEN ? AND ?", (first, last)
+        ):
+            if date in result:
+                result[date]['clicks'] = clicks
+        for date, users in self._query(
+            "SELECT date, COUNT(*) FROM daily_users WHERE date BETWEEN ? AND ? GROUP BY date",
+            (first, last)
+        ):
+            if date in result:
+                result[date]['unique_users'] = users
+        return result
+
+    def unique_users(self, dates: List[str]) -> int:
+        if not dates:
+            return 0
+        return self._query(
+            "SELECT COUNT(DISTINCT user_id) FROM daily_users WHERE date BETWEEN ? AND ?",
+            (min(dates), max(dates))
+        )[0][0]
+
+    def period_stats(self, period: str, keys: List[str]) -> Dict[str, Dict[str, int]]:
+        result = {key: {'unique_users': 0, 'clicks': 0, 'days': 0} for key in keys}
+        if not keys:
+            return result
+        first = min(period_start(period, key) for key in keys)
+        rollups: Dict[str, Dict[str, Any]] = {}
+        for row in self._query(
+            "SELECT key, clicks, days, user_ids, users_hll FROM rollups WHERE period = ? AND key >= ?",
+            (period, period_key(period, first))
+        ):
+            if row[0] in result:
+                rollup = rollups[row[0]] = self._rollup_from_row(row[1:])
+                result[row[0]]['clicks'] += rollup['clicks']
+                result[row[0]]['days'] += rollup['days']
+
+        # Days still kept in full
+        for date, clicks in self._query(
+            "SELECT date, clicks FROM daily_clicks WHERE date >= ?", (first,)
+        ):
+            key = period_key(period, date)
+            if key in result:
+                result[key]['clicks'] += clicks
+                result[key]['days'] += 1
+        users: Dict[str, set] = defaultdict(set)
+        for date, user_id in self._query(
+            "SELECT date, user_id FROM daily_users WHERE date >= ?", (first,)
+        ):
+            users[period_key(period, date)].add(user_id)
+        for key in keys:
+            rollup = rollups.get(key, {})
+            if 'hll' in rollup:
+                rollup['hll'].update(users[key])
+                result[key]['unique_users'] = rollup['hll'].count()
+            else:
+                result[key]['unique_users'] = len(users[key] | rollup.get('users', set()))
+        return result
+
+    @staticmethod
+    def _rollup_from_row(row: Tuple) -> Dict[str, Any]:
+        """Rollup dictionary (see ``new_rollup``) from ``clicks, days, user_ids, users_hll``."""
+        clicks, days, user_ids, users_hll = row
+        if users_hll:
+            return {'clicks': clicks, 'days': days, 'hll': HyperLogLog.from_string(users_hll)}
+        return {'clicks': clicks, 'days': days, 'users': set(json.loads(user_ids or '[]'))}
+
+    def roll_up(self, before: str) -> int:
+        old_dates = [date for date, in self._query(
+            "SELECT date FROM daily_clicks WHERE date < ? "
+            "UNION SELECT DISTINCT date FROM daily_users WHERE date < ? ORDER BY date",
+            (before, before)
+        )]
+        if not old_dates:
+            return 0
+        rollups: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for date in old_dates:
+            clicks = self.conn.execute(
+                "SELECT COALESCE(SUM(clicks), 0) FROM daily_clicks WHERE date = ?", (date,)
+            ).fetchone()[0]
+            user_ids = [user_id for user_id, in self.conn.execute(
+                "SELECT user_id FROM daily_users WHERE date = ?", (date,)
+            )]
+            for period in PERIODS:
+                key = (period, period_key(period, date))
+                rollup = rollups.get(key)
+                if rollup is None:
+                    row = self.conn.execute(
+                        "SELECT clicks, days, user_ids, users_hll FROM rollups WHERE period = ? AND key = ?",
+                        key
+                    ).fetchone()
+                    rollup = rollups[key] = self._rollup_from_row(row) if row else new_rollup()
+                rollup['clicks'] += clicks
+                rollup['days'] += 1
+                add_rollup_users(rollup, user_ids)
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO rollups (period, key, clicks, days, user_ids, users_hll) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (period, key) + rollup_columns(rollup)
+                    for (period, key), rollup in rollups.items()
+                )
+            )
+            self.conn.execute("DELETE FROM daily_clicks WHERE date < ?", (before,))
+            self.conn.execute("DELETE FROM daily_users WHERE date < ?", (before,))
+        return len(old_dates)
+
+    def metadata(self) -> Dict[str, str]:
+        return dict(self._query("SELECT key, value FROM meta"))
+
+
+def migrate_json_to_sqlite(stats_file: Path, db_file: Path) -> int:
+    """
+    Copy statistics from the JSON snapshot (and its journal) into a new
+    SQLite database.
+
+    The database is built under a temporary name and renamed to
+    ``db_file`` only once complete, so a failed migration leaves no
+    database behind and is simply retried on the next start.
+
+    Args:
+        stats_file: Path to the existing ``stats.json``
+        db_file: Path of the SQLite database to create
+
+    Returns:
+        Number of users migrated
+
+    Raises:
+        FileExistsError: If ``db_file`` already exists
+    """
+    if db_file.exists():
+        raise FileExistsError(f"{db_file} already exists")
+    stats = JsonStatsStorage(stats_file).stats
+    fd, tmp_name = tempfile.mkstemp(dir=db_file.parent, prefix=f".{db_file.name}.", suffix='.tmp')
+    os.close(fd)
+    tmp_path = Path(tmp_name)
+    try:
+        _copy_stats_to_sqlite(stats, tmp_path)
+        os.replace(tmp_path, db_file)
+    finally:
+        # Leftovers of a failed attempt (WAL files are removed on close)
+        for leftover in (tmp_path, Path(f"{tmp_name}-wal"), Path(f"{tmp_name}-shm")):
+            if leftover.exists():
+                leftover.unlink()
+    logger.info(f"Migrated {len(stats['users'])} users from {stats_file} to {db_file}")
+    return len(stats['users'])
+
+
+def _copy_stats_to_sqlite(stats: Dict[str, Any], db_file: Path) -> None:
+    """Write in-memory JSON statistics into an empty SQLite database."""
+    target = SqliteStatsStorage(db_file)
+    try:
+        conn = target.conn
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO users "
+                "(user_id, first_seen, last_seen, username, first_name, interactions) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (
+                        user_id,
+                        to_epoch(data['first_seen']),
+                        to_epoch(data['last_seen']),
+                        data.get('username'),
+                        data.get('first_name'),
+                        data.get('interactions', 0),
+                    )
+                    for user_id, data in stats['users'].items()
+                )
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO clicks (entry_id, count) VALUES (?, ?)",
+                stats['clicks'].items()
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO commands (command, count) VALUES (?, ?)",
+                stats.get('commands', {}).items()
+            )
+            for date, day_data in stats['daily_stats'].items():
+                conn.execute(
+                    "INSERT OR REPLACE INTO daily_clicks (date, clicks) VALUES (?, ?)",
+                    (date, day_data.get('clicks', 0))
+                )
+                # Days recorded as HyperLogLog sketches have no user IDs to copy
+                conn.executemany(
+                    "INSERT OR IGNORE INTO daily_users (date, user_id) VALUES (?, ?)",
+                    ((date, str(user_id)) for user_id in day_data.get('users', ()))
+                )
+            conn.executemany(
+                "INSERT OR REPLACE INTO rollups (period, key, clicks, days, user_ids, users_hll) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (period, key) + rollup_columns(rollup)
+                    for period, period_rollups in stats['rollups'].items()
+                    for key, rollup in period_rollups.items()
+                )
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                (('created_at', stats['created_at']), ('last_updated', stats['last_updated']))
+            )
+    finally:
+        target.close()
+
+
+def open_storage(
+    backend: str,
+    path: Path,
+    compact_every: int = 1000,
+    unique_mode: str = 'exact',
+) -> StatsStorage:
+    """
+    Create a storage engine by name.
+
+    Args:
+        backend: ``'json'`` or ``'sqlite'``
+        path: Snapshot file (json) or database file (sqlite)
+        compact_every: Journal compaction threshold for the JSON backend
+        unique_mode: Daily unique-user tracking for the JSON backend
+            (``'exact'`` or ``'hll'``); SQLite always counts exactly
+
+    Returns:
+        The storage instance
+    """
+    if backend == 'json':
+        return JsonStatsStorage(path, compact_every=compact_every, unique_mode=unique_mode)
+    if backend == 'sqlite':
+        return SqliteStatsStorage(path)
+    raise ValueError(f"Unknown stats backend: {backend}")
@@ -0,0 +1,34 @@
+"""Regression tests for concurrent statistics recording and update processing.
+
+They run the checks of ``benchmarks/concurrency_check.py`` at a size that
+fits every test run.
+"""
+import asyncio
+import sys
+
+import pytest
+
+from benchmarks.concurrency_check import check_flood, check_ordering, check_stats
+
+
+@pytest.fixture(autouse=True)
+def frequent_thread_switches():
+    """Switch threads as often as possible, so races show up in short runs."""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+@pytest.mark.parametrize('backend', ['json', 'sqlite'])
+def test_no_lost_increments(backend, tmp_path):
+    assert check_stats(backend, threads=8, events=2000, work_dir=tmp_path) == []
+
+
+def test_updates_of_a_chat_finish_in_order():
+    # Fewer chats than slots, so a chat's updates would overlap if they could
+    assert asyncio.run(check_ordering(chats=4, updates=20, limit=16)) == []
+
+
+def test_flooding_chat_does_not_delay_other_chats():
+    assert asyncio.run(check_flood(limit=8, work=0.05)) == []
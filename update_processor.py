@@ -0,0 +1,102 @@
+"""Concurrent update processing that keeps each chat's updates in order."""
+import asyncio
+from typing import Any, Awaitable, Dict, List, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from rate_limiter import reset_request_priority, restore_request_priority
+
+# Limit handed to BaseUpdateProcessor, whose semaphore is taken before
+# do_process_update runs; the real limit is applied after the chat lock
+_BASE_LIMIT = 2 ** 20
+
+
+def ordering_key(update: object) -> Optional[int]:
+    """
+    Key of the conversation an update belongs to.
+
+    Args:
+        update: The incoming update
+
+    Returns:
+        The chat ID, the user ID for updates without a chat (e.g. buttons on
+        inline messages), or None if the update needs no ordering (inline
+        queries, which are answered independently of each other)
+    """
+    if not isinstance(update, Update) or update.inline_query:
+        return None
+    if update.effective_chat:
+        return update.effective_chat.id
+    if update.effective_user:
+        return update.effective_user.id
+    return None
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """
+    Process up to ``max_concurrent_updates`` updates at once, one per chat.
+
+    A slow Bot API round trip for one user no longer holds up everyone
+    else, while two clicks in the same chat are still handled in the order
+    they arrived (the second one edits the message the first one produced).
+
+    An update first waits for its chat's lock and only then for one of the
+    ``max_concurrent_updates`` slots, so updates queued behind their own
+    chat hold no slot: a chat flooding the bot runs one update at a time
+    and other chats keep being served.
+    """
+
+    __slots__ = ('_chats', '_slots')
+
+    def __init__(self, max_concurrent_updates: int):
+        """
+        Initialize PerChatUpdateProcessor.
+
+        Args:
+            max_concurrent_updates: Maximum number of updates processed at once
+        """
+        if max_concurrent_updates < 1:
+            raise ValueError("`max_concurrent_updates` must be a positive integer!")
+        # The base class's semaphore is acquired before the chat lock would
+        # be, so it is made large enough never to be the one that waits
+        super().__init__(_BASE_LIMIT)
+        self._slots = asyncio.Semaphore(max_concurrent_updates)
+        # Chat key -> [lock, number of updates holding or waiting for it]
+        self._chats: Dict[int, List[Any]] = {}
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        # Every update starts at interactive priority, whatever the previous
+        # handler run in this task chose (see rate_limiter)
+        token = reset_request_priority()
+        try:
+            await self._process_in_order(update, coroutine)
+        finally:
+            restore_request_priority(token)
+
+    async def _process_in_order(self, update: object, coroutine: Awaitable[Any]) -> None:
+        """Await the coroutine once earlier updates of the same chat are done and a slot is free."""
+        key = ordering_key(update)
+        if key is None:
+            async with self._slots:
+                await coroutine
+            return
+
+        chat = self._chats.get(key)
+        if chat is None:
+            chat = self._chats[key] = [asyncio.Lock(), 0]
+        chat[1] += 1
+        try:
+            # asyncio.Lock wakes waiters first-in, first-out
+            async with chat[0], self._slots:
+                await coroutine
+        finally:
+            chat[1] -= 1
+            if not chat[1]:
+                del self._chats[key]
+
+    async def initialize(self) -> None:
+        """Nothing to set up."""
+
+    async def shutdown(self) -> None:
+        """Nothing to release."""